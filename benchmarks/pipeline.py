@@ -0,0 +1,260 @@
+"""
+Times every stage of the pipeline on synthetic data, without any network access.
+
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --stops 10 1000 100000
+    python benchmarks/pipeline.py --save-baseline benchmarks/baselines/laptop.json
+    python benchmarks/pipeline.py --baseline benchmarks/baselines/laptop.json
+
+Streets, subway lines and itineraries come from synthetic.py. Stages that work per leg
+(routing, train lines) run on at most --max-legs legs of every itinerary, the others on all
+of them. The render stage draws the frames of the first --render-legs legs with
+frame_renderer, without encoding, and reports frames per second.
+
+Every stage runs --repeat times and the fastest run counts. With --baseline the run is
+compared against a saved one, and stages more than --tolerance slower than it are reported.
+Baselines only compare on the machine and with the arguments they were saved with, so none is
+committed and the exit code is 1 only for regressions against a baseline saved on this machine:
+save one with --save-baseline before changing the code, then compare.
+"""
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import shutil
+import tempfile
+import contextlib
+import numpy as np
+import shapely
+from termcolor import colored
+from synthetic import BBOX, make_street_grid, make_rail_lines, make_itinerary, make_assets, make_background
+
+def timed(function, repeat: int) -> float:
+    """Fastest of repeat runs of function in seconds, its prints are dropped."""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def sample(items: list, count: int) -> list:
+    """At most count items, spread evenly over the list."""
+    if len(items) <= count:
+        return list(items)
+    return [items[i] for i in np.linspace(0, len(items) - 1, count).astype(int)]
+
+def cuts(build_line, line, start, end) -> bool:
+    """Whether build_line.get_part_of_line manages to cut line from start to end."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            build_line.get_part_of_line(line, start, end)
+        except (ValueError, shapely.errors.GEOSException):
+            return False
+    return True
+
+def run_fixed_stages(rows: list[dict], rail_lines, repeat: int):
+    from gps_animator.common.subway_index import subway_index
+    from gps_animator.common.rail_network import rail_network
+
+    rows.append({"stage": "subway index", "stops": None, "items": len(rail_lines), "seconds": timed(lambda: subway_index(rail_lines), repeat)})
+    index = subway_index(rail_lines)
+    rows.append({"stage": "rail network", "stops": None, "items": len(index.vertices), "seconds": timed(lambda: rail_network(index), repeat)})
+    return index, rail_network(index)
+
+def run_itinerary_stages(rows: list[dict], stops: int, G, rail_lines, index, network, max_legs: int, repeat: int, seed: int):
+    import osmnx as ox
+    from shapely.geometry import LineString
+    from gps_animator.common.points import point_collection
+    from gps_animator.common.projection import wgs84_to_mercator
+    from gps_animator.common.routing import get_legs, route_legs, walking, train, car
+    from gps_animator.manim_app.helpers import get_appropriate_times, get_pixel_tolerance, simplify_line_parts, resort_path, IMAGE_MANIM_WIDTH
+    from gps_animator.common.projection import scene_projection, bbox_to_mercator
+    from gps_animator.common import build_line
+
+    def add(stage: str, items: int, function):
+        rows.append({"stage": stage, "stops": stops, "items": items, "seconds": timed(function, repeat)})
+
+    points = make_itinerary(stops, rail_lines=rail_lines, seed=seed)
+    columns = {column: points.rows[column].copy() for column in ("latitude", "longitude", "arrival", "departure", "dep_type", "name")}
+    def load_points():
+        loaded = point_collection()
+        loaded.add_columns(**columns)
+        loaded.get_all()
+    add("load points", stops, load_points)
+
+    point_table = points.get_all()
+    legs = get_legs(point_table)
+
+    xs, ys = wgs84_to_mercator(*points.get_coordinates())
+    add("nearest nodes", stops, lambda: ox.distance.nearest_nodes(G, xs, ys))
+
+    # straight lines for every leg, the routed sample replaces some of them below
+    lines = {i: LineString([(xs[i], ys[i]), (xs[i+1], ys[i+1])]) for i in legs}
+    road_legs = sample([i for i in legs if point_table[i][1] in (walking, car)], max_legs)
+    if len(road_legs) > 0:
+        nodes = ox.distance.nearest_nodes(G, xs, ys)
+        origs = [nodes[i] for i in road_legs]
+        dests = [nodes[i+1] for i in road_legs]
+        add("route legs", len(road_legs), lambda: route_legs(G, origs, dests, cpus=1))
+        for i, route_coords in zip(road_legs, route_legs(G, origs, dests, cpus=1)):
+            if route_coords is not None and len(route_coords) > 1:
+                lines[i] = LineString(route_coords)
+
+    train_legs = sample([i for i in legs if point_table[i][1] == train], max_legs)
+    if len(train_legs) > 0:
+        stations = [(point_table[i][0].get_mercator_coordinates(), point_table[i+1][0].get_mercator_coordinates()) for i in train_legs]
+        add("train route", len(train_legs), lambda: [network.route(start, end) for start, end in stations])
+        # get_part_of_line can't cut a line between stations on the same or, backwards, on neighbouring vertices
+        matches = [(i, index.match(start, end)) for i, (start, end) in zip(train_legs, stations)]
+        matches = [(i, match) for i, match in matches if cuts(build_line, index.geometries[match[0]], match[1], match[2])]
+        add("get_train_line", len(matches), lambda: [build_line.get_train_line(point_table[i][0], point_table[i+1][0], index) for i, _ in matches])
+        add("get_part_of_line", len(matches), lambda: [build_line.get_part_of_line(index.geometries[line], start, end) for _, (line, start, end, _) in matches])
+    routed = [lines[i] for i in road_legs if len(lines[i].coords) > 2]
+    if len(routed) > 1:
+        add("connect_line_arrays_simple", len(routed), lambda: build_line.connect_line_arrays_simple(routed))
+
+    leg_lines = [lines[i] for i in legs]
+    minx, miny, maxx, maxy = bbox_to_mercator(BBOX)
+    projection = scene_projection((minx, miny, maxx, maxy), IMAGE_MANIM_WIDTH, IMAGE_MANIM_WIDTH * (maxy - miny) / (maxx - minx))
+    # one pixel of the draft profile at Manim's default frame width
+    tolerance = get_pixel_tolerance(projection.merc_width, projection.manim_width, 128 / 9, 854)
+    add("simplify", len(leg_lines), lambda: simplify_line_parts(leg_lines, tolerance))
+    times = [(point_table[i][0].get_departure(), point_table[i+1][0].get_arrival()) for i in legs]
+    add("get_appropriate_times", len(times), lambda: get_appropriate_times(times, 600))
+    add("project", len(leg_lines), lambda: [list(projection.line_to_manim(line)) for line in leg_lines])
+    paths = [list(projection.line_to_manim(line)) for line in leg_lines]
+    add("resort_path", len(paths), lambda: resort_path(paths))
+
+def run_render_stage(rows: list[dict], render_legs: int, repeat: int, seed: int):
+    """Frames per second of frame_renderer for the first render_legs legs of a trip, at the draft profile."""
+    try:
+        from manim import config
+        from gps_animator.common.raster_cache import backgrounds
+        from gps_animator.manim_app.frame_renderer import frame_renderer
+        from gps_animator.manim_app.helpers import get_appropriate_times
+        from gps_animator.manim_app.plan import get_scene_projection
+        from gps_animator.manim_app.scenes import apply_render_profile
+        from gps_animator.manim_app.sprites import sprite_cache
+    except ImportError as e:
+        rows.append({"stage": "render", "stops": None, "skipped": str(e)})
+        return
+    from shapely.geometry import LineString
+    from gps_animator.common.projection import wgs84_to_mercator
+    from gps_animator.common.routing import leg_names
+
+    render_profile = apply_render_profile("draft")
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        # resized backgrounds stay in the temporary folder instead of the user's cache
+        backgrounds.cache_dir = os.path.join(work_dir, "backgrounds")
+        assets = make_assets(os.path.join(work_dir, "assets"), seed=seed)
+        background_image = make_background(os.path.join(work_dir, "background.png"), render_profile["background_width"], seed=seed)
+
+        points = make_itinerary(render_legs + 1, seed=seed)
+        xs, ys = wgs84_to_mercator(*points.get_coordinates())
+        projection = get_scene_projection(BBOX)
+        paths = [list(projection.line_to_manim(LineString([(xs[i], ys[i]), (xs[i+1], ys[i+1])]))) for i in range(render_legs)]
+        transport = [leg_names[dep_type] for dep_type in points.rows["dep_type"][:render_legs].tolist()]
+        times = get_appropriate_times([(points.rows["departure"][i], points.rows["arrival"][i+1]) for i in range(render_legs)], 600)
+        colors = ["#583927"] * render_legs
+
+        sprites = sprite_cache(assets, render_profile["sprite_scale"])
+        renderer = frame_renderer(config.pixel_width, config.pixel_height, config.frame_rate, config.frame_width, config.frame_height, sprites)
+        renderer.build_background(background_image, projection, render_profile["background_width"], paths, colors, [])
+        frames = sum(1 for _ in renderer.iter_frames(paths, transport, times))
+        rows.append({"stage": "render", "stops": None, "items": frames, "seconds": timed(lambda: sum(1 for _ in renderer.iter_frames(paths, transport, times)), repeat)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def get_key(row: dict) -> str:
+    return row["stage"] if row["stops"] is None else f"{row['stage']}@{row['stops']}"
+
+def print_table(rows: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Prints all stages, returns the keys of the ones slower than the baseline by more than tolerance."""
+    regressions = []
+    print(f"{'stage':<28} {'stops':>7} {'items':>7} {'seconds':>10} {'us/item':>10} {'baseline':>10} {'change':>8}")
+    for row in rows:
+        stops = "" if row["stops"] is None else row["stops"]
+        if "skipped" in row:
+            print(colored(f"{row['stage']:<28} {stops:>7} skipped: {row['skipped']}", 'yellow'))
+            continue
+        per_item = row["seconds"] / max(row["items"], 1) * 1e6
+        line = f"{row['stage']:<28} {stops:>7} {row['items']:>7} {row['seconds']:>10.4f} {per_item:>10.1f}"
+        if row["stage"] == "render":
+            line += f" ({row['items'] / max(row['seconds'], 1e-9):.1f} fps)"
+        previous = baseline.get(get_key(row))
+        if previous is not None:
+            change = row["seconds"] / previous - 1 if previous > 0 else 0
+            line += f" {previous:>10.4f} {change:>+8.1%}"
+            if change > tolerance:
+                regressions.append(get_key(row))
+                print(colored(line, 'red'))
+                continue
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000], help="itinerary sizes")
+    parser.add_argument("--max-legs", type=int, default=200, help="legs routed per itinerary")
+    parser.add_argument("--render-legs", type=int, default=3, help="legs rendered for the frames per second, 0 skips rendering")
+    parser.add_argument("--spacing", type=float, default=100, help="meters between the streets of the grid")
+    parser.add_argument("--rail-lines", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="compare against this baseline file, saved with --save-baseline")
+    parser.add_argument("--save-baseline", help="save the results as a baseline to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline, 0.25 is 25 percent")
+    args = parser.parse_args()
+
+    arguments = {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline", "tolerance")}
+    baseline = {}
+    same_machine = False
+    if args.baseline is None:
+        pass
+    elif not os.path.isfile(args.baseline):
+        print(colored(f"No baseline at {args.baseline}, nothing to compare against", 'yellow'))
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        same_machine = saved["machine"] == platform.node()
+        if saved["arguments"] != arguments or not same_machine:
+            print(colored(f"{args.baseline} was saved on {saved['machine']} with {saved['arguments']}, timings may not compare", 'yellow'))
+        baseline = saved["results"]
+
+    G = make_street_grid(spacing=args.spacing, seed=args.seed)
+    rail_lines = make_rail_lines(lines=args.rail_lines, seed=args.seed)
+    print(colored(f"Street grid with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges, {len(rail_lines)} subway lines", 'green'))
+
+    rows = []
+    index, network = run_fixed_stages(rows, rail_lines, args.repeat)
+    for stops in args.stops:
+        print(colored(f"Timing an itinerary of {stops} stops", 'green'))
+        run_itinerary_stages(rows, stops, G, rail_lines, index, network, args.max_legs, args.repeat, args.seed)
+    if args.render_legs > 0:
+        run_render_stage(rows, args.render_legs, args.repeat, args.seed)
+
+    regressions = print_table(rows, baseline, args.tolerance)
+    if args.save_baseline is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": platform.node(),
+                "python": platform.python_version(),
+                "arguments": arguments,
+                "results": {get_key(row): row["seconds"] for row in rows if "skipped" not in row},
+            }, f, indent=2)
+        print(colored(f"Saved baseline to {args.save_baseline}", 'green'))
+    if len(regressions) > 0:
+        print(colored(f"{len(regressions)} stages are slower than the baseline: {', '.join(regressions)}", 'red'))
+        # another machine's timings only show the size of a change, they can't fail the run
+        if same_machine:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Renders one trip with the Manim backend and with the NumPy backend and compares
+frames per second and peak memory.
+
+    python benchmarks/render_backends.py points.txt --map-kind Details --profile draft
+
+Every backend runs in a fresh process, so its peak RSS (ru_maxrss) is its own.
+tracemalloc adds the peak of Python allocations. Routes and maps are planned once
+up front (see animation_plan), so both backends render the very same plan.
+"""
+import os
+import time
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+from termcolor import colored
+
+def run_backend(backend: str, plan_file: str, profile: str, output_dir: str, results):
+    from gps_animator.manim_app.plan import animation_plan
+
+    plan = animation_plan.load(plan_file)
+    output_file = os.path.join(output_dir, f"benchmark_{backend}.mp4")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if backend == "numpy":
+        from gps_animator.manim_app.frame_renderer import render_numpy
+        render_numpy(plan, output_file, profile=profile)
+    else:
+        from manim import tempconfig
+        from gps_animator.manim_app.scenes import PathOnMap
+        with tempconfig({"output_file": output_file}):
+            PathOnMap(plan=plan, profile=profile).render()
+    seconds = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put({
+        "backend": backend,
+        "seconds": seconds,
+        "traced_peak_mb": traced_peak / 1024**2,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+def count_frames(plan_file: str, profile: str) -> int:
+    from gps_animator.config import settings
+    from gps_animator.manim_app.plan import animation_plan
+    from gps_animator.manim_app.helpers import get_leg_frames
+
+    paths, _, _, times = animation_plan.load(plan_file).get_legs()
+    return sum(get_leg_frames(paths, times, settings.get_render_profile(profile)["frame_rate"]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("points_file")
+    parser.add_argument("--map-kind", default="Details", choices=["Details", "Satelite"])
+    parser.add_argument("--profile", default="draft")
+    parser.add_argument("--backends", nargs="+", default=["manim", "numpy"], choices=["manim", "numpy"])
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args()
+
+    # routes and maps are done once, both backends render the same plan
+    from gps_animator.animation import plan_trip
+    plan_file = os.path.join(args.output_dir, "benchmark_plan.json")
+    plan_trip(args.points_file, args.map_kind, args.profile).save(plan_file)
+    frames = count_frames(plan_file, args.profile)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    rows = []
+    for backend in args.backends:
+        process = context.Process(target=run_backend, args=(backend, plan_file, args.profile, args.output_dir, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(colored(f"{backend} backend failed with exit code {process.exitcode}", 'red'))
+            continue
+        rows.append(results.get())
+
+    print(f"{'backend':<8} {'frames':>7} {'seconds':>9} {'fps':>8} {'traced MB':>10} {'RSS MB':>8}")
+    for row in rows:
+        print(f"{row['backend']:<8} {frames:>7} {row['seconds']:>9.1f} {frames / row['seconds']:>8.1f} {row['traced_peak_mb']:>10.1f} {row['max_rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
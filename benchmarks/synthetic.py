@@ -0,0 +1,134 @@
+"""
+Synthetic inputs for the offline benchmarks, shaped like what the pipeline gets from OSM.
+
+make_street_grid builds a projected routing graph like graph_store returns, make_rail_lines
+a subway GeoDataFrame like get_subwaylines_of_bbox returns, and make_itinerary a trip like
+the one of generate_points.py with any number of stops. Everything is seeded, so the same
+arguments always give the same data.
+"""
+import os
+import numpy as np
+import networkx as nx
+import geopandas as gpd
+from shapely.geometry import LineString
+from gps_animator.common.points import point_collection, departure_types, NO_DEPARTURE
+from gps_animator.common.projection import mercator_to_wgs84, bbox_to_mercator
+
+### Global Variables
+BBOX = (139.762, 35.6776, 139.8271, 35.7353) # the Tokyo bbox of the examples in build_line.py
+LINE_COLORS = ["#F39700", "#E60012", "#9CAEB7", "#00A7DB", "#009944", "#D7C447", "#9B7CB6", "#00ADA9", "#BB641D", "#E85298"]
+
+def make_street_grid(bbox: tuple[float, float, float, float] = BBOX, spacing: float = 100, drop: float = 0.1, seed: int = 0) -> nx.MultiDiGraph:
+    """
+    A street grid over bbox with a crossing every spacing meters, projected to EPSG:3857 like graph_store's graphs.
+    Every street goes both ways, a fraction drop of them is left out so routes have to go around blocks.
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
+    xs = np.arange(minx, maxx, spacing)
+    ys = np.arange(miny, maxy, spacing)
+    columns = len(xs)
+    G = nx.MultiDiGraph(crs="EPSG:3857")
+    G.add_nodes_from((row * columns + column, {"x": float(x), "y": float(y)}) for row, y in enumerate(ys) for column, x in enumerate(xs))
+
+    ids = np.arange(len(xs) * len(ys)).reshape(len(ys), columns)
+    sources = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    targets = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    keep = rng.random(len(sources)) >= drop
+    for source, target in zip(sources[keep].tolist(), targets[keep].tolist()):
+        G.add_edge(source, target, length=spacing)
+        G.add_edge(target, source, length=spacing)
+    return G
+
+def make_rail_lines(bbox: tuple[float, float, float, float] = BBOX, lines: int = 8, vertices: int = 80, seed: int = 0) -> gpd.GeoDataFrame:
+    """
+    lines subway lines in EPSG:3857, every one crossing bbox from one side to the other with some bends,
+    so they cross each other like a real network. Columns like the repaired Overpass lines: geometry, colour, name:en.
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
+    width = maxx - minx
+    height = maxy - miny
+    geometries = []
+    for i in range(lines):
+        t = np.linspace(0, 1, vertices)
+        start, end = rng.uniform(0.1, 0.9, 2)
+        across = start + (end - start) * t + 0.05 * np.sin(t * np.pi * rng.uniform(1, 4))
+        # every other line runs west to east, the rest south to north
+        if i % 2 == 0:
+            x, y = minx + t * width, miny + across * height
+        else:
+            x, y = minx + across * width, miny + t * height
+        geometries.append(LineString(np.column_stack([x, y])))
+    return gpd.GeoDataFrame({
+        "colour": [LINE_COLORS[i % len(LINE_COLORS)] for i in range(lines)],
+        "name:en": [f"Line {i + 1}" for i in range(lines)],
+    }, geometry=geometries, crs="EPSG:3857")
+
+def make_itinerary(stops: int, bbox: tuple[float, float, float, float] = BBOX, rail_lines: gpd.GeoDataFrame|None = None, step: float = 400, seed: int = 0) -> point_collection:
+    """
+    A trip of stops points, walking about step meters between stops, with some train and car legs.
+    Train legs start and end at vertices of one of rail_lines, like trips between two stations do.
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
+    modes = rng.choice([departure_types["walking"], departure_types["train"], departure_types["car"]], size=stops, p=[0.7, 0.2, 0.1])
+    modes[-1] = departure_types["end"]
+
+    steps = rng.normal(0, step, (stops, 2))
+    x = np.clip((minx + maxx) / 2 + np.cumsum(steps[:, 0]), minx, maxx)
+    y = np.clip((miny + maxy) / 2 + np.cumsum(steps[:, 1]), miny, maxy)
+    if rail_lines is not None and len(rail_lines) > 0:
+        lines = [np.asarray(geometry.coords) for geometry in rail_lines.geometry]
+        for i in np.nonzero(modes == departure_types["train"])[0]:
+            line = lines[rng.integers(len(lines))]
+            first, second = rng.choice(len(line), 2, replace=False)
+            x[i], y[i] = line[first]
+            x[i+1], y[i+1] = line[second]
+
+    # stays of one minute to one hour, legs of five to thirty minutes
+    stays = rng.integers(60, 3600, stops)
+    legs = rng.integers(300, 1800, stops)
+    arrival = 9 * 3600 + np.concatenate([[0], np.cumsum(stays[:-1] + legs[:-1])])
+    departure = arrival + stays
+    departure[-1] = NO_DEPARTURE
+
+    latitude, longitude = mercator_to_wgs84(x, y)
+    points = point_collection()
+    points.add_columns(
+        latitude, longitude, arrival, departure, modes,
+        name=np.array([f"Stop {i}" for i in range(stops)], dtype=object),
+    )
+    return points
+
+def make_assets(folder: str, size: int = 64, seed: int = 0) -> str:
+    """Writes every direction sprite and the idle animation sprite_cache expects into folder, returns folder."""
+    from PIL import Image
+    from gps_animator.manim_app.sprites import leg_sprites, IDLE_SPRITE
+
+    rng = np.random.default_rng(seed)
+    def frame():
+        pixels = np.zeros((size, size, 4), dtype=np.uint8)
+        pixels[size//4:3*size//4, size//4:3*size//4] = (*rng.integers(0, 255, 3), 255)
+        return Image.fromarray(pixels)
+
+    files = [f"{sprite_folder}/{angle}{ext}" for sprite_folder, angles, ext, _, _, _ in leg_sprites.values() for angle in angles] + [IDLE_SPRITE]
+    for file in files:
+        path = os.path.join(folder, file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith(".gif"):
+            frames = [frame() for _ in range(8)]
+            frames[0].save(path, save_all=True, append_images=frames[1:], duration=100, loop=0, disposal=2)
+        else:
+            frame().save(path)
+    return folder
+
+def make_background(path: str, width: int, bbox: tuple[float, float, float, float] = BBOX, seed: int = 0) -> str:
+    """A noise image with the size and aspect of the map of bbox, in place of a downloaded basemap."""
+    from PIL import Image
+
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
+    height = max(10, int(width * (maxy - miny) / (maxx - minx)))
+    pixels = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+    return path
@@ -1,22 +1,97 @@
+import os
+import argparse
 from manim import config
 from pathlib import Path
-from gps_animator.manim_app.scenes import PathOnMap
+from termcolor import colored
+from gps_animator.manim_app.scenes import PathOnMap, apply_render_profile
 from gps_animator.manim_app.helpers import get_animation_details
+from gps_animator.manim_app.plan import animation_plan, create_plan
+from gps_animator.manim_app.parallel import render_parallel
+from gps_animator.manim_app.frame_renderer import render_numpy
+from gps_animator.manim_app.sections import render_incremental
 from gps_animator.common.points import point_collection
+from gps_animator.common.profiling import tracer
+from gps_animator.config import settings
 
-def run_manim_scene(gps_points_file: Path, map_kind: str):
-    points = point_collection()
-    points.load_from_file(gps_points_file)
-    bbox, background_image = get_animation_details(points, map_kind)
+def render_plan(plan: animation_plan, processes: int = 1, profile: str|None = None, backend: str = "manim", incremental: bool = False):
+    """
+    backend: "manim" renders PathOnMap, "numpy" the same animation with frame_renderer
+    incremental: only render the sections of legs that changed since the last render (manim backend), see sections.section_cache
+    """
+    with tracer.span("render", backend=backend):
+        if backend == "numpy":
+            render_numpy(plan, profile=profile)
+            return
+        if incremental:
+            render_incremental(plan, processes, profile=profile)
+            return
+        if processes > 1:
+            render_parallel(plan, processes, profile=profile)
+            return
+        scene = PathOnMap(plan=plan, profile=profile)
+        scene.render()  # equivalent to CLI call
 
-    scene = PathOnMap(points, bbox, background_image)
-    scene.render()  # equivalent to CLI call
+def plan_trip(gps_points_file: Path, map_kind: str, profile: str|None = None) -> animation_plan:
+    """Does all routing and map work for a trip."""
+    # the plan records the profile its paths and background were made for
+    profile = profile or settings.RENDER_PROFILE
+    with tracer.span("plan"):
+        apply_render_profile(profile)
+        points = point_collection()
+        points.load_from_file(gps_points_file)
+        bbox, background_image, _, _ = get_animation_details(points, map_kind, profile=profile)
+        return create_plan(points, bbox, background_image, profile)
+
+def render_plan_file(plan_file: Path, processes: int = 1, profile: str|None = None, backend: str = "manim", incremental: bool = False):
+    """
+    Renders a saved plan without any OSM work.
+    profile: by default the profile the plan was made for
+    """
+    plan = animation_plan.load(plan_file)
+    if profile is None:
+        profile = plan.profile
+    elif plan.profile is not None and profile != plan.profile:
+        # paths are simplified and the background composed for the plan's profile only
+        print(colored(f"Plan {plan_file} was made for the {plan.profile} profile, its paths and background keep that resolution in a {profile} render. Save the plan again with --profile {profile} for full quality", 'red'))
+    render_plan(plan, processes, profile, backend, incremental)
+
+def run_manim_scene(gps_points_file: Path, map_kind: str, processes: int = 1, profile: str|None = None, backend: str = "manim", plan_file: Path|None = None, incremental: bool = False):
+    """plan_file: also save the animation plan there, so later renders can skip routing"""
+    plan = plan_trip(gps_points_file, map_kind, profile)
+    if plan_file is not None:
+        plan.save(plan_file)
+    render_plan(plan, processes, profile, backend, incremental)
 
 def main():
+    parser = argparse.ArgumentParser(description="Animates a trip. Points file and map kind are asked for if not given.")
+    parser.add_argument("points_file", nargs="?")
+    parser.add_argument("--map-kind", choices=["Satelite", "Details"])
+    parser.add_argument("--profile", help="render profile (draft, preview, final), a saved plan renders with the profile it was made for by default")
+    parser.add_argument("--processes", type=int, default=1, help="render in time slices on this many processes (manim backend), 0 for one per CPU")
+    parser.add_argument("--backend", choices=["manim", "numpy"], default="manim", help="numpy draws the frames without Manim")
+    parser.add_argument("--plan", metavar="FILE", help="render this saved animation plan, no points file or map kind needed")
+    parser.add_argument("--save-plan", metavar="FILE", help="save the animation plan to FILE, so later renders can skip routing")
+    parser.add_argument("--incremental", action="store_true", help="only render the legs that changed since the last render (manim backend). Saves nothing when a stop moves, every frame shows all paths, and a leg that gets longer or shorter renders every later leg again")
+    parser.add_argument("--trace", metavar="FILE", help="time every stage, save a Chrome trace (chrome://tracing, Perfetto) to FILE and print a summary")
+    parser.add_argument("--timings", action="store_true", help="time every stage and print a summary")
+    args = parser.parse_args()
+    processes = args.processes or os.cpu_count() or 1
+
     print("Running Program A logic...")
-    gps_points_file: Path = input("Please give the path to your points file:\n")
-    map_kind: str = input("Which kind of Map do you want? (Satelite|Details)")
-    run_manim_scene(gps_points_file, map_kind)
+    if args.trace or args.timings:
+        tracer.enable()
+    try:
+        if args.plan:
+            render_plan_file(args.plan, processes, args.profile, args.backend, args.incremental)
+        else:
+            gps_points_file: Path = args.points_file or input("Please give the path to your points file:\n")
+            map_kind: str = args.map_kind or input("Which kind of Map do you want? (Satelite|Details)")
+            run_manim_scene(gps_points_file, map_kind, processes, args.profile, args.backend, args.save_plan, args.incremental)
+    finally:
+        if tracer.enabled:
+            print(tracer.summary())
+            if args.trace:
+                tracer.save_trace(args.trace)
 
 
 if __name__ == "__main__":
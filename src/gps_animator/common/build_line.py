@@ -1,15 +1,44 @@
 import queue
-from repairing_gpd import build_filtered_dataframe, connect_lines
 import geopandas as gpd
+import networkx as nx
 import osmnx as ox
-from creating_points import coordinate_point
+from gps_animator.common.points import coordinate_point
+from gps_animator.common.subway_index import subway_index
+from gps_animator.common.rail_network import rail_network
+from gps_animator.common.rail_cache import rail_lines_cache
+from gps_animator.common.route_cache import routes
+from gps_animator.common.fetch import fetch_overpass
+from gps_animator.common.profiling import tracer
 
 from termcolor import colored
 
-def get_subwaylines_of_bbox(bbox: tuple[float, float, float, float]) -> gpd.GeoDataFrame:
+def get_subwaylines_of_bbox(bbox: tuple[float, float, float, float], use_cache: bool = True) -> gpd.GeoDataFrame:
+    """
+    Returns the repaired subway and light rail lines of bbox in EPSG:3857.
+    With use_cache the lines of the whole surrounding tile are fetched once and reused from disk (see rail_cache).
+    """
+    if not use_cache:
+        return fetch_subwaylines_of_bbox(bbox)
+
+    rail_lines = rail_lines_cache.load(bbox)
+    if rail_lines is not None:
+        tracer.count("rail cache hits")
+        return rail_lines
+    tracer.count("rail cache misses")
+
+    tile = rail_lines_cache.tile_bbox(bbox)
+    rail_lines = fetch_subwaylines_of_bbox(tile)
+    rail_lines_cache.save(tile, rail_lines)
+    return rail_lines_cache.clip(rail_lines, bbox)
+
+def fetch_subwaylines_of_bbox(bbox: tuple[float, float, float, float]) -> gpd.GeoDataFrame:
+    # only fetching needs the repair package, matching and routing on cached lines work without it
+    from repairing_gpd import build_filtered_dataframe, connect_lines
+
     tags = {"railway": ["subway", "light_rail"]}
 
-    rail_lines = ox.features_from_bbox(bbox, tags=tags)
+    with tracer.span("subway fetch", "fetch", bbox=bbox):
+        rail_lines = fetch_overpass(ox.features_from_bbox, bbox, tags=tags)
 
     if 'source' in rail_lines.columns:
         rail_lines = rail_lines[(rail_lines['source'] != 'Bing') & (rail_lines['source'].notna())]
@@ -19,8 +48,9 @@ def get_subwaylines_of_bbox(bbox: tuple[float, float, float, float]) -> gpd.GeoD
     rail_lines = rail_lines.to_crs(epsg=3857)
 
     # Fixing Rail lines
-    rail_lines = build_filtered_dataframe(rail_lines)
-    rail_lines = connect_lines(rail_lines)
+    with tracer.span("subway repair", "fetch", lines=len(rail_lines)):
+        rail_lines = build_filtered_dataframe(rail_lines)
+        rail_lines = connect_lines(rail_lines)
 
     return rail_lines
 
@@ -33,56 +63,47 @@ from shapely.geometry import LineString
 
 import osmnx as ox
 from shapely.geometry import LineString, Point
-import hashlib, os, logging, pickle
+import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def get_graph_version(G_proj, network_type: str) -> str:
+    """Version of the graph a route is computed on, part of the route cache key."""
+    if G_proj is not None and "version" in G_proj.graph:
+        return G_proj.graph["version"]
+    # the per-leg graph around the start point
+    return f"{network_type}_point5000_osmnx{ox.__version__}"
 
-cache   = f"/home/honney/projects/gps-animation/cache"
-
-def get_walking_line(start: coordinate_point, end: coordinate_point) -> LineString:
+def get_walking_line(start: coordinate_point, end: coordinate_point, G_proj = None) -> LineString:
     """
     Returns a LineString of the shortest walking route between (lat, lon) points.
     Output is in EPSG:3857 (Web Mercator).
+    G_proj: shared projected walking graph (see graph_store), if None a graph around start is downloaded
     """
     print(colored("Getting walking line from ", 'green') + colored(f"{start.get_name()} to {end.get_name()}", 'blue'))
     start = start.coord()
     end = end.coord()
 
-    def create_cache_key(start_point, end_point):
-        # Create a unique key from the coordinates
-        coords_str = f"{start_point[0]}_{start_point[1]}_{end_point[0]}_{end_point[1]}"
-        return hashlib.md5(coords_str.encode('utf-8')).hexdigest()
-    
-    cache_key = create_cache_key(start, end)
-    cache_file = os.path.join(cache, f"walking_route_{cache_key}.pkl")
+    cache_key = routes.create_key("walking", start, end, get_graph_version(G_proj, "walk"))
 
     # Check if cached result exists
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, 'rb') as f:  # Note: 'rb' for binary read
-                cached_result = pickle.load(f)
-                print(colored(f"Loading cached walking line from {cache_file}", 'yellow'))
-                return cached_result
-        except (pickle.PickleError, EOFError, FileNotFoundError, UnicodeDecodeError) as e:
-            # If cache is corrupted or unreadable, continue to compute normally
-            print(colored(f"Cache file {cache_file} is corrupted or unreadable: {e}. Recomputing...", 'red'))
-            try:
-                os.remove(cache_file)  # Remove corrupted file
-                print(colored(f"Removed corrupted cache file: {cache_file}", 'yellow'))
-            except:
-                pass
-
-    # Build graph in WGS84 (lat, lon required here!)
-    G = ox.graph_from_point(
-        (start[0], start[1]),  # (lat, lon)
-        dist=5000,
-        network_type="walk"
-    )
-
-    # Project to EPSG:3857
-    G_proj = ox.project_graph(G, to_crs="EPSG:3857")
+    cached_result = routes.get(cache_key)
+    if cached_result is not None:
+        print(colored(f"Loading cached walking line from {routes.path}", 'yellow'))
+        return cached_result
+
+    if G_proj is None:
+        # Build graph in WGS84 (lat, lon required here!)
+        G = fetch_overpass(
+            ox.graph_from_point,
+            (start[0], start[1]),  # (lat, lon)
+            dist=5000,
+            network_type="walk"
+        )
+
+        # Project to EPSG:3857
+        G_proj = ox.project_graph(G, to_crs="EPSG:3857")
 
     # Project input points to EPSG:3857
     start_proj = ox.projection.project_geometry(
@@ -107,13 +128,7 @@ def get_walking_line(start: coordinate_point, end: coordinate_point) -> LineStri
     line_string = LineString(route_coords)
 
     # Cache the result
-    try:
-        os.makedirs(cache, exist_ok=True)  # Create cache directory if it doesn't exist
-        with open(cache_file, 'wb') as f:
-            pickle.dump(line_string, f)
-        print(colored(f"Cached walking line to {cache_file}", 'green'))
-    except Exception as e:
-        print(colored(f"Failed to cache result: {e}", 'red'))
+    routes.put(cache_key, line_string, "walking")
     return line_string
 
 
@@ -171,63 +186,47 @@ def get_part_of_line(geometry: LineString, start: list[float, float], end: list[
                 raise ValueError(colored("Something Broke... It did not end despite that it should have.", 'red'))
     raise ValueError(colored("LineString does not contain the specified start and end points.", 'red'))
 
-import math
-
-def get_train_line(start: coordinate_point, end: coordinate_point, subway_map: gpd.GeoDataFrame, debug = 0) -> LineString:
-    # Create a GeoDataFrame for the train line
+def get_train_line(start: coordinate_point, end: coordinate_point, subway_map: gpd.GeoDataFrame|subway_index, debug = 0) -> LineString:
+    """
+    Returns the part of the subway line closest to both stations and its color.
+    subway_map: the subway lines as subway_index (or as GeoDataFrame, which gets indexed first)
+    """
     print(colored("Getting train line from ", 'green') + colored(f"{start.get_name()} to {end.get_name()}", 'blue'))
-    # print(f"Subway map: {subway_map}")
-    geometries = subway_map.geometry
+    if not isinstance(subway_map, subway_index):
+        subway_map = subway_index(subway_map)
     start_coords = start.get_mercator_coordinates()
     end_coords = end.get_mercator_coordinates()
-    min_geometry_distance = []
-    for geometry in geometries:
-        min_distance_start = np.inf
-        min_distance_end = np.inf
-        for point in geometry.coords:
-            distance_start = math.sqrt((start_coords[0] - point[0]) ** 2 + (start_coords[1] - point[1]) ** 2)
-            distance_end = math.sqrt((end_coords[0] - point[0]) ** 2 + (end_coords[1] - point[1]) ** 2)
-            if distance_start < distance_end:
-                if distance_start < min_distance_start:
-                    min_distance_start = distance_start
-            else:
-                if distance_end < min_distance_end:
-                    min_distance_end = distance_end
-        min_geometry_distance.append((min_distance_start, min_distance_end))
-    # print(f"Minimum distances for each geometry: {min_geometry_distance}")
-    min_distances = []
-    min_distance = np.inf
-    min_idx = -1
-    for geometry_distance in min_geometry_distance:
-        if geometry_distance[0]+geometry_distance[1] < min_distance:
-            min_distance = geometry_distance[0]+geometry_distance[1]
-            min_distances = geometry_distance
-            min_idx = min_geometry_distance.index(geometry_distance)
-    if min_idx != -1:
-        name = subway_map.iloc[min_idx]['name:en']
-        if debug == 1:
-            print(colored(f"Found closest geometry: {name} with distances ", 'green'), colored(f"{min_distances}", 'blue'))
-    correct_geometry = subway_map.iloc[min_idx]['geometry']
-    correct_color = subway_map.iloc[min_idx]['colour']
-    correct_start = None
-    correct_end = None
-    for point in correct_geometry.coords:
-        distance_start = math.sqrt((start_coords[0] - point[0]) ** 2 + (start_coords[1] - point[1]) ** 2)
-        distance_end = math.sqrt((end_coords[0] - point[0]) ** 2 + (end_coords[1] - point[1]) ** 2)
-        if distance_start == min_distances[0]:
-            correct_start = point
-        elif distance_end == min_distances[1]:
-            correct_end = point
-    
+
+    min_idx, correct_start, correct_end, min_distances = subway_map.match(start_coords, end_coords)
+    if debug == 1:
+        name = subway_map.names[min_idx]
+        print(colored(f"Found closest geometry: {name} with distances ", 'green'), colored(f"{min_distances}", 'blue'))
+    correct_geometry = subway_map.geometries[min_idx]
+    correct_color = subway_map.colors[min_idx]
+
     cut_geometry = get_part_of_line(correct_geometry, correct_start, correct_end)
-    # print(f"Correct geometry: {type(correct_geometry)}")
-    # print(f"Cut geometry: {cut_geometry}")
-    # if cut_geometry == None:
-    #     cut_geometry = get_part_of_line(LineString(list(correct_geometry)[-1]), correct_start, correct_end)
-    # print(f"Cut geometry: {cut_geometry}")
     print(correct_color)
     return cut_geometry, correct_color
 
+TRAIN_FALLBACK_COLOR = "#A9A9A9"
+
+def get_train_route(start: coordinate_point, end: coordinate_point, network: rail_network) -> list[tuple[LineString, str]]:
+    """
+    Returns the subway route between two stations as (LineString, color) sections, one per line used.
+    The route comes from one shortest path query over the compiled rail_network, so transfers are included.
+    If the stations are not connected, a straight line between them is returned.
+    """
+    print(colored("Getting train route from ", 'green') + colored(f"{start.get_name()} to {end.get_name()}", 'blue'))
+    start_coords = start.get_mercator_coordinates()
+    end_coords = end.get_mercator_coordinates()
+    try:
+        sections = network.route(start_coords, end_coords)
+    except nx.NetworkXNoPath:
+        print(colored(f"No subway connection between {start.get_name()} and {end.get_name()}, drawing a straight line instead", 'red'))
+        return [(LineString([start_coords, end_coords]), TRAIN_FALLBACK_COLOR)]
+    print(colored(f"Train route uses {len(sections)} line(s): ", 'green') + colored(f"{[color for _, color in sections]}", 'blue'))
+    return sections
+
 import numpy as np
 # if __name__ == "__main__":
 #     file = "/home/honney/projects/gps-animation/input/subway_map.geojson"
@@ -251,23 +250,33 @@ import numpy as np
 #         colors=['red']  # Assuming train lines are red
 #     )
 
-def get_car_line(start: coordinate_point, end: coordinate_point, debug = 0) -> LineString:
+def get_car_line(start: coordinate_point, end: coordinate_point, G_proj = None, debug = 0) -> LineString:
     """
     Returns a LineString of the shortest driving route between (lat, lon) points.
     Output is in EPSG:3857 (Web Mercator).
+    G_proj: shared projected driving graph (see graph_store), if None a graph around start is downloaded
     """
     start = start.coord()
     end = end.coord()
     print(colored("Getting car line from ", 'green') + colored(f"{start} to {end}", 'blue'))
-    # Build graph in WGS84 (lat, lon required here!)
-    G = ox.graph_from_point(
-        (start[0], start[1]),  # (lat, lon)
-        dist=5000,
-        network_type="drive"   # 🚗 driving network instead of walking
-    )
 
-    # Project to EPSG:3857
-    G_proj = ox.project_graph(G, to_crs="EPSG:3857")
+    cache_key = routes.create_key("car", start, end, get_graph_version(G_proj, "drive"))
+    cached_result = routes.get(cache_key)
+    if cached_result is not None:
+        print(colored(f"Loading cached car line from {routes.path}", 'yellow'))
+        return cached_result
+
+    if G_proj is None:
+        # Build graph in WGS84 (lat, lon required here!)
+        G = fetch_overpass(
+            ox.graph_from_point,
+            (start[0], start[1]),  # (lat, lon)
+            dist=5000,
+            network_type="drive"   # 🚗 driving network instead of walking
+        )
+
+        # Project to EPSG:3857
+        G_proj = ox.project_graph(G, to_crs="EPSG:3857")
 
     # Project input points to EPSG:3857
     start_proj = ox.projection.project_geometry(Point(start[1], start[0]), crs="EPSG:4326", to_crs="EPSG:3857")[0]
@@ -284,7 +293,9 @@ def get_car_line(start: coordinate_point, end: coordinate_point, debug = 0) -> L
 
     # Build LineString in EPSG:3857
     route_coords = [(G_proj.nodes[node]['x'], G_proj.nodes[node]['y']) for node in route]
-    return LineString(route_coords)
+    line_string = LineString(route_coords)
+    routes.put(cache_key, line_string, "car")
+    return line_string
 
 # if __name__ == "__main__":
 #     point1 = coordinate_point(35.7140705, 139.8026836, "Asakusa Sta.", "13:55", "13:57", None)
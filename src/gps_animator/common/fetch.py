@@ -0,0 +1,84 @@
+import re
+import time
+import threading
+import requests
+import osmnx as ox
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Hashable
+from termcolor import colored
+from gps_animator.config import settings
+
+### Global Variables
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# osmnx reads the Overpass server from its global settings, queries against one server may run at the same time
+_overpass_lock = threading.Condition()
+_overpass_queries = 0
+
+def is_retryable(error: Exception) -> bool:
+    """Connection problems, timeouts and overloaded servers are worth another try, everything else is not."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUS
+    # osmnx reports answers it can't parse as ValueErrors, with the status code only in the message
+    if isinstance(error, ValueError):
+        status = re.search(r"responded: (\d{3})", str(error))
+        if status is not None and int(status.group(1)) in RETRY_STATUS:
+            return True
+        # an OK response that is not JSON (cut off, an error page) is, a bad request or an area without data is not
+        ok = status is None or int(status.group(1)) < 400
+        return ok and isinstance(error.__cause__, requests.JSONDecodeError)
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+def with_retries(function: Callable, *args, attempts: int = settings.FETCH_RETRIES, backoff: float = settings.FETCH_BACKOFF, **kwargs):
+    """Calls function, trying again after backoff, 2 * backoff, ... seconds while it fails with a retryable error."""
+    for attempt in range(attempts):
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            delay = backoff * 2**attempt
+            print(colored(f"{getattr(function, '__name__', 'Fetch')} failed: {e}. Retrying in {delay:g}s", 'yellow'))
+            time.sleep(delay)
+
+def fetch_overpass(function: Callable, *args, overpass_url: str|None = None, **kwargs):
+    """
+    Runs the osmnx query function (graph_from_bbox, features_from_bbox, ...) with retries against
+    overpass_url, by default settings.OVERPASS_URL. osmnx reads the server from its global settings,
+    so a query against another server waits until the running ones are done before it sets it.
+    """
+    global _overpass_queries
+    overpass_url = overpass_url or settings.OVERPASS_URL
+    with _overpass_lock:
+        _overpass_lock.wait_for(lambda: _overpass_queries == 0 or ox.settings.overpass_url == overpass_url)
+        ox.settings.overpass_url = overpass_url
+        _overpass_queries += 1
+    try:
+        return with_retries(function, *args, **kwargs)
+    finally:
+        with _overpass_lock:
+            _overpass_queries -= 1
+            _overpass_lock.notify_all()
+
+def fetch_all(tasks: dict[Hashable, Callable], workers: int = settings.FETCH_WORKERS) -> dict[Hashable, object]:
+    """
+    Runs the fetches in tasks (key -> function without arguments) on at most workers threads.
+    Returns key -> result, or the exception a task raised, so one failed fetch does not cancel the others.
+    """
+    results = {}
+    if len(tasks) == 0:
+        return results
+    if workers <= 1 or len(tasks) == 1:
+        for key, task in tasks.items():
+            try:
+                results[key] = task()
+            except Exception as e:
+                results[key] = e
+        return results
+    with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = {executor.submit(task): key for key, task in tasks.items()}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+    return results
@@ -0,0 +1,91 @@
+import os
+import osmnx as ox
+import networkx as nx
+from termcolor import colored
+from gps_animator.config import settings
+from gps_animator.common.fetch import fetch_overpass
+from gps_animator.common.profiling import tracer
+
+### Global Variables
+GRAPH_CRS = "EPSG:3857"
+network_types = {"walking": "walk", "car": "drive"}
+
+class graph_store:
+    """
+    Keeps one projected routing graph per network type for a whole trip.
+
+    Graphs are built once for the (expanded) trip bbox, held in memory for the
+    rest of the run and saved as GraphML in the cache folder, so the next run
+    with the same bbox loads them from disk instead of downloading them again.
+    """
+    graphs: dict[tuple[str, tuple[float, float, float, float]], nx.MultiDiGraph]
+
+    def __init__(self, cache_dir: str = os.path.join(settings.CACHE, "graphs")):
+        self.cache_dir = cache_dir
+        self.graphs = {}
+
+    def create_key(self, bbox: tuple[float, float, float, float], network_type: str) -> tuple[str, tuple[float, float, float, float]]:
+        return network_type, tuple(round(float(value), 4) for value in bbox)
+
+    def get_cache_file(self, key: tuple[str, tuple[float, float, float, float]]) -> str:
+        network_type, (min_lon, min_lat, max_lon, max_lat) = key
+        return os.path.join(self.cache_dir, f"{network_type}_{min_lon}_{min_lat}_{max_lon}_{max_lat}.graphml")
+
+    def get_graph(self, bbox: tuple[float, float, float, float], network_type: str) -> nx.MultiDiGraph:
+        """
+        Returns the projected (EPSG:3857) graph of the given network type ("walk" or "drive") covering bbox.
+        bbox: (min_lon, min_lat, max_lon, max_lat) in WGS84
+        """
+        key = self.create_key(bbox, network_type)
+        if key in self.graphs:
+            tracer.count("graph cache hits")
+            return self.graphs[key]
+
+        cache_file = self.get_cache_file(key)
+        G_proj = None
+        if os.path.exists(cache_file):
+            try:
+                with tracer.span("graph load", "routing", network_type=network_type):
+                    G_proj = ox.load_graphml(cache_file)
+                tracer.count("graph cache hits")
+                print(colored(f"Loading cached {network_type} graph from {cache_file}", 'yellow'))
+            except Exception as e:
+                print(colored(f"Cache file {cache_file} is corrupted or unreadable: {e}. Rebuilding...", 'red'))
+                try:
+                    os.remove(cache_file)
+                except OSError:
+                    pass
+
+        if G_proj is None:
+            print(colored(f"Building {network_type} graph for bbox ", 'green') + colored(f"{key[1]}", 'blue'))
+            tracer.count("graph cache misses")
+            with tracer.span("graph build", "routing", network_type=network_type):
+                G = fetch_overpass(ox.graph_from_bbox, key[1], network_type=network_type)
+                G_proj = ox.project_graph(G, to_crs=GRAPH_CRS)
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                ox.save_graphml(G_proj, cache_file)
+                print(colored(f"Cached {network_type} graph to {cache_file}", 'green'))
+            except Exception as e:
+                print(colored(f"Failed to cache graph: {e}", 'red'))
+
+        # routes cached for this graph are only valid for this exact graph (see route_cache)
+        G_proj.graph["version"] = self.get_version(key)
+        self.graphs[key] = G_proj
+        return G_proj
+
+    def get_version(self, key: tuple[str, tuple[float, float, float, float]]) -> str:
+        network_type, (min_lon, min_lat, max_lon, max_lat) = key
+        return f"{network_type}_{min_lon}_{min_lat}_{max_lon}_{max_lat}_osmnx{ox.__version__}"
+
+    def clear(self):
+        self.graphs = {}
+
+# one store per run, shared by every leg
+graphs = graph_store()
+
+def get_graph(bbox: tuple[float, float, float, float], network_type: str) -> nx.MultiDiGraph:
+    return graphs.get_graph(bbox, network_type)
+
+def get_version(bbox: tuple[float, float, float, float], network_type: str) -> str:
+    return graphs.get_version(graphs.create_key(bbox, network_type))
@@ -0,0 +1,185 @@
+import os
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+from typing import Iterator
+from gps_animator.common.points import NO_ARRIVAL, NO_DEPARTURE, departure_types
+
+### Global Variables
+CHUNK_SIZE = 100_000
+# accepted column names (lower case) for every column of point_collection
+column_aliases = {
+    "latitude":   ["latitude", "lat"],
+    "longitude":  ["longitude", "lon", "lng"],
+    "name":       ["name"],
+    "arrival":    ["arrival_time", "arrival", "time", "timestamp"],
+    "departure":  ["departure_time", "departure", "time", "timestamp"],
+    "icon":       ["icon"],
+    "icon_scale": ["icon_scale"],
+    "dep_type":   ["departure_type", "dep_type"],
+}
+
+class time_parser:
+    """
+    Converts a column of times to seconds, the way point_collection stores them.
+    Numbers are taken as seconds, "%H:%M" strings like in points.txt, and full timestamps
+    (GPS logs) become seconds since midnight of the day of the first timestamp seen.
+    """
+
+    def __init__(self):
+        self.day_start = None
+
+    def __call__(self, values: pd.Series, default: int) -> np.ndarray:
+        seconds = pd.to_numeric(values, errors="coerce")
+        rest = values.notna() & seconds.isna()
+        if rest.any():
+            clock = pd.to_datetime(values[rest], format="%H:%M", errors="coerce")
+            seconds[rest] = clock.dt.hour * 3600 + clock.dt.minute * 60
+            rest = rest & seconds.isna()
+        if rest.any():
+            timestamps = pd.to_datetime(values[rest], utc=True, format="ISO8601")
+            if self.day_start is None:
+                self.day_start = timestamps.min().normalize()
+            seconds[rest] = (timestamps - self.day_start).dt.total_seconds()
+        return seconds.fillna(default).to_numpy(dtype=np.int64, copy=True)
+
+def to_departure_types(values: pd.Series) -> np.ndarray:
+    numbers = pd.to_numeric(values, errors="coerce")
+    names = values.where(numbers.isna()).astype(str).str.lower().map(departure_types)
+    types = numbers.fillna(names).fillna(0).to_numpy(dtype=np.int64, copy=True)
+    types[(types < 0) | (types > 3)] = 0
+    return types
+
+def frame_to_columns(frame: pd.DataFrame, parse_time: time_parser) -> dict[str, np.ndarray]:
+    """Maps a chunk of a table onto the columns of point_collection, all parsed in bulk."""
+    names = {column.lower(): column for column in frame.columns}
+    def find(column):
+        for alias in column_aliases[column]:
+            if alias in names:
+                return frame[names[alias]]
+        return None
+
+    latitude = find("latitude")
+    longitude = find("longitude")
+    if latitude is None or longitude is None:
+        raise ValueError(f"No latitude/longitude columns in {list(frame.columns)}")
+    columns = {
+        "latitude": pd.to_numeric(latitude).to_numpy(dtype=float),
+        "longitude": pd.to_numeric(longitude).to_numpy(dtype=float),
+    }
+    arrival = find("arrival")
+    departure = find("departure")
+    columns["arrival"] = None if arrival is None else parse_time(arrival, NO_ARRIVAL)
+    columns["departure"] = None if departure is None else parse_time(departure, NO_DEPARTURE)
+    dep_type = find("dep_type")
+    columns["dep_type"] = None if dep_type is None else to_departure_types(dep_type)
+    for column in ("name", "icon"):
+        values = find(column)
+        columns[column] = None if values is None else values.astype(object).where(values.notna(), None).to_numpy()
+    icon_scale = find("icon_scale")
+    if icon_scale is not None:
+        icon_scale = pd.to_numeric(icon_scale, errors="coerce").astype(object)
+        columns["icon_scale"] = icon_scale.where(icon_scale.notna(), None).to_numpy()
+    else:
+        columns["icon_scale"] = None
+    return columns
+
+def iter_csv_chunks(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, np.ndarray]]:
+    parse_time = time_parser()
+    for frame in pd.read_csv(file_path, chunksize=chunk_size, skipinitialspace=True):
+        yield frame_to_columns(frame, parse_time)
+
+def iter_ndjson_chunks(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, np.ndarray]]:
+    """One JSON object per line, with the same keys as the entries of points.txt."""
+    parse_time = time_parser()
+    for frame in pd.read_json(file_path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False):
+        yield frame_to_columns(frame, parse_time)
+
+def iter_gpx_chunks(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, np.ndarray]]:
+    """
+    Track, route and way points of a GPX file, parsed incrementally.
+    A GPX track is walked from point to point, the last point is the end of it.
+    """
+    parse_time = time_parser()
+    rows = {"lat": [], "lon": [], "time": [], "name": [], "dep_type": []}
+    point_tags = ("trkpt", "rtept", "wpt")
+    # open elements, finished ones are removed from their parent so the tree doesn't grow with the track
+    parents = []
+    for event, element in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag not in point_tags:
+            # children of a point are read when the point ends
+            if len(parents) > 0 and parents[-1].tag.rsplit("}", 1)[-1] not in point_tags:
+                parents[-1].remove(element)
+            continue
+        rows["lat"].append(element.get("lat"))
+        rows["lon"].append(element.get("lon"))
+        time = None
+        name = None
+        for child in element:
+            child_tag = child.tag.rsplit("}", 1)[-1]
+            if child_tag == "time":
+                time = child.text
+            elif child_tag == "name":
+                name = child.text
+        rows["time"].append(time)
+        rows["name"].append(name)
+        rows["dep_type"].append(departure_types["walking"])
+        # the parsed point is not needed anymore
+        if len(parents) > 0:
+            parents[-1].remove(element)
+        # one point is held back, so the last chunk always holds the last point
+        if len(rows["lat"]) > chunk_size:
+            yield frame_to_columns(pd.DataFrame({key: values[:chunk_size] for key, values in rows.items()}), parse_time)
+            rows = {key: values[chunk_size:] for key, values in rows.items()}
+    if len(rows["lat"]) > 0:
+        rows["dep_type"][-1] = departure_types["end"]
+        yield frame_to_columns(pd.DataFrame(rows), parse_time)
+
+readers = {
+    ".csv": iter_csv_chunks,
+    ".ndjson": iter_ndjson_chunks,
+    ".jsonl": iter_ndjson_chunks,
+    ".gpx": iter_gpx_chunks,
+}
+
+def iter_point_chunks(file_path: str, chunk_size: int = CHUNK_SIZE, every: int = 1, time_step: float|None = None) -> Iterator[dict[str, np.ndarray]]:
+    """
+    Reads a CSV, newline delimited JSON or GPX file in chunks of at most chunk_size rows.
+
+    every: only keep every n-th row
+    time_step: of the rows every keeps, only keep the first of every time_step seconds (by arrival)
+    The last row is always kept, so a downsampled track still ends where it ended.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in readers:
+        raise ValueError(f"Unsupported file type: {extension}")
+    row_offset = 0
+    last_bucket = None
+    chunks = readers[extension](file_path, chunk_size)
+    # one chunk is read ahead to know which one is the last
+    columns = next(chunks, None)
+    while columns is not None:
+        next_columns = next(chunks, None)
+        count = len(columns["latitude"])
+        keep = np.ones(count, dtype=bool)
+        if every > 1:
+            keep &= (row_offset + np.arange(count)) % every == 0
+        if time_step is not None and columns["arrival"] is not None:
+            kept = np.nonzero(keep)[0]
+            buckets = columns["arrival"][kept] // time_step
+            first = np.ones(len(kept), dtype=bool)
+            first[1:] = buckets[1:] != buckets[:-1]
+            if last_bucket is not None and len(kept) > 0:
+                first[0] = buckets[0] != last_bucket
+            keep[kept[~first]] = False
+            last_bucket = buckets[-1] if len(kept) > 0 else last_bucket
+        if next_columns is None and count > 0:
+            keep[-1] = True
+        row_offset += count
+        yield {column: (None if values is None else values[keep]) for column, values in columns.items()}
+        columns = next_columns
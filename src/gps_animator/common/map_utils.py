@@ -1,77 +1,65 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
-import contextily as ctx
-import osmnx as ox
-import pandas as pd
 from typing import Sequence, Union
 from PIL import Image
-from pyproj import Transformer
-from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 from shapely.geometry import box
-import re
+from gps_animator.common.tile_store import tiles, auto_zoom, tile_meters, TILE_SIZE
+from gps_animator.common.projection import bbox_to_mercator
+from gps_animator.config import settings
+from gps_animator.common.profiling import tracer
 
 # Global Variables
 assets  = f"/home/honney/projects/gps-animation/assets"
 output  = f"/home/honney/projects/gps-animation/output"
-TILE_SIZE = 256
 
 def bbox_to_box(bbox: Sequence[float]) -> box:
     min_lon, min_lat, max_lon, max_lat = bbox
     return box(min_lon, min_lat, max_lon, max_lat)
 
-def save_osm_detail_map(bbox: Sequence[float], filename=f"{output}/detail.png", dpi=300) -> Union[str, os.PathLike]:
+def get_background_size(bbox_mercator: Sequence[float], pixel_width: int) -> tuple[int, int]:
+    """Pixel size of the background for a bbox in Web Mercator meters, pixel_width wide."""
+    minx, miny, maxx, maxy = bbox_mercator
+    return pixel_width, max(10, int(pixel_width * ((maxy - miny) / (maxx - minx))))
+
+def compose_map(bbox: Sequence[float], provider: str, pixel_width: int, zoom: int|None = None) -> np.ndarray:
     """
-    Saves a map image from OpenStreetMap that is precisely cropped to the given bbox.
+    Stitches the tiles of provider covering bbox (lon/lat) and crops them to the exact Mercator bbox,
+    resampled to get_background_size. zoom defaults to the smallest one with enough detail for pixel_width.
+    Returns the RGBA pixels.
     """
-    # Create a GeoDataFrame from the bounding box, starting in standard lat/lon
-    bbox_poly = bbox_to_box(bbox)
-    gdf = gpd.GeoDataFrame(
-        {"geometry": [bbox_poly]},
-        crs="EPSG:4326"
-    )
-
-    # Project the GeoDataFrame to Web Mercator (EPSG:3857)
-    gdf_mercator = gdf.to_crs(epsg=3857)
-
-    # Get the exact bounds from the projected GeoDataFrame
-    minx, miny, maxx, maxy = gdf_mercator.total_bounds
-
-    # Create the plot
-    fig, ax = plt.subplots(figsize=(8, 8), dpi=dpi)
-
-    # Set the axes limits to the exact bounding box
-    ax.set_xlim(minx, maxx)
-    ax.set_ylim(miny, maxy)
+    bbox_mercator = bbox_to_mercator(bbox)
+    minx, miny, maxx, maxy = bbox_mercator
+    if maxx <= minx or maxy <= miny:
+        raise ValueError("Converted Mercator bbox has non-positive extent")
+    if zoom is None:
+        zoom = auto_zoom(bbox_mercator, pixel_width)
+    with tracer.span("basemap fetch", "fetch", provider=provider, zoom=zoom):
+        mosaic, (extent_minx, _, _, extent_maxy) = tiles.get_mosaic(provider, bbox_mercator, zoom)
 
-    # Turn off the axis labels, ticks, etc.
-    ax.axis("off")
-    
-    # Add the basemap, which will now conform to the set limits
-    ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik, zoom=15) # 17 very small stuff
-
-    # Save the figure without any extra padding
-    plt.tight_layout(pad=0)
-    plt.savefig(filename, dpi=dpi, bbox_inches="tight", pad_inches=0, transparent=True)
-    plt.close()
+    # crop box in mosaic pixels, PIL resamples fractional boxes exactly
+    pixels_per_meter = TILE_SIZE / tile_meters(zoom)
+    crop = (
+        (minx - extent_minx) * pixels_per_meter,
+        (extent_maxy - maxy) * pixels_per_meter,
+        (maxx - extent_minx) * pixels_per_meter,
+        (extent_maxy - miny) * pixels_per_meter,
+    )
+    image = Image.fromarray(mosaic).resize(get_background_size(bbox_mercator, pixel_width), Image.LANCZOS, box=crop)
+    return np.asarray(image)
 
-    if os.path.isfile(filename): 
+def save_map(bbox: Sequence[float], provider: str, filename: str, pixel_width: int, zoom: int|None = None) -> str:
+    Image.fromarray(compose_map(bbox, provider, pixel_width, zoom)).save(filename)
+    if os.path.isfile(filename):
         print(f"Successfully saved map to {filename}")
         return filename
-    
-def save_satellite_map(bbox: Sequence[float], filename=f"{output}/satellite.png", dpi=300) -> str:
-    bbox_poly = bbox_to_box(bbox)
-
-    gdf = gpd.GeoDataFrame(
-        {"geometry": [bbox_poly]},
-        crs="EPSG:4326"
-    ).to_crs(epsg=3857)
 
-    ax = gdf.plot(facecolor="none", edgecolor="none")  # no bbox outline
-    ctx.add_basemap(ax, source=ctx.providers.Esri.WorldImagery)
-    plt.axis("off")
-    plt.savefig(filename, dpi=dpi, bbox_inches="tight")
-    plt.close()
+def save_osm_detail_map(bbox: Sequence[float], filename=f"{output}/detail.png", profile: str|None = None) -> Union[str, os.PathLike]:
+    """
+    Saves a map image from OpenStreetMap that is precisely cropped to the given bbox,
+    at the resolution of the render profile.
+    """
+    render_profile = settings.get_render_profile(profile)
+    return save_map(bbox, "osm", filename, render_profile["background_width"], zoom=render_profile["detail_zoom"]) # 17 very small stuff
 
-    if os.path.isfile(filename): return filename
\ No newline at end of file
+def save_satellite_map(bbox: Sequence[float], filename=f"{output}/satellite.png", profile: str|None = None) -> str:
+    return save_map(bbox, "satellite", filename, settings.get_render_profile(profile)["background_width"])
@@ -1,11 +1,34 @@
 import math
 import json
+import numpy as np
 from gps_animator.common.utils import convert_time_to_seconds, convert_WGS84_Mercator
+from gps_animator.common.projection import wgs84_to_mercator
 
 ### Global Variables
 time_format_code = "%H:%M"
+NO_ARRIVAL = 0
+NO_DEPARTURE = 2**32
+departure_types = {"end": 0, "walking": 1, "train": 2, "car": 3}
+
+def to_seconds(value: int|str|None, default: int) -> int:
+    """Normalizes an arrival/departure time (seconds or "%H:%M") to seconds."""
+    if value is None:
+        return default
+    elif isinstance(value, str):
+        return convert_time_to_seconds(value)
+    return int(value)
+
+def to_departure_type(departure_type: int|str|None) -> int:
+    if type(departure_type) is str:
+        return departure_types.get(departure_type.lower(), 0)
+    elif departure_type is None:
+        return 0
+    elif departure_type > 0 and departure_type <= 3:
+        return int(departure_type)
+    return 0
 
 class coordinate_point:
+    __slots__ = ("name", "latitude", "longitude", "arrival", "departure", "icon", "icon_scale")
     name:       str
     latitude:   float
     longitude:  float
@@ -18,22 +41,8 @@ class coordinate_point:
         self.latitude = lat
         self.longitude = lon
         self.name = name
-        if arrival is None:
-            self.arrival = 0
-        elif type(arrival) is int:
-            self.arrival = arrival
-        elif type(arrival) is str:
-            self.arrival = convert_time_to_seconds(arrival)
-        else:
-            self.arrival = arrival
-        if departure is None:
-            self.departure = 2**32
-        elif type(departure) is int:
-            self.departure = departure
-        elif type(departure) is str:
-            self.departure = convert_time_to_seconds(departure)
-        else:
-            self.departure = departure
+        self.arrival = to_seconds(arrival, NO_ARRIVAL)
+        self.departure = to_seconds(departure, NO_DEPARTURE)
         self.icon = icon
         self.icon_scale = icon_scale
 
@@ -42,25 +51,22 @@ class coordinate_point:
 
     def get_name(self):
         return self.name
-    
+
     def get_icon(self):
         return self.icon
-    
+
     def get_icon_scale(self):
         return self.icon_scale
-    
+
     def get_arrival(self):
         return self.arrival
-    
+
     def get_departure(self):
         return self.departure
 
     def get_details(self):
         return (self.latitude, self.longitude, self.name, self.arrival, self.departure, self.icon, self.icon_scale)
 
-    def get_icon(self):
-        return self.icon
-
     def __str__(self):
         return f"Point {self.name} is at the coordinates: ({self.latitude}|{self.longitude}) and stay was from {self.arrival} to {self.departure}"
 
@@ -71,72 +77,168 @@ class coordinate_point:
         return f"{self.latitude}; {self.longitude}; {self.name}; {self.arrival}; {self.departure}; {self.icon}; {self.icon_scale}"
 
 class point_collection:
-    points: list[coordinate_point, int] # list of points and their departure_types
+    """
+    Points and their departure types, stored column wise in a NumPy structured array.
+
+    Rows are kept sorted by arrival (stable, like sorting the list of points was), so the
+    arrival column doubles as the time index. The name and coordinate indexes are dicts
+    that are rebuilt on the first lookup after a change. coordinate_point objects are only
+    created when they are asked for.
+    """
+    dtype = np.dtype([
+        ("latitude",   "f8"),
+        ("longitude",  "f8"),
+        ("arrival",    "i8"),
+        ("departure",  "i8"),
+        ("dep_type",   "i1"),
+        ("name",       "O"),
+        ("icon",       "O"),
+        ("icon_scale", "O"),
+    ])
+    data: np.ndarray # rows [0, size) are the points, the rest is spare capacity
+    size: int
 
     def __init__(self):
-        self.points = []
+        self.data = np.zeros(16, dtype=self.dtype)
+        self.size = 0
+        self.changed()
+
+    def changed(self):
+        self.objects = None
+        self.name_index = None
+        self.coordinate_index = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    @property
+    def points(self) -> list[tuple[coordinate_point, int]]: # list of points and their departure_types
+        return list(zip(self.get_points(), self.rows["dep_type"].tolist()))
+
+    def reserve(self, size: int):
+        if size > len(self.data):
+            data = np.zeros(max(size, 2 * len(self.data)), dtype=self.dtype)
+            data[:self.size] = self.rows
+            self.data = data
 
     def add_point(self, point: coordinate_point, departure_type: int|str|None):
-        if type(departure_type) is str:
-            if departure_type.lower() == "end":
-                departure_type = 0
-            elif departure_type.lower() == "walking":
-                departure_type = 1
-            elif departure_type.lower() == "train":
-                departure_type = 2
-            elif departure_type.lower() == "car":
-                departure_type = 3
-            else:
-                departure_type = 0
-        elif departure_type is None:
-            departure_type = 0
-        elif type(departure_type) is int:
-            if departure_type > 0 and departure_type <= 3:
-                departure_type = departure_type
-            else:
-                departure_type = 0
-        self.points.append((point, departure_type))
+        self.reserve(self.size + 1)
+        # insert after all points with the same arrival, so equal arrivals keep their order
+        idx = int(np.searchsorted(self.rows["arrival"], point.arrival, side="right"))
+        self.data[idx+1:self.size+1] = self.data[idx:self.size]
+        self.data[idx] = (
+            point.latitude, point.longitude, point.arrival, point.departure,
+            to_departure_type(departure_type), point.name, point.icon, point.icon_scale
+        )
+        self.size += 1
+        self.changed()
+
+    def add_columns(self, latitude, longitude, arrival=None, departure=None, dep_type=None, name=None, icon=None, icon_scale=None):
+        """
+        Adds many points at once from columns (arrays or lists of equal length).
+        arrival/departure have to be in seconds already, missing columns get the defaults of coordinate_point.
+        """
+        latitude = np.asarray(latitude, dtype=float)
+        count = len(latitude)
+        rows = np.zeros(count, dtype=self.dtype)
+        rows["latitude"] = latitude
+        rows["longitude"] = longitude
+        rows["arrival"] = NO_ARRIVAL if arrival is None else arrival
+        rows["departure"] = NO_DEPARTURE if departure is None else departure
+        rows["dep_type"] = 0 if dep_type is None else dep_type
+        rows["name"] = None if name is None else name
+        rows["icon"] = None if icon is None else icon
+        rows["icon_scale"] = None if icon_scale is None else icon_scale
+
+        rows = rows[np.argsort(rows["arrival"], kind="stable")]
+        self.reserve(self.size + count)
+        # recorded tracks arrive in time order, then the new rows only need to be appended
+        needs_sort = self.size > 0 and count > 0 and rows["arrival"][0] < self.data["arrival"][self.size-1]
+        self.data[self.size:self.size+count] = rows
+        self.size += count
+        if needs_sort:
+            self.data[:self.size] = self.rows[np.argsort(self.rows["arrival"], kind="stable")]
+        self.changed()
 
     def remove_point(self, point: coordinate_point):
-        self.points.remove(point)
+        rows = self.rows
+        matches = np.nonzero(
+            (rows["latitude"] == point.latitude) & (rows["longitude"] == point.longitude) &
+            (rows["arrival"] == point.arrival) & (rows["name"] == point.name)
+        )[0]
+        if len(matches) == 0:
+            raise ValueError(f"{point.name} is not in the collection")
+        idx = matches[0]
+        self.data[idx:self.size-1] = self.data[idx+1:self.size]
+        self.size -= 1
+        self.changed()
 
     def sort_points(self):
-        self.points.sort(key=lambda p: (p[0].arrival if p[0].arrival is not None else 0))
+        # rows are always sorted by arrival
+        pass
+
+    def create_point(self, idx: int) -> coordinate_point:
+        row = self.data[idx]
+        return coordinate_point(float(row["latitude"]), float(row["longitude"]), row["name"], int(row["arrival"]), int(row["departure"]), row["icon"], row["icon_scale"])
+
+    def get_point_at(self, idx: int) -> coordinate_point:
+        if self.objects is not None:
+            return self.objects[idx]
+        return self.create_point(idx)
 
     def get_points(self):
-        self.sort_points()
-        points = [point for point, _ in self.points]
-        return points
-
-    def get_point(self, name: str):
-        for point, _ in self.points:
-            if point.name == name:
-                return point
-        return None
-
-    def get_point(self, time: int):
-        for point, _ in self.points:
-            if (point.arrival if point.arrival is not None else 0) <= time and (point.departure if point.departure is not None else float('inf')) >= time:
-                return point
-        return None
-    
-    def get_point(self, latitude: float, longitude: float):
-        for point, _ in self.points:
-            if point.latitude == latitude and point.longitude == longitude:
-                return point
-        return None
+        if self.objects is None:
+            self.objects = [self.create_point(idx) for idx in range(self.size)]
+        return list(self.objects)
+
+    def get_point_by_name(self, name: str):
+        if self.name_index is None:
+            self.name_index = {}
+            for idx, point_name in enumerate(self.rows["name"].tolist()):
+                self.name_index.setdefault(point_name, idx)
+        idx = self.name_index.get(name)
+        return None if idx is None else self.get_point_at(idx)
+
+    def get_point_by_time(self, time: int):
+        # only points that arrived up to time can be there, the first of them still there is returned
+        end = int(np.searchsorted(self.rows["arrival"], time, side="right"))
+        present = np.nonzero(self.rows["departure"][:end] >= time)[0]
+        return None if len(present) == 0 else self.get_point_at(present[0])
+
+    def get_point_by_coordinates(self, latitude: float, longitude: float):
+        if self.coordinate_index is None:
+            self.coordinate_index = {}
+            for idx, coordinates in enumerate(zip(self.rows["latitude"].tolist(), self.rows["longitude"].tolist())):
+                self.coordinate_index.setdefault(coordinates, idx)
+        idx = self.coordinate_index.get((latitude, longitude))
+        return None if idx is None else self.get_point_at(idx)
+
+    def get_point(self, *args):
+        """get_point(name), get_point(time) or get_point(latitude, longitude)"""
+        if len(args) == 2:
+            return self.get_point_by_coordinates(*args)
+        elif isinstance(args[0], str):
+            return self.get_point_by_name(args[0])
+        return self.get_point_by_time(args[0])
+
+    def get_coordinates(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (latitudes, longitudes) of all points."""
+        return self.rows["latitude"], self.rows["longitude"]
 
     def get_mercator_coordinates(self):
-        self.sort_points()
-        return [point.get_mercator_coordinates() for point in self.points]
+        x, y = wgs84_to_mercator(*self.get_coordinates())
+        return list(zip(x.tolist(), y.tolist()))
 
     def get_all(self):
-        self.sort_points()
         return self.points
 
     def get_point_data(self):
         array = []
-        for point, _ in self.points:
+        for point in self.get_points():
             if point.icon is not None:
                 array.append((point.latitude, point.longitude, point.name, point.icon))
             else:
@@ -144,22 +246,10 @@ class point_collection:
         return array
 
     def get_minmax(self):
-        
-        min_lat = math.inf
-        max_lat = -math.inf
-        min_lon = math.inf
-        max_lon = -math.inf
-
-        for point in self.get_points():
-            lat = point.latitude
-            lon = point.longitude
-
-            if lat < min_lat: min_lat = lat
-            elif lat > max_lat: max_lat = lat
-            if lon < min_lon: min_lon = lon
-            elif lon > max_lon: max_lon = lon
-
-        return min_lon, min_lat, max_lon, max_lat
+        if self.size == 0:
+            return math.inf, math.inf, -math.inf, -math.inf
+        latitudes, longitudes = self.get_coordinates()
+        return float(longitudes.min()), float(latitudes.min()), float(longitudes.max()), float(latitudes.max())
 
     def __str__(self):
         string = ""
@@ -190,14 +280,23 @@ class point_collection:
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
-        for entry in data:
-            point = coordinate_point(
-                float(entry["latitude"]),
-                float(entry["longitude"]),
-                entry["name"],
-                entry["arrival"],
-                entry["departure"],
-                entry["icon"],
-                entry.get("icon_scale"),   # ✅ safe loading (None if missing)
-            )
-            self.add_point(point, entry["dep_type"])
+        self.add_columns(
+            latitude = [float(entry["latitude"]) for entry in data],
+            longitude = [float(entry["longitude"]) for entry in data],
+            arrival = [to_seconds(entry["arrival"], NO_ARRIVAL) for entry in data],
+            departure = [to_seconds(entry["departure"], NO_DEPARTURE) for entry in data],
+            dep_type = [to_departure_type(entry["dep_type"]) for entry in data],
+            name = [entry["name"] for entry in data],
+            icon = [entry["icon"] for entry in data],
+            icon_scale = [entry.get("icon_scale") for entry in data],   # ✅ safe loading (None if missing)
+        )
+
+    def load_stream(self, file_path: str, chunk_size: int = 100_000, every: int = 1, time_step: float|None = None):
+        """
+        Loads a large CSV, newline delimited JSON or GPX file chunk by chunk (see ingest.iter_point_chunks).
+        every/time_step downsample while reading.
+        """
+        from gps_animator.common.ingest import iter_point_chunks
+        for columns in iter_point_chunks(file_path, chunk_size, every, time_step):
+            self.add_columns(**columns)
+
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from termcolor import colored
+
+### Global Variables
+NO_SPAN = nullcontext()
+
+class profiler:
+    """
+    Timed spans and counters of one run, off by default.
+
+    While disabled, span returns one shared no-op context and count returns right away,
+    so the instrumented code pays one attribute check. Spans are recorded per process
+    and thread on the monotonic clock, so worker processes can hand theirs back with
+    export and merge. Workers that don't (route_legs) are only seen as the span around them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events = []
+        self.counters = {}
+
+    def span(self, name: str, category: str = "stage", **args):
+        """Context manager timing the block as name, args end up in the trace."""
+        if not self.enabled:
+            return NO_SPAN
+        return self.record(name, category, args)
+
+    @contextmanager
+    def record(self, name: str, category: str, args: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.events.append((name, category, start, end - start, os.getpid(), threading.get_ident(), args))
+
+    def count(self, name: str, amount: int = 1):
+        """Adds amount to the counter name, e.g. cache hits and misses."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def export(self) -> dict:
+        """Spans and counters as plain JSON data, for merge in another process."""
+        return {"events": [list(event) for event in self.events], "counters": dict(self.counters)}
+
+    def merge(self, data: dict):
+        with self.lock:
+            self.events.extend(tuple(event) for event in data["events"])
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_chrome_trace(self) -> dict:
+        """The spans as complete events of the Chrome trace format (chrome://tracing, Perfetto)."""
+        origin = min((event[2] for event in self.events), default=0)
+        events = [
+            {"name": name, "cat": category, "ph": "X", "ts": (start - origin) * 1e6, "dur": duration * 1e6, "pid": pid, "tid": tid, "args": args}
+            for name, category, start, duration, pid, tid, args in self.events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": self.counters}}
+
+    def save_trace(self, file_path: str):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        print(colored(f"Saved trace to {file_path}", 'green'))
+
+    def summary(self) -> str:
+        """Calls, total, mean and max time per span name, slowest first, then the counters."""
+        stats = {}
+        for name, _, _, duration, _, _, _ in self.events:
+            calls, total, longest = stats.get(name, (0, 0.0, 0.0))
+            stats[name] = (calls + 1, total + duration, max(longest, duration))
+        width = max([len(name) for name in stats] + [len(name) for name in self.counters] + [4])
+        lines = [f"{'span':<{width}} {'calls':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (calls, total, longest) in sorted(stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<{width}} {calls:>7} {total:>10.3f} {total / calls * 1000:>10.2f} {longest * 1000:>10.2f}")
+        if len(self.counters) > 0:
+            lines.append("")
+            lines.append(f"{'counter':<{width}} {'count':>7}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<{width}} {value:>7}")
+        return "\n".join(lines)
+
+# one profiler per process, shared by every module
+tracer = profiler()
@@ -0,0 +1,62 @@
+from functools import lru_cache
+import numpy as np
+import pyproj
+from shapely.geometry import LineString
+
+### Global Variables
+WGS84 = "EPSG:4326"     # standard lat/lon
+MERCATOR = "EPSG:3857"  # Web Mercator
+
+@lru_cache(maxsize=None)
+def get_transformer(from_crs: str, to_crs: str) -> pyproj.Transformer:
+    """Builds each transformer once per process."""
+    return pyproj.Transformer.from_crs(pyproj.CRS(from_crs), pyproj.CRS(to_crs), always_xy=True)
+
+def wgs84_to_mercator(latitudes, longitudes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert latitudes/longitudes (WGS84) to Web Mercator (EPSG:3857) coordinates.
+    Takes single values or arrays, returns (x, y) in the same shape.
+    """
+    return get_transformer(WGS84, MERCATOR).transform(np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float))
+
+def mercator_to_wgs84(x, y) -> tuple[np.ndarray, np.ndarray]:
+    """Convert Web Mercator (EPSG:3857) coordinates to (latitudes, longitudes)."""
+    longitudes, latitudes = get_transformer(MERCATOR, WGS84).transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    return latitudes, longitudes
+
+def bbox_to_mercator(bbox: tuple[float, float, float, float]) -> tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) -> (minx, miny, maxx, maxy)"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x, y = wgs84_to_mercator([min_lat, max_lat], [min_lon, max_lon])
+    return float(x[0]), float(y[0]), float(x[1]), float(y[1])
+
+class scene_projection:
+    """
+    Maps Web Mercator coordinates onto the Manim scene, where the map image of
+    bbox_mercator is centered at the origin with the size manim_width x manim_height.
+    """
+
+    def __init__(self, bbox_mercator: tuple[float, float, float, float], manim_width: float, manim_height: float):
+        self.minx, self.miny, self.maxx, self.maxy = bbox_mercator
+        self.merc_width = self.maxx - self.minx
+        self.merc_height = self.maxy - self.miny
+        if self.merc_width <= 0 or self.merc_height <= 0:
+            raise ValueError("Converted Mercator bbox has non-positive extent")
+        self.manim_width = manim_width
+        self.manim_height = manim_height
+
+    def mercator_to_manim(self, x, y) -> np.ndarray:
+        """Returns an (N, 3) array of Manim points (or one (3,) point for single values)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        mx = (x - self.minx) / self.merc_width * self.manim_width - self.manim_width / 2.0
+        my = (y - self.miny) / self.merc_height * self.manim_height - self.manim_height / 2.0
+        return np.stack([mx, my, np.zeros_like(mx)], axis=-1)
+
+    def wgs84_to_manim(self, latitudes, longitudes) -> np.ndarray:
+        return self.mercator_to_manim(*wgs84_to_mercator(latitudes, longitudes))
+
+    def line_to_manim(self, line: LineString) -> np.ndarray:
+        """Converts all vertices of a LineString in EPSG:3857 in one call."""
+        coords = np.asarray(line.coords)
+        return self.mercator_to_manim(coords[:, 0], coords[:, 1])
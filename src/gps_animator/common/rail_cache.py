@@ -0,0 +1,100 @@
+import os
+import re
+import time
+import math
+import geopandas as gpd
+from shapely.geometry import box
+from termcolor import colored
+from gps_animator.config import settings
+
+class rail_cache:
+    """
+    Disk cache for repaired subway networks, stored as GeoParquet per bbox tile.
+
+    Networks are fetched for the given bbox snapped outward to a grid of tile_size degrees.
+    Any later bbox that lies inside a cached, not yet expired tile is served from that file.
+    """
+    file_pattern = re.compile(r"^rail_(-?[\d.]+)_(-?[\d.]+)_(-?[\d.]+)_(-?[\d.]+)\.parquet$")
+
+    def __init__(self, cache_dir: str = os.path.join(settings.CACHE, "rail"), tile_size: float = settings.RAIL_TILE_SIZE, ttl: float = settings.RAIL_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.tile_size = tile_size
+        self.ttl = ttl
+
+    def tile_bbox(self, bbox: tuple[float, float, float, float]) -> tuple[float, float, float, float]:
+        """Snaps bbox outward to the tile grid."""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        size = self.tile_size
+        return (
+            round(math.floor(min_lon / size) * size, 6),
+            round(math.floor(min_lat / size) * size, 6),
+            round(math.ceil(max_lon / size) * size, 6),
+            round(math.ceil(max_lat / size) * size, 6)
+        )
+
+    def get_cache_file(self, tile: tuple[float, float, float, float]) -> str:
+        min_lon, min_lat, max_lon, max_lat = tile
+        return os.path.join(self.cache_dir, f"rail_{min_lon}_{min_lat}_{max_lon}_{max_lat}.parquet")
+
+    def find_cache_file(self, bbox: tuple[float, float, float, float]) -> str|None:
+        """Returns a not expired cache file whose tile contains bbox, or None."""
+        if not os.path.isdir(self.cache_dir):
+            return None
+        min_lon, min_lat, max_lon, max_lat = bbox
+        now = time.time()
+        for file_name in os.listdir(self.cache_dir):
+            match = self.file_pattern.match(file_name)
+            if match is None:
+                continue
+            tile_min_lon, tile_min_lat, tile_max_lon, tile_max_lat = (float(value) for value in match.groups())
+            if not (tile_min_lon <= min_lon and tile_min_lat <= min_lat and tile_max_lon >= max_lon and tile_max_lat >= max_lat):
+                continue
+            cache_file = os.path.join(self.cache_dir, file_name)
+            if now - os.path.getmtime(cache_file) > self.ttl:
+                continue
+            return cache_file
+        return None
+
+    def get_version(self, bbox: tuple[float, float, float, float]) -> str|None:
+        """Names the cached network that serves bbox (file and fetch time), None if there is none."""
+        cache_file = self.find_cache_file(bbox)
+        if cache_file is None:
+            return None
+        return f"{os.path.basename(cache_file)}@{int(os.path.getmtime(cache_file))}"
+
+    def clip(self, rail_lines: gpd.GeoDataFrame, bbox: tuple[float, float, float, float]) -> gpd.GeoDataFrame:
+        """Keeps the (whole) lines that intersect bbox, like the Overpass query for bbox would."""
+        bbox_mercator = gpd.GeoSeries([box(*bbox)], crs="EPSG:4326").to_crs(rail_lines.crs).iloc[0]
+        return rail_lines[rail_lines.intersects(bbox_mercator)]
+
+    def load(self, bbox: tuple[float, float, float, float]) -> gpd.GeoDataFrame|None:
+        cache_file = self.find_cache_file(bbox)
+        if cache_file is None:
+            return None
+        try:
+            rail_lines = gpd.read_parquet(cache_file)
+        # a broken file is an OSError or ArrowInvalid (a ValueError), a missing pyarrow should not be taken for one
+        except (OSError, ValueError) as e:
+            print(colored(f"Cache file {cache_file} is corrupted or unreadable: {e}. Refetching...", 'red'))
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+            return None
+        print(colored(f"Loading cached subway lines from {cache_file}", 'yellow'))
+        return self.clip(rail_lines, bbox)
+
+    def save(self, tile: tuple[float, float, float, float], rail_lines: gpd.GeoDataFrame):
+        cache_file = self.get_cache_file(tile)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write next to the target first, so no half written file ever matches a lookup
+            rail_lines.to_parquet(f"{cache_file}.tmp")
+            os.replace(f"{cache_file}.tmp", cache_file)
+            print(colored(f"Cached subway lines to {cache_file}", 'green'))
+        except (OSError, ValueError) as e:
+            print(colored(f"Failed to cache subway lines: {e}", 'red'))
+            if os.path.exists(f"{cache_file}.tmp"):
+                os.remove(f"{cache_file}.tmp")
+
+rail_lines_cache = rail_cache()
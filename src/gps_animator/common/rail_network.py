@@ -0,0 +1,86 @@
+import numpy as np
+import networkx as nx
+import shapely
+from shapely import STRtree
+from shapely.geometry import LineString, Point
+from gps_animator.common.subway_index import subway_index
+
+### Global Variables
+TRANSFER_DISTANCE = 150 # m, vertices of different lines closer than this are connected by a transfer edge
+TRANSFER_PENALTY = 1000 # m, extra cost of changing to a different line
+
+class rail_network:
+    """
+    Routable graph of a subway network, compiled once from a subway_index.
+
+    Every vertex of every line is a node. Consecutive vertices of a line are joined by
+    line edges, and vertices of different lines within TRANSFER_DISTANCE by transfer
+    edges, which cost TRANSFER_PENALTY extra when the line (color or name) changes.
+    """
+    graph: nx.Graph
+
+    def __init__(self, subway_map: subway_index, transfer_distance: float = TRANSFER_DISTANCE, transfer_penalty: float = TRANSFER_PENALTY):
+        self.index = subway_map
+        self.colors = subway_map.colors.astype(str)
+        self.names = subway_map.names.astype(str)
+        vertices = subway_map.vertices
+        offsets = subway_map.offsets
+        self.line_ids = np.repeat(np.arange(len(subway_map)), np.diff(offsets))
+
+        # line edges: every vertex to the next one, except across the end of a line
+        line_edge = np.ones(max(len(vertices) - 1, 0), dtype=bool)
+        line_edge[offsets[1:-1][offsets[1:-1] > 0] - 1] = False
+        sources = np.nonzero(line_edge)[0]
+        targets = sources + 1
+        lengths = np.hypot(*(vertices[targets] - vertices[sources]).T)
+
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(len(vertices)))
+        self.graph.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), lengths.tolist()))
+
+        # transfer edges: close vertices of different geometries
+        self.tree = STRtree(shapely.points(vertices))
+        if len(vertices) > 0:
+            sources, targets = self.tree.query(shapely.points(vertices), predicate="dwithin", distance=transfer_distance)
+            other_line = (sources < targets) & (self.line_ids[sources] != self.line_ids[targets])
+            sources, targets = sources[other_line], targets[other_line]
+            lengths = np.hypot(*(vertices[targets] - vertices[sources]).T)
+            changes_line = ~self.same_line(self.line_ids[sources], self.line_ids[targets])
+            weights = lengths + changes_line * transfer_penalty
+            for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist()):
+                # keep the cheaper edge if a line edge already joins the two vertices
+                if not self.graph.has_edge(source, target) or self.graph[source][target]["weight"] > weight:
+                    self.graph.add_edge(source, target, weight=weight)
+
+    def same_line(self, line_ids1: np.ndarray, line_ids2: np.ndarray) -> np.ndarray:
+        """Geometries with the same color and name belong to the same line (e.g. the parts of one line)."""
+        return (self.colors[line_ids1] == self.colors[line_ids2]) & (self.names[line_ids1] == self.names[line_ids2])
+
+    def nearest_vertex(self, point: tuple[float, float]) -> int:
+        return int(self.tree.query_nearest(Point(point))[0])
+
+    def route(self, start: tuple[float, float], end: tuple[float, float]) -> list[tuple[LineString, str]]:
+        """
+        Shortest path over the network between two stations (EPSG:3857).
+        Returns one (LineString, color) section per line used, in travel order.
+        """
+        path = nx.shortest_path(self.graph, self.nearest_vertex(start), self.nearest_vertex(end), weight="weight")
+        vertices = self.index.vertices
+        sections = []
+        section = [tuple(vertices[path[0]])]
+        section_line = self.line_ids[path[0]]
+        for node in path[1:]:
+            line_id = self.line_ids[node]
+            if not self.same_line(np.array([section_line]), np.array([line_id]))[0]:
+                if len(section) > 1:
+                    sections.append((LineString(section), self.index.colors[section_line]))
+                # the new section starts where the old one ended, so the sections stay connected
+                section = [section[-1]]
+                section_line = line_id
+            if tuple(vertices[node]) != section[-1]:
+                section.append(tuple(vertices[node]))
+        if len(section) > 1:
+            sections.append((LineString(section), self.index.colors[section_line]))
+        if len(sections) == 0:
+            raise ValueError("Start and end station are at the same spot of the subway network.")
+        return sections
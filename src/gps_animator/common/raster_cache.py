@@ -0,0 +1,100 @@
+import os
+import hashlib
+import numpy as np
+from PIL import Image
+from termcolor import colored
+from gps_animator.config import settings
+from gps_animator.common.profiling import tracer
+
+### Global Variables
+resampling_methods = {
+    "nearest":  Image.NEAREST,
+    "bilinear": Image.BILINEAR,
+    "bicubic":  Image.BICUBIC,
+    "lanczos":  Image.LANCZOS,
+}
+
+class raster_cache:
+    """
+    Disk cache for resized background images.
+
+    Pixels are stored as RGBA uint8 .npy files, keyed by the hash of the source file, the target
+    size and the resampling method, and memory-mapped on load. So a map is only decoded and
+    resized once, and nothing is written to the working directory. Least recently used
+    backgrounds are dropped above max_size bytes.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join(settings.CACHE, "backgrounds"), max_size: int = settings.BACKGROUND_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hashes = {}
+
+    def hash_file(self, image_path: str) -> str:
+        """sha256 of the file, remembered as long as its size and mtime stay the same."""
+        stat = os.stat(image_path)
+        signature = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        if signature not in self.hashes:
+            digest = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            self.hashes[signature] = digest.hexdigest()
+        return self.hashes[signature]
+
+    def get_cache_file(self, image_path: str, size: tuple[int, int], method: str) -> str:
+        width, height = size
+        return os.path.join(self.cache_dir, f"{self.hash_file(image_path)}_{width}x{height}_{method}.npy")
+
+    def evict(self):
+        """Drops the least recently used backgrounds until the cache is below max_size."""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".npy")]
+        files.sort(key=os.path.getmtime)
+        total_size = sum(os.path.getsize(file) for file in files)
+        removed = 0
+        for file in files:
+            if total_size <= self.max_size:
+                break
+            total_size -= os.path.getsize(file)
+            os.remove(file)
+            removed += 1
+        if removed > 0:
+            print(colored(f"Evicted {removed} backgrounds from the background cache", 'yellow'))
+
+    def resize(self, image_path: str, size: tuple[int, int], method: str) -> np.ndarray:
+        with Image.open(image_path) as img:
+            return np.asarray(img.convert("RGBA").resize(size, resampling_methods[method]))
+
+    def get(self, image_path: str, size: tuple[int, int], method: str = "lanczos") -> np.ndarray:
+        """Returns the (height, width, 4) pixels of image_path resized to size = (width, height)."""
+        if method not in resampling_methods:
+            raise ValueError(f"Unknown resampling method: {method}")
+        cache_file = self.get_cache_file(image_path, size, method)
+        if os.path.isfile(cache_file):
+            try:
+                pixels = np.load(cache_file, mmap_mode="r")
+                # marks the background as recently used
+                os.utime(cache_file)
+                print(colored(f"Loading cached background from {cache_file}", 'yellow'))
+                tracer.count("background cache hits")
+                return pixels
+            except (OSError, ValueError) as e:
+                print(colored(f"Cache file {cache_file} is corrupted or unreadable: {e}. Resizing again...", 'red'))
+
+        tracer.count("background cache misses")
+        with tracer.span("background resize", "render", size=size):
+            pixels = self.resize(image_path, size, method)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write next to the target first, so no half written file is ever loaded
+            with open(f"{cache_file}.tmp", "wb") as f:
+                np.save(f, pixels)
+            os.replace(f"{cache_file}.tmp", cache_file)
+            print(colored(f"Cached background to {cache_file}", 'green'))
+            self.evict()
+        except OSError as e:
+            print(colored(f"Failed to cache background: {e}", 'red'))
+            if os.path.exists(f"{cache_file}.tmp"):
+                os.remove(f"{cache_file}.tmp")
+        return pixels
+
+backgrounds = raster_cache()
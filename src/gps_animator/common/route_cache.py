@@ -0,0 +1,176 @@
+import os
+import time
+import json
+import sqlite3
+import shapely
+from shapely.geometry import LineString, MultiLineString
+from termcolor import colored
+from gps_animator.config import settings
+
+### Global Variables
+ROUTE_CACHE_VERSION = 1 # bump when the way routes are computed changes
+COORDINATE_DECIMALS = 6 # ~0.1 m
+
+class route_cache:
+    """
+    One SQLite store for all cached routes (walking, car, ...).
+
+    Keys combine the travel mode, the rounded start/end coordinates and the version of
+    the graph the route was computed on. Geometries are stored as WKB. Routes made of
+    several colored sections (train legs) are stored as one MultiLineString with their
+    colors next to it, see get_many_sections/put_many_sections. When the stored
+    geometries exceed max_size bytes the least recently used routes are dropped.
+    The database runs in WAL mode, so several legs or worker processes can read it at once.
+    """
+
+    def __init__(self, path: str = os.path.join(settings.CACHE, "routes.sqlite"), max_size: int = settings.ROUTE_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.connection = None
+        self.pid = None
+
+    def connect(self) -> sqlite3.Connection:
+        # connections must not be shared with forked worker processes
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS routes ("
+                "key TEXT PRIMARY KEY, mode TEXT NOT NULL, geometry BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS routes_last_access ON routes (last_access)")
+            # stores created before train legs were cached lack the colors column
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(routes)")]
+            if "colors" not in columns:
+                self.connection.execute("ALTER TABLE routes ADD COLUMN colors TEXT")
+            self.connection.commit()
+            self.pid = os.getpid()
+        return self.connection
+
+    def create_key(self, mode: str, start: tuple[float, float], end: tuple[float, float], graph_version: str|None) -> str:
+        coordinates = "_".join(f"{round(float(value), COORDINATE_DECIMALS):.{COORDINATE_DECIMALS}f}" for value in (*start, *end))
+        return f"v{ROUTE_CACHE_VERSION}|{mode}|{coordinates}|{graph_version}"
+
+    def get_many(self, keys: list[str]) -> dict[str, LineString]:
+        """Returns the cached routes of all keys that are in the store, in one query."""
+        if len(keys) == 0:
+            return {}
+        try:
+            connection = self.connect()
+            rows = []
+            # stay below SQLite's limit of host parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                rows += connection.execute(
+                    f"SELECT key, geometry FROM routes WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            now = time.time()
+            connection.executemany("UPDATE routes SET last_access = ? WHERE key = ?", [(now, key) for key, _ in rows])
+            connection.commit()
+        except sqlite3.Error as e:
+            print(colored(f"Route cache {self.path} is unreadable: {e}", 'red'))
+            return {}
+        return {key: shapely.from_wkb(geometry) for key, geometry in rows}
+
+    def has_many(self, keys: list[str], sections: bool = False) -> set[str]:
+        """
+        The keys that are in the store, only routes with colors if sections is set.
+        Unlike get_many this leaves last_access alone, probing doesn't keep routes from being evicted.
+        """
+        if len(keys) == 0:
+            return set()
+        condition = "colors IS NOT NULL AND " if sections else ""
+        try:
+            connection = self.connect()
+            found = set()
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                found.update(key for key, in connection.execute(
+                    f"SELECT key FROM routes WHERE {condition}key IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        except sqlite3.Error as e:
+            print(colored(f"Route cache {self.path} is unreadable: {e}", 'red'))
+            return set()
+        return found
+
+    def get(self, key: str) -> LineString|None:
+        return self.get_many([key]).get(key)
+
+    def get_many_sections(self, keys: list[str]) -> dict[str, list[tuple[LineString, str]]]:
+        """Like get_many, for routes stored with put_many_sections."""
+        if len(keys) == 0:
+            return {}
+        try:
+            connection = self.connect()
+            rows = []
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                rows += connection.execute(
+                    f"SELECT key, geometry, colors FROM routes WHERE colors IS NOT NULL AND key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            now = time.time()
+            connection.executemany("UPDATE routes SET last_access = ? WHERE key = ?", [(now, key) for key, _, _ in rows])
+            connection.commit()
+        except sqlite3.Error as e:
+            print(colored(f"Route cache {self.path} is unreadable: {e}", 'red'))
+            return {}
+        return {key: list(zip(shapely.from_wkb(geometry).geoms, json.loads(colors))) for key, geometry, colors in rows}
+
+    def put_many_sections(self, routes: dict[str, list[tuple[LineString, str]]], mode: str):
+        if len(routes) == 0:
+            return
+        try:
+            connection = self.connect()
+            now = time.time()
+            rows = []
+            for key, sections in routes.items():
+                geometry = shapely.to_wkb(MultiLineString([line for line, _ in sections]))
+                rows.append((key, mode, geometry, len(geometry), now, json.dumps([color for _, color in sections])))
+            connection.executemany(
+                "INSERT OR REPLACE INTO routes (key, mode, geometry, size, last_access, colors) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.commit()
+            self.evict()
+        except sqlite3.Error as e:
+            print(colored(f"Failed to cache routes: {e}", 'red'))
+
+    def put_many(self, routes: dict[str, LineString], mode: str):
+        if len(routes) == 0:
+            return
+        try:
+            connection = self.connect()
+            now = time.time()
+            rows = []
+            for key, line in routes.items():
+                geometry = shapely.to_wkb(line)
+                rows.append((key, mode, geometry, len(geometry), now))
+            connection.executemany(
+                "INSERT OR REPLACE INTO routes (key, mode, geometry, size, last_access) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            connection.commit()
+            self.evict()
+        except sqlite3.Error as e:
+            print(colored(f"Failed to cache routes: {e}", 'red'))
+
+    def put(self, key: str, line: LineString, mode: str):
+        self.put_many({key: line}, mode)
+
+    def evict(self):
+        """Drops the least recently used routes until the store is below max_size."""
+        connection = self.connect()
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM routes").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        freed = 0
+        doomed = []
+        for key, size in connection.execute("SELECT key, size FROM routes ORDER BY last_access"):
+            if total_size - freed <= self.max_size:
+                break
+            doomed.append((key,))
+            freed += size
+        connection.executemany("DELETE FROM routes WHERE key = ?", doomed)
+        connection.commit()
+        print(colored(f"Evicted {len(doomed)} routes from the route cache", 'yellow'))
+
+routes = route_cache()
@@ -0,0 +1,216 @@
+import os
+import numpy as np
+from functools import partial
+from typing import Callable
+import osmnx as ox
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import LineString
+from termcolor import colored
+from gps_animator.common.points import point_collection
+from gps_animator.common.projection import wgs84_to_mercator
+from gps_animator.common.graph_store import get_graph, get_version, network_types
+from gps_animator.common.route_cache import routes
+from gps_animator.common.rail_cache import rail_lines_cache
+from gps_animator.common.profiling import tracer
+from gps_animator.config import settings
+
+### Global Variables
+end     = 0
+walking = 1
+train   = 2
+car     = 3
+leg_colors = {walking: "#583927", car: "#808080"}
+leg_names = {walking: "walking", train: "train", car: "car"}
+
+_worker_graph = None
+
+def _init_worker(G):
+    # every worker gets the graph once instead of once per leg
+    global _worker_graph
+    _worker_graph = G
+
+def _route_coords(G, orig: int, dest: int) -> list[tuple[float, float]] | None:
+    with tracer.span("shortest path", "routing"):
+        route = ox.shortest_path(G, orig, dest, weight="length")
+    if route is None:
+        return None
+    return [(G.nodes[node]['x'], G.nodes[node]['y']) for node in route]
+
+def _worker_route_coords(orig: int, dest: int) -> list[tuple[float, float]] | None:
+    return _route_coords(_worker_graph, orig, dest)
+
+def route_legs(G, origs: list[int], dests: list[int], cpus: int | None = None) -> list[list[tuple[float, float]] | None]:
+    """
+    Solves the shortest paths for all (orig, dest) node pairs on G.
+    The searches run serially, one search takes milliseconds while every pool worker gets a copy of G.
+    A process pool is only used when cpus > 1 is passed, or with cpus None from ROUTING_POOL_LEGS legs on.
+    """
+    if cpus is None:
+        cpus = (os.cpu_count() or 1) if len(origs) >= settings.ROUTING_POOL_LEGS else 1
+    cpus = min(cpus, len(origs))
+    if cpus <= 1:
+        return [_route_coords(G, orig, dest) for orig, dest in zip(origs, dests)]
+    with ProcessPoolExecutor(max_workers=cpus, initializer=_init_worker, initargs=(G,)) as executor:
+        return list(executor.map(_worker_route_coords, origs, dests))
+
+def get_legs(point_table) -> list[int]:
+    """Indexes of the points legs start at, legs stop at the first point that ends the trip."""
+    legs = []
+    for i in range(len(point_table)-1):
+        if point_table[i][1] == end:
+            break
+        legs.append(i)
+    return legs
+
+def get_fetch_tasks(points: point_collection, bbox_scaled) -> dict[str, Callable]:
+    """
+    The downloads route_point_collection will need, as name -> function for fetch.fetch_all.
+    Only legs missing from the route cache need a road graph or the subway lines.
+    """
+    point_table = points.get_all()
+    legs = get_legs(point_table)
+    tasks = {}
+    for mode in (walking, car):
+        mode_legs = [i for i in legs if point_table[i][1] == mode]
+        if len(mode_legs) == 0:
+            continue
+        network_type = network_types[leg_names[mode]]
+        graph_version = get_version(bbox_scaled, network_type)
+        cache_keys = {routes.create_key(leg_names[mode], point_table[i][0].coord(), point_table[i+1][0].coord(), graph_version) for i in mode_legs}
+        if len(routes.has_many(list(cache_keys))) < len(cache_keys):
+            tasks[f"{network_type} graph"] = partial(get_graph, bbox_scaled, network_type)
+
+    train_legs = [i for i in legs if point_table[i][1] == train]
+    if len(train_legs) > 0:
+        rail_version = rail_lines_cache.get_version(bbox_scaled)
+        cache_keys = set() if rail_version is None else {routes.create_key("train", point_table[i][0].coord(), point_table[i+1][0].coord(), rail_version) for i in train_legs}
+        if rail_version is None or len(routes.has_many(list(cache_keys), sections=True)) < len(cache_keys):
+            from gps_animator.common.build_line import get_subwaylines_of_bbox
+            tasks["subway lines"] = partial(get_subwaylines_of_bbox, bbox_scaled)
+    return tasks
+
+def route_point_collection(points: point_collection, bbox_scaled, cpus: int | None = None):
+    """
+    Routes every leg of a point_collection in one batch.
+
+    All stops are projected in one array call, the nearest graph nodes of all stops
+    are resolved with one vectorized query per network type, and the shortest path
+    searches of all walking/car legs run in one route_legs call per network type,
+    serially unless there are at least settings.ROUTING_POOL_LEGS legs to route.
+
+    Walking, car and train legs are looked up in the route cache first, so only legs
+    whose stops changed are routed again.
+
+    Returns the same (line_parts, times, colors, transport) tuple as get_path_array.
+    Train legs that change lines add one part per line, see get_train_route.
+    """
+    point_table = points.get_all()
+    legs = get_legs(point_table)
+
+    results = {}
+    if len(legs) > 0:
+        xs, ys = wgs84_to_mercator(*points.get_coordinates())
+
+    for mode in (walking, car):
+        mode_legs = [i for i in legs if point_table[i][1] == mode]
+        if len(mode_legs) == 0:
+            continue
+        network_type = network_types[leg_names[mode]]
+
+        # cached legs don't need the graph at all
+        graph_version = get_version(bbox_scaled, network_type)
+        cache_keys = {i: routes.create_key(leg_names[mode], point_table[i][0].coord(), point_table[i+1][0].coord(), graph_version) for i in mode_legs}
+        cached = routes.get_many(list(cache_keys.values()))
+        for i in mode_legs:
+            if cache_keys[i] in cached:
+                results[i] = (cached[cache_keys[i]], leg_colors[mode])
+        print(colored(f"{len(cached)} of {len(mode_legs)} {leg_names[mode]} legs loaded from the route cache", 'yellow'))
+        tracer.count("route cache hits", len(cached))
+        tracer.count("route cache misses", len(mode_legs) - len(cached))
+        mode_legs = [i for i in mode_legs if i not in results]
+        if len(mode_legs) == 0:
+            continue
+
+        G_proj = get_graph(bbox_scaled, network_type)
+        stops = sorted(set(mode_legs) | {i+1 for i in mode_legs})
+        nodes = dict(zip(stops, ox.distance.nearest_nodes(G_proj, xs[stops], ys[stops])))
+        print(colored(f"Routing {len(mode_legs)} {leg_names[mode]} legs", 'green'))
+        with tracer.span("shortest paths", "routing", travel=leg_names[mode], legs=len(mode_legs)):
+            routed = route_legs(G_proj, [nodes[i] for i in mode_legs], [nodes[i+1] for i in mode_legs], cpus)
+        new_routes = {}
+        for i, route_coords in zip(mode_legs, routed):
+            if route_coords is None:
+                results[i] = ValueError(f"No {leg_names[mode]} route found between start and end points.")
+            else:
+                results[i] = (LineString(route_coords), leg_colors[mode])
+                new_routes[cache_keys[i]] = results[i][0]
+        routes.put_many(new_routes, leg_names[mode])
+
+    train_legs = [i for i in legs if point_table[i][1] == train]
+    if len(train_legs) > 0:
+        from gps_animator.common.build_line import get_subwaylines_of_bbox, get_train_route
+        from gps_animator.common.build_line import TRAIN_FALLBACK_COLOR
+        from gps_animator.common.subway_index import subway_index
+        from gps_animator.common.rail_network import rail_network
+
+        # the network is only built if a train leg is missing from the cache
+        rail_version = rail_lines_cache.get_version(bbox_scaled)
+        cached = {}
+        if rail_version is not None:
+            cache_keys = {i: routes.create_key("train", point_table[i][0].coord(), point_table[i+1][0].coord(), rail_version) for i in train_legs}
+            cached = routes.get_many_sections(list(cache_keys.values()))
+            for i in train_legs:
+                if cache_keys[i] in cached:
+                    results[i] = cached[cache_keys[i]]
+        print(colored(f"{len(cached)} of {len(train_legs)} train legs loaded from the route cache", 'yellow'))
+        tracer.count("route cache hits", len(cached))
+        tracer.count("route cache misses", len(train_legs) - len(cached))
+        train_legs = [i for i in train_legs if i not in results]
+        if len(train_legs) > 0:
+            with tracer.span("rail network", "routing"):
+                network = rail_network(subway_index(get_subwaylines_of_bbox(bbox_scaled)))
+            rail_version = rail_lines_cache.get_version(bbox_scaled)
+            new_routes = {}
+            for i in train_legs:
+                try:
+                    with tracer.span("train route", "routing", leg=i):
+                        results[i] = get_train_route(point_table[i][0], point_table[i+1][0], network)
+                except Exception as e:
+                    results[i] = e
+                    continue
+                # straight line fallbacks are not cached, the network may connect the stations later
+                if rail_version is not None and all(color != TRAIN_FALLBACK_COLOR for _, color in results[i]):
+                    new_routes[routes.create_key("train", point_table[i][0].coord(), point_table[i+1][0].coord(), rail_version)] = results[i]
+            routes.put_many_sections(new_routes, "train")
+
+    line_parts = []
+    times = []
+    colors = []
+    transport = []
+    for i in legs:
+        point = point_table[i][0]
+        next_point = point_table[i+1][0]
+        if point_table[i][1] not in leg_names:
+            results[i] = ValueError(f"Unknown point type: {point_table[i][1]}")
+        if isinstance(results[i], Exception):
+            print(colored(f"Error processing line from {point.get_name()} to {next_point.get_name()}: {results[i]}", 'red'))
+            print(colored(f"{point_table[i][1]}", 'yellow'))
+            continue
+        if point_table[i][1] == train:
+            sections = results[i]
+        else:
+            sections = [results[i]]
+        departure = point.get_departure()
+        arrival = next_point.get_arrival()
+        # a train leg with transfers becomes one part per line, sharing the leg time by length
+        fractions = np.cumsum([0] + [line_part.length for line_part, _ in sections])
+        fractions = fractions / fractions[-1] if fractions[-1] > 0 else np.linspace(0, 1, len(sections) + 1)
+        for k, (line_part, color) in enumerate(sections):
+            line_parts.append(line_part)
+            colors.append(color)
+            if len(sections) == 1:
+                times.append((departure, arrival))
+            else:
+                times.append((departure + fractions[k] * (arrival - departure), departure + fractions[k+1] * (arrival - departure)))
+            transport.append(leg_names[point_table[i][1]])
+    return line_parts, times, colors, transport
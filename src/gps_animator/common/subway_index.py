@@ -0,0 +1,110 @@
+import numpy as np
+import geopandas as gpd
+from shapely import STRtree
+from shapely.geometry import LineString, MultiLineString, Point
+
+class subway_index:
+    """
+    Compact array form of a subway GeoDataFrame (EPSG:3857) for station-to-line matching.
+
+    vertices: (N, 2) array with the vertices of all lines one after another
+    offsets:  (L+1,) array, the vertices of line i are vertices[offsets[i]:offsets[i+1]]
+    colors, names: per line columns
+    tree: STRtree over the line geometries
+    """
+    vertices:   np.ndarray
+    offsets:    np.ndarray
+    colors:     np.ndarray
+    names:      np.ndarray
+    geometries: list[LineString]
+
+    def __init__(self, subway_map: gpd.GeoDataFrame):
+        geometries = []
+        colors = []
+        names = []
+        color_column = subway_map["colour"] if "colour" in subway_map.columns else [None] * len(subway_map)
+        name_column = subway_map["name:en"] if "name:en" in subway_map.columns else [None] * len(subway_map)
+        for geometry, color, name in zip(subway_map.geometry, color_column, name_column):
+            if isinstance(geometry, MultiLineString):
+                parts = list(geometry.geoms)
+            elif isinstance(geometry, LineString):
+                parts = [geometry]
+            else:
+                continue
+            for part in parts:
+                if len(part.coords) == 0:
+                    continue
+                geometries.append(part)
+                colors.append(color)
+                names.append(name)
+
+        lengths = np.array([len(geometry.coords) for geometry in geometries], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        if len(geometries) > 0:
+            self.vertices = np.concatenate([np.asarray(geometry.coords)[:, :2] for geometry in geometries])
+        else:
+            self.vertices = np.empty((0, 2))
+        self.colors = np.array(colors, dtype=object)
+        self.names = np.array(names, dtype=object)
+        self.geometries = geometries
+        self.tree = STRtree(geometries)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def line_distances(self, line_ids: np.ndarray, start: tuple[float, float], end: tuple[float, float]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns for every line in line_ids the minimal distance of its vertices to start
+        (only vertices closer to start than to end) and to end (all other vertices).
+        Lines without such a vertex get np.inf.
+        """
+        line_ids = np.asarray(line_ids, dtype=np.int64)
+        lengths = self.offsets[line_ids+1] - self.offsets[line_ids]
+        # vertex indices of all requested lines, one line after another
+        starts = np.repeat(self.offsets[line_ids] - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        vertex_ids = starts + np.arange(lengths.sum())
+        vertices = self.vertices[vertex_ids]
+
+        distance_start = np.hypot(vertices[:, 0] - start[0], vertices[:, 1] - start[1])
+        distance_end = np.hypot(vertices[:, 0] - end[0], vertices[:, 1] - end[1])
+        closer_to_start = distance_start < distance_end
+
+        segment_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        min_start = np.minimum.reduceat(np.where(closer_to_start, distance_start, np.inf), segment_starts)
+        min_end = np.minimum.reduceat(np.where(closer_to_start, np.inf, distance_end), segment_starts)
+        return min_start, min_end
+
+    def match(self, start: tuple[float, float], end: tuple[float, float]) -> tuple[int, tuple[float, float], tuple[float, float], tuple[float, float]]:
+        """
+        Finds the line whose vertices are closest to both stations.
+        start, end: station coordinates in EPSG:3857
+
+        Returns (line_id, start_vertex, end_vertex, (min_distance_start, min_distance_end))
+        """
+        if len(self) == 0:
+            raise ValueError("Subway map does not contain any lines.")
+
+        # The summed distance of any line is an upper bound for the winning line, and no
+        # line can be nearer to a station than its summed distance, so only lines within
+        # that distance of both stations are candidates.
+        nearest = self.tree.query_nearest(Point(start))[:1]
+        bound = sum(self.line_distances(nearest, start, end))[0]
+        if np.isfinite(bound):
+            candidates = np.intersect1d(
+                self.tree.query(Point(start), predicate="dwithin", distance=bound),
+                self.tree.query(Point(end), predicate="dwithin", distance=bound)
+            )
+        else:
+            candidates = np.arange(len(self))
+
+        min_start, min_end = self.line_distances(candidates, start, end)
+        best = int(np.argmin(min_start + min_end))
+        line_id = int(candidates[best])
+
+        vertices = self.vertices[self.offsets[line_id]:self.offsets[line_id+1]]
+        distance_start = np.hypot(vertices[:, 0] - start[0], vertices[:, 1] - start[1])
+        distance_end = np.hypot(vertices[:, 0] - end[0], vertices[:, 1] - end[1])
+        closer_to_start = distance_start < distance_end
+        start_vertex = tuple(vertices[np.argmin(np.where(closer_to_start, distance_start, np.inf))])
+        end_vertex = tuple(vertices[np.argmin(np.where(closer_to_start, np.inf, distance_end))])
+        return line_id, start_vertex, end_vertex, (min_start[best], min_end[best])
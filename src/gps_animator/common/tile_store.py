@@ -0,0 +1,180 @@
+import os
+import io
+import math
+import time
+import sqlite3
+import threading
+import requests
+import numpy as np
+from PIL import Image
+from termcolor import colored
+from gps_animator.config import settings
+from gps_animator.common.fetch import with_retries, fetch_all
+from gps_animator.common.profiling import tracer
+
+### Global Variables
+TILE_SIZE = 256
+MERCATOR_ORIGIN = 20037508.342789244 # half the width of the Web Mercator world in meters
+USER_AGENT = "gps-animator/0.1"
+
+def tile_meters(zoom: int) -> float:
+    """Width of one tile at zoom in Web Mercator meters."""
+    return 2 * MERCATOR_ORIGIN / 2**zoom
+
+def mercator_to_tile(x: float, y: float, zoom: int) -> tuple[int, int]:
+    size = tile_meters(zoom)
+    last = 2**zoom - 1
+    tile_x = min(max(int(math.floor((x + MERCATOR_ORIGIN) / size)), 0), last)
+    tile_y = min(max(int(math.floor((MERCATOR_ORIGIN - y) / size)), 0), last)
+    return tile_x, tile_y
+
+def tile_bounds(tile_x: int, tile_y: int, zoom: int) -> tuple[float, float, float, float]:
+    """(minx, miny, maxx, maxy) of a tile in Web Mercator meters."""
+    size = tile_meters(zoom)
+    minx = tile_x * size - MERCATOR_ORIGIN
+    maxy = MERCATOR_ORIGIN - tile_y * size
+    return minx, maxy - size, minx + size, maxy
+
+def auto_zoom(bbox_mercator: tuple[float, float, float, float], pixel_width: int, max_zoom: int = 19) -> int:
+    """Smallest zoom whose tiles have at least pixel_width pixels across the bbox."""
+    minx, _, maxx, _ = bbox_mercator
+    zoom = math.ceil(math.log2(pixel_width * 2 * MERCATOR_ORIGIN / (TILE_SIZE * (maxx - minx))))
+    return min(max(zoom, 0), max_zoom)
+
+class tile_store:
+    """
+    Local store for slippy-map tiles, laid out like MBTiles: one SQLite table keyed by
+    provider, z, x and y holding the encoded tile and when it was fetched.
+
+    Every basemap tile goes through get_tile. Cached tiles younger than ttl are served
+    without network I/O. With offline set, a tile that is not cached raises a LookupError
+    instead of being downloaded. providers maps provider names to URL templates with {z}, {x}, {y}.
+    Missing tiles are downloaded concurrently (see get_tiles), the store itself is only written from the calling thread.
+    """
+
+    def __init__(self, path: str = os.path.join(settings.CACHE, "tiles.sqlite"), providers: dict[str, str] = settings.TILE_PROVIDERS, ttl: float = settings.TILE_CACHE_TTL, offline: bool = settings.TILE_OFFLINE):
+        self.path = path
+        self.providers = dict(providers)
+        self.ttl = ttl
+        self.offline = offline
+        self.connection = None
+        self.pid = None
+        # requests sessions are not thread safe, every download thread gets its own
+        self.local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        # connections must not be shared with forked worker processes
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tiles ("
+                "provider TEXT NOT NULL, z INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL, "
+                "data BLOB NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (provider, z, x, y))"
+            )
+            self.connection.commit()
+            self.pid = os.getpid()
+        return self.connection
+
+    def get_url(self, provider: str, z: int, x: int, y: int) -> str:
+        if provider not in self.providers:
+            raise ValueError(f"Unknown tile provider: {provider}")
+        return self.providers[provider].format(z=z, x=x, y=y)
+
+    def load(self, provider: str, z: int, x: int, y: int) -> tuple[bytes, float]|None:
+        row = self.connect().execute(
+            "SELECT data, fetched_at FROM tiles WHERE provider = ? AND z = ? AND x = ? AND y = ?", (provider, z, x, y)
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def save(self, provider: str, z: int, x: int, y: int, data: bytes):
+        connection = self.connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO tiles (provider, z, x, y, data, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (provider, z, x, y, data, time.time())
+        )
+        connection.commit()
+
+    def get_session(self) -> requests.Session:
+        if getattr(self.local, "session", None) is None:
+            self.local.session = requests.Session()
+            self.local.session.headers["User-Agent"] = USER_AGENT
+        return self.local.session
+
+    def download(self, provider: str, z: int, x: int, y: int) -> bytes:
+        with tracer.span("tile download", "fetch", provider=provider, z=z, x=x, y=y):
+            response = self.get_session().get(self.get_url(provider, z, x, y), timeout=30)
+            response.raise_for_status()
+            return response.content
+
+    def get_tiles(self, provider: str, z: int, coordinates: list[tuple[int, int]]) -> dict[tuple[int, int], bytes]:
+        """
+        The encoded tiles at the (x, y) coordinates, from the store if possible.
+        Missing and expired tiles are downloaded at the same time, with retries.
+        """
+        found = {}
+        expired = {}
+        for x, y in coordinates:
+            cached = self.load(provider, z, x, y)
+            if cached is not None and (self.offline or time.time() - cached[1] <= self.ttl):
+                found[(x, y)] = cached[0]
+            elif self.offline:
+                raise LookupError(f"Tile {provider}/{z}/{x}/{y} is not cached and the tile store is offline")
+            else:
+                expired[(x, y)] = cached
+        tracer.count("tile cache hits", len(found))
+        tracer.count("tile cache misses", len(expired))
+        if len(expired) > 0:
+            print(colored(f"Downloading {len(expired)} {provider} tiles at zoom {z}", 'green'))
+        downloads = fetch_all({(x, y): lambda x=x, y=y: with_retries(self.download, provider, z, x, y) for x, y in expired})
+        error = None
+        for (x, y), data in downloads.items():
+            if isinstance(data, requests.RequestException) and expired[(x, y)] is not None:
+                print(colored(f"Could not refresh tile {provider}/{z}/{x}/{y}: {data}. Using the expired one", 'yellow'))
+                found[(x, y)] = expired[(x, y)][0]
+            elif isinstance(data, Exception):
+                error = data
+            else:
+                # the downloaded tiles are kept even if another one failed
+                self.save(provider, z, x, y, data)
+                found[(x, y)] = data
+        if error is not None:
+            raise error
+        return found
+
+    def get_tile(self, provider: str, z: int, x: int, y: int) -> bytes:
+        """The encoded tile, from the store if possible."""
+        return self.get_tiles(provider, z, [(x, y)])[(x, y)]
+
+    @staticmethod
+    def decode(data: bytes) -> np.ndarray:
+        with Image.open(io.BytesIO(data)) as img:
+            return np.asarray(img.convert("RGBA"))
+
+    def get_tile_pixels(self, provider: str, z: int, x: int, y: int) -> np.ndarray:
+        return self.decode(self.get_tile(provider, z, x, y))
+
+    def get_mosaic(self, provider: str, bbox_mercator: tuple[float, float, float, float], zoom: int) -> tuple[np.ndarray, tuple[float, float, float, float]]:
+        """
+        Stitches all tiles covering bbox_mercator at zoom.
+        Returns the RGBA pixels and their extent (minx, miny, maxx, maxy) in Web Mercator meters.
+        """
+        minx, miny, maxx, maxy = bbox_mercator
+        min_tile_x, min_tile_y = mercator_to_tile(minx, maxy, zoom)
+        max_tile_x, max_tile_y = mercator_to_tile(maxx, miny, zoom)
+        columns = max_tile_x - min_tile_x + 1
+        rows = max_tile_y - min_tile_y + 1
+        mosaic = np.zeros((rows * TILE_SIZE, columns * TILE_SIZE, 4), dtype=np.uint8)
+        coordinates = [(tile_x, tile_y) for tile_y in range(min_tile_y, max_tile_y + 1) for tile_x in range(min_tile_x, max_tile_x + 1)]
+        for (tile_x, tile_y), data in self.get_tiles(provider, zoom, coordinates).items():
+            pixels = self.decode(data)
+            top = (tile_y - min_tile_y) * TILE_SIZE
+            left = (tile_x - min_tile_x) * TILE_SIZE
+            mosaic[top:top+TILE_SIZE, left:left+TILE_SIZE] = pixels[:TILE_SIZE, :TILE_SIZE]
+        print(colored(f"Stitched {rows * columns} {provider} tiles at zoom {zoom}", 'green'))
+        extent_minx, _, _, extent_maxy = tile_bounds(min_tile_x, min_tile_y, zoom)
+        _, extent_miny, extent_maxx, _ = tile_bounds(max_tile_x, max_tile_y, zoom)
+        return mosaic, (extent_minx, extent_miny, extent_maxx, extent_maxy)
+
+tiles = tile_store()
@@ -1,7 +1,7 @@
 import time
 from typing import Tuple
-import pyproj
 import numpy as np
+from gps_animator.common.projection import wgs84_to_mercator
 
 time_format_code = "%H:%M"
 
@@ -12,6 +12,7 @@ def convert_time_to_seconds(time_str: str) -> int:
 def convert_WGS84_Mercator(latitude: float, longitude: float) -> Tuple[float, float]:
         """
         Convert latitude/longitude (WGS84) to Web Mercator (EPSG:3857) coordinates
+        For arrays of points use projection.wgs84_to_mercator directly.
         
         Args:
             lat (float): Latitude in decimal degrees
@@ -20,17 +21,8 @@ def convert_WGS84_Mercator(latitude: float, longitude: float) -> Tuple[float, fl
         Returns:
             tuple: (x, y) coordinates in Web Mercator meters
         """
-        # Define coordinate systems
-        wgs84 = pyproj.CRS("EPSG:4326")  # WGS84 (standard lat/lon)
-        mercator = pyproj.CRS("EPSG:3857")  # Web Mercator
-        
-        # Create transformer
-        transformer = pyproj.Transformer.from_crs(wgs84, mercator, always_xy=True)
-        
-        # Convert coordinates
-        x, y = transformer.transform(longitude, latitude)
-
-        return x, y
+        x, y = wgs84_to_mercator(latitude, longitude)
+        return float(x), float(y)
 
 def expand_bbox(bbox: tuple[float, float, float, float], expand_factor: float) -> tuple[float, float, float, float]:
     """Expand bbox by a given factor in all directions and return shapely box."""
@@ -36,4 +36,68 @@ class Settings:
     else:
         CACHE = os.path.expanduser("~/Documents/gps-animator/cache")
 
+    ### Rail cache
+    # repaired subway networks are fetched for whole tiles of RAIL_TILE_SIZE degrees and reused until they are older than RAIL_CACHE_TTL seconds
+    RAIL_TILE_SIZE = 0.05
+    RAIL_CACHE_TTL = 30 * 24 * 3600
+
+    ### Routing
+    # shortest paths of one network type are searched in a process pool from ROUTING_POOL_LEGS legs on, below that serially
+    ROUTING_POOL_LEGS = 500
+
+    ### Route cache
+    # walking and driving routes are kept in one SQLite file, the least recently used ones are dropped above ROUTE_CACHE_SIZE bytes
+    ROUTE_CACHE_SIZE = 256 * 1024 * 1024
+
+    ### Background cache
+    # resized map backgrounds are kept as .npy files, the least recently used ones are dropped above BACKGROUND_CACHE_SIZE bytes
+    BACKGROUND_CACHE_SIZE = 1024 * 1024 * 1024
+
+    ### Render profiles
+    # pixel_width/pixel_height/frame_rate: output video, width and height have to be even for H.264 with yuv420p
+    # background_width: pixel width the map is fetched and resized to, the height follows from the bbox
+    # detail_zoom: tile zoom of the detail map
+    # sprite_scale: sprites are decoded at this fraction of their file size
+    # RENDER_PROFILE is used when no profile is asked for, GPS_ANIMATOR_PROFILE overrides it
+    RENDER_PROFILES = {
+        "draft":   {"pixel_width": 854,  "pixel_height": 900,  "frame_rate": 15, "background_width": 854,  "detail_zoom": 13, "sprite_scale": 0.25},
+        "preview": {"pixel_width": 1920, "pixel_height": 2024, "frame_rate": 30, "background_width": 1920, "detail_zoom": 14, "sprite_scale": 0.5},
+        "final":   {"pixel_width": 3840, "pixel_height": 4046, "frame_rate": 60, "background_width": 3840, "detail_zoom": 15, "sprite_scale": 1},
+    }
+    RENDER_PROFILE = os.environ.get("GPS_ANIMATOR_PROFILE", "final")
+
+    ### Tile cache
+    # basemap tiles are kept in one SQLite file and fetched again once they are older than TILE_CACHE_TTL seconds
+    # with TILE_OFFLINE set, only cached tiles are used and a missing tile is an error
+    # the URL templates can point at any slippy-map server, e.g. a local one
+    TILE_CACHE_TTL = 30 * 24 * 3600
+    TILE_OFFLINE = os.environ.get("GPS_ANIMATOR_OFFLINE", "0") == "1"
+    TILE_PROVIDERS = {
+        "osm":       "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "satellite": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+    }
+
+    ### Fetching
+    # the map, subway lines and road graphs of a trip are downloaded at the same time by up to FETCH_WORKERS threads before routing
+    # a download failing with a connection error, timeout or overloaded server is tried FETCH_RETRIES times, waiting FETCH_BACKOFF, 2 * FETCH_BACKOFF, ... seconds in between
+    # OVERPASS_URL can point at any Overpass API, e.g. a local one, GPS_ANIMATOR_OVERPASS_URL overrides it
+    FETCH_WORKERS = 8
+    FETCH_RETRIES = 3
+    FETCH_BACKOFF = 1.0
+    OVERPASS_URL = os.environ.get("GPS_ANIMATOR_OVERPASS_URL", "https://overpass-api.de/api")
+
+    ### Section cache
+    # rendered sections of a video are reused while their leg and the static layers stay the same
+    # the least recently used ones are dropped above SECTION_CACHE_SIZE bytes
+    SECTION_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+    def get_render_profile(self, name: str|None = None) -> dict:
+        name = name or self.RENDER_PROFILE
+        if name not in self.RENDER_PROFILES:
+            raise ValueError(f"Render profile: {name} is not a valid option ({', '.join(self.RENDER_PROFILES)})")
+        profile = self.RENDER_PROFILES[name]
+        if profile["pixel_width"] % 2 != 0 or profile["pixel_height"] % 2 != 0:
+            raise ValueError(f"Render profile: {name} is {profile['pixel_width']} x {profile['pixel_height']}, the video encoder needs an even width and height")
+        return profile
+
 settings = Settings()
\ No newline at end of file
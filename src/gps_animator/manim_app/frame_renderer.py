@@ -0,0 +1,204 @@
+import os
+import time
+import subprocess
+import numpy as np
+from PIL import Image, ImageDraw, ImageColor
+from termcolor import colored
+from manim import config
+from gps_animator.common.raster_cache import backgrounds
+from gps_animator.common.map_utils import get_background_size
+from gps_animator.common.profiling import tracer
+from gps_animator.manim_app.helpers import get_leg_timing, count_frames, rescale, assets
+from gps_animator.manim_app.sprites import sprite_cache, leg_sprites, IDLE_SPRITE
+from gps_animator.manim_app.plan import animation_plan, get_scene_projection
+from gps_animator.manim_app.scenes import apply_render_profile
+
+### Global Variables
+IMAGE_SCALE_TO_RESOLUTION = 1080 # Manim's default ImageMobject height: pixels / 1080 * frame_height
+STROKE_WIDTH_MULTIPLE = 0.01 # Cairo camera: stroke width in scene units per stroke_width
+BASE_PATH_STROKE_WIDTH = 4
+
+class frame_renderer:
+    """
+    Renders the same legs, sprites and timings as PathOnMap without Manim's mobjects or Cairo.
+
+    The static layers (map, base paths, still icons) are drawn once with PIL. Every frame is
+    that background with the moving sprites alpha-blended on top in NumPy, written as raw RGB
+    to ffmpeg. Only the rectangles drawn on the last frame are restored from the background.
+    """
+
+    def __init__(self, pixel_width: int, pixel_height: int, frame_rate: float, frame_width: float, frame_height: float, sprites: sprite_cache, background_color=(0, 0, 0)):
+        self.pixel_width = pixel_width
+        self.pixel_height = pixel_height
+        self.frame_rate = frame_rate
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.sprites = sprites
+        self.background_color = background_color
+        self.scaled_frames = {}
+        self.background = None
+        self.frame = None
+        self.dirty = []
+        self.animated_icons = []
+
+    def to_pixels(self, points) -> np.ndarray:
+        """Manim points (N, 2|3) -> (N, 2) pixel positions, y downwards."""
+        points = np.asarray(points, dtype=float).reshape(-1, np.shape(points)[-1])
+        x = (points[:, 0] + self.frame_width / 2) / self.frame_width * self.pixel_width
+        y = (self.frame_height / 2 - points[:, 1]) / self.frame_height * self.pixel_height
+        return np.stack([x, y], axis=-1)
+
+    def get_scaled_frames(self, media_path: str, scale: float) -> list[np.ndarray]:
+        """The frames of a sprite at the pixel size PathOnMap shows it with, built once."""
+        key = (media_path, scale)
+        if key not in self.scaled_frames:
+            media = self.sprites.get(media_path)
+            decoded_height, decoded_width = media.frames[0].shape[:2]
+            factor = rescale(scale, media.width) * media.width / decoded_width
+            height = decoded_height / IMAGE_SCALE_TO_RESOLUTION * self.frame_height * factor / self.frame_height * self.pixel_height
+            size = (max(1, round(height * decoded_width / decoded_height)), max(1, round(height)))
+            self.scaled_frames[key] = [np.asarray(Image.fromarray(frame).resize(size, Image.LANCZOS)) for frame in media.frames]
+        return self.scaled_frames[key]
+
+    def build_background(self, image_path: str, projection, background_width: int, paths, colors, icons):
+        """icons: list of (manim position, media path, scale, height) like add_media_at_point takes them"""
+        canvas = Image.new("RGBA", (self.pixel_width, self.pixel_height), (*self.background_color, 255))
+
+        map_pixels = backgrounds.get(image_path, get_background_size((projection.minx, projection.miny, projection.maxx, projection.maxy), background_width))
+        (left, top), (right, bottom) = self.to_pixels([[-projection.manim_width / 2, projection.manim_height / 2], [projection.manim_width / 2, -projection.manim_height / 2]])
+        map_image = Image.fromarray(np.asarray(map_pixels)).resize((round(right - left), round(bottom - top)), Image.LANCZOS)
+        canvas.alpha_composite(map_image, (round(left), round(top)))
+
+        draw = ImageDraw.Draw(canvas)
+        stroke = max(1, round(BASE_PATH_STROKE_WIDTH * STROKE_WIDTH_MULTIPLE * self.pixel_width / self.frame_width))
+        for path, color in zip(paths, colors):
+            try:
+                rgb = ImageColor.getrgb(color)
+            except (ValueError, TypeError):
+                rgb = (255, 255, 255)
+            draw.line([tuple(point) for point in self.to_pixels(path)], fill=rgb, width=stroke, joint="curve")
+
+        for position, media_path, scale, height in icons:
+            frames = self.get_scaled_frames(media_path, scale)
+            center = self.to_pixels(position)[0] - [0, height * frames[0].shape[0] / 2]
+            if len(frames) > 1:
+                self.animated_icons.append((media_path, frames, center))
+                continue
+            frame = frames[0]
+            canvas.alpha_composite(Image.fromarray(frame), (round(center[0] - frame.shape[1] / 2), round(center[1] - frame.shape[0] / 2)))
+
+        self.background = np.ascontiguousarray(np.asarray(canvas)[:, :, :3])
+        self.frame = self.background.copy()
+
+    def blend(self, rgba: np.ndarray, center):
+        """Alpha-blends rgba centered at center (pixels) into the current frame."""
+        height, width = rgba.shape[:2]
+        x0 = round(center[0] - width / 2)
+        y0 = round(center[1] - height / 2)
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1, fy1 = min(x0 + width, self.pixel_width), min(y0 + height, self.pixel_height)
+        if fx1 <= fx0 or fy1 <= fy0:
+            return
+        source = rgba[fy0-y0:fy1-y0, fx0-x0:fx1-x0]
+        alpha = source[:, :, 3:4].astype(np.uint16)
+        region = self.frame[fy0:fy1, fx0:fx1]
+        region[:] = ((source[:, :, :3] * alpha + region * (255 - alpha) + 127) // 255).astype(np.uint8)
+        self.dirty.append((fy0, fy1, fx0, fx1))
+
+    def next_frame(self):
+        """Restores what the last frame drew over, then draws the animated icons."""
+        for y0, y1, x0, x1 in self.dirty:
+            self.frame[y0:y1, x0:x1] = self.background[y0:y1, x0:x1]
+        self.dirty = []
+
+    def draw_animated_icons(self, scene_time: float):
+        for media_path, frames, center in self.animated_icons:
+            self.blend(frames[self.sprites.get(media_path).frame_at(scene_time, self.frame_rate)], center)
+
+    def iter_frames(self, paths, transport, times, sprite_paths=None):
+        """Yields every frame of the animation, timed like PathOnMap.move_image_along_paths."""
+        frame_number = 0
+        if sprite_paths is None:
+            sprite_paths = [None] * len(paths)
+        for path, travel, leg_time, leg_sprite_paths in zip(paths, transport, times, sprite_paths):
+            travel_duration, idle_duration = get_leg_timing(leg_time, self.frame_rate)
+            # frames are pulled by render, so the span includes piping them to ffmpeg
+            with tracer.span("render leg", "render", travel=travel, duration=travel_duration + idle_duration):
+                _, _, _, scale, height, _ = leg_sprites[travel]
+                points = np.array(path, dtype=float)
+                lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+                cumulative = np.concatenate([[0], np.cumsum(lengths)])
+                total_length = cumulative[-1]
+                if total_length > 0:
+                    if leg_sprite_paths is None:
+                        leg_sprite_paths = self.sprites.get_leg_paths(travel, points, travel_duration)
+                    for t in np.arange(0, travel_duration, 1 / self.frame_rate):
+                        scene_time = frame_number / self.frame_rate
+                        position = t / travel_duration * total_length
+                        k = int(np.clip(np.searchsorted(cumulative, position, side="right") - 1, 0, len(lengths) - 1))
+                        fraction = (position - cumulative[k]) / lengths[k] if lengths[k] > 0 else 0
+                        pos = points[k] + min(fraction, 1) * (points[k+1] - points[k])
+                        frames = self.get_scaled_frames(leg_sprite_paths[k], scale)
+                        rgba = frames[self.sprites.get(leg_sprite_paths[k]).frame_at(scene_time, self.frame_rate)]
+                        center = self.to_pixels(pos)[0]
+                        if height == 1:
+                            center = center - [0, rgba.shape[0] / 2]
+                        self.next_frame()
+                        self.draw_animated_icons(scene_time)
+                        self.blend(rgba, center)
+                        yield self.frame
+                        frame_number += 1
+                if idle_duration > 0:
+                    idle_path = f"{self.sprites.assets}/{IDLE_SPRITE}"
+                    frames = self.get_scaled_frames(idle_path, 1)
+                    center = self.to_pixels(points[-1])[0] - [0, frames[0].shape[0] / 2]
+                    for _ in range(count_frames(idle_duration, self.frame_rate)):
+                        scene_time = frame_number / self.frame_rate
+                        self.next_frame()
+                        self.draw_animated_icons(scene_time)
+                        self.blend(frames[self.sprites.get(idle_path).frame_at(scene_time, self.frame_rate)], center)
+                        yield self.frame
+                        frame_number += 1
+
+    def render(self, paths, transport, times, output_file: str, sprite_paths=None) -> int:
+        """Pipes all frames into ffmpeg, returns the number of frames."""
+        process = subprocess.Popen(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", f"{self.pixel_width}x{self.pixel_height}", "-r", str(self.frame_rate), "-i", "-",
+             "-c:v", "libx264", "-pix_fmt", "yuv420p", output_file],
+            stdin=subprocess.PIPE
+        )
+        frame_count = 0
+        try:
+            for frame in self.iter_frames(paths, transport, times, sprite_paths):
+                process.stdin.write(memoryview(frame))
+                frame_count += 1
+        finally:
+            process.stdin.close()
+            process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}")
+        return frame_count
+
+def render_numpy(plan: animation_plan, output_file: str|None = None, profile: str|None = None) -> str:
+    """Renders the plan like PathOnMap does, with frame_renderer instead of Manim."""
+    render_profile = apply_render_profile(profile)
+    if output_file is None:
+        output_file = os.path.splitext(config.output_file)[0] + config.movie_file_extension
+    projection = get_scene_projection(plan.bbox)
+    paths, colors, transport, times = plan.get_legs()
+
+    sprites = sprite_cache(assets, render_profile["sprite_scale"])
+    plan_icons = plan.get_icons()
+    sprites.preload([icon for _, icon, _ in plan_icons])
+    icons = [(position, icon, 1.5*icon_scale, 0.5) for position, icon, icon_scale in plan_icons]
+
+    renderer = frame_renderer(config.pixel_width, config.pixel_height, config.frame_rate, config.frame_width, config.frame_height, sprites, tuple(int(value * 255) for value in config.background_color.to_rgb()))
+    with tracer.span("static layer", "render"):
+        renderer.build_background(plan.background_image, projection, render_profile["background_width"], paths, colors, icons)
+
+    render_start = time.perf_counter()
+    frame_count = renderer.render(paths, transport, times, output_file, plan.get_sprite_paths(assets))
+    render_time = time.perf_counter() - render_start
+    print(colored(f"Rendered {frame_count} frames in {render_time:.1f} s ({frame_count / max(render_time, 1e-9):.1f} fps) to {output_file}", 'green'))
+    return output_file
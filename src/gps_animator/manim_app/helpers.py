@@ -1,10 +1,14 @@
 from termcolor import colored
 from pathlib import Path
+from functools import partial
 import os
 from gps_animator.common.points import point_collection, coordinate_point
 from gps_animator.common.utils import expand_bbox, convert_WGS84_Mercator
+from gps_animator.common.projection import wgs84_to_mercator, bbox_to_mercator
 from gps_animator.config import settings
 from gps_animator.common.map_utils import save_osm_detail_map, save_satellite_map
+from gps_animator.common.fetch import fetch_all
+from gps_animator.common.profiling import tracer
 
 ### Global Variables
 end     = 0
@@ -21,11 +25,13 @@ IDLE_TIME = 2.5
 MAX_TRAVEL = 10
 IMAGE_MANIM_WIDTH = 12.0
 
-def get_animation_details(points: point_collection, map_kind: str, bbox_scale: float = 0.5, image_cache: Path = settings.INPUT) -> tuple[tuple[float, float, float, float], Path, int, int]:
+def get_animation_details(points: point_collection, map_kind: str, bbox_scale: float = 0.5, image_cache: Path = settings.INPUT, profile: str|None = None) -> tuple[tuple[float, float, float, float], Path, int, int]:
+    """
+    Saves the map of the trip and returns (bbox, map_path, animation_width, animation_height).
+    The road graphs and subway lines routing will need are downloaded at the same time as the map.
+    """
     bbox = expand_bbox(points.get_minmax(), bbox_scale)
-    min_lon, min_lat, max_lon, max_lat = bbox
-    minx, miny = convert_WGS84_Mercator(min_lat, min_lon)
-    maxx, maxy = convert_WGS84_Mercator(max_lat, max_lon)
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
     if maxx <= minx or maxy <= miny:
         raise ValueError("Converted Mercator bbox has non-positive extent")
     merc_width = maxx - minx
@@ -34,70 +40,57 @@ def get_animation_details(points: point_collection, map_kind: str, bbox_scale: f
     animation_height = animation_width * (merc_height / merc_width)
 
     if map_kind == "Satelite":
-        map_path = save_satellite_map(bbox = bbox, filename = os.path.join(image_cache, "satelite.png"))
+        save_map = partial(save_satellite_map, bbox = bbox, filename = os.path.join(image_cache, "satelite.png"), profile = profile)
     elif map_kind == "Details":
-        map_path = save_osm_detail_map(bbox = bbox, filename = os.path.join(image_cache, "detail.png"))
+        save_map = partial(save_osm_detail_map, bbox = bbox, filename = os.path.join(image_cache, "detail.png"), profile = profile)
     else:
         raise ValueError(f"Map kind: {map_kind} is not a valid option")
 
+    from gps_animator.common.routing import get_fetch_tasks
+    with tracer.span("fetch"):
+        results = fetch_all({"map": save_map, **get_fetch_tasks(points, bbox)})
+    for name, result in results.items():
+        # routing fetches again what could not be prefetched and reports it there
+        if name != "map" and isinstance(result, Exception):
+            print(colored(f"Could not prefetch {name}: {result}", 'yellow'))
+    if isinstance(results["map"], Exception):
+        raise results["map"]
+    map_path = results["map"]
+
     return bbox, map_path, animation_width, animation_height
 
 def get_path_array(points, bbox_scaled):
-    line_parts=[] # array of LineString, colors
-    times = []
-    colors = []
-    transport = []
-
-    from gps_animator.common.build_line import get_subwaylines_of_bbox
-    subway_map = get_subwaylines_of_bbox(bbox_scaled)
-    point_table = points.get_all()
-    
-    from gps_animator.common.build_line import get_walking_line, get_train_line, get_car_line
-    for i in range(len(point_table)-1):
-        try:
-            print()
-            point = point_table[i][0]
-            next_point = point_table[i+1][0]
-            # print(colored(f"Processing line from\n{point.get_name()} to\n{next_point.get_name()}", 'black'))
-            if point_table[i][1] == end:
-                break
-            elif point_table[i][1] == walking:
-                line_parts.append(get_walking_line(point, next_point))
-                colors.append("#583927")
-                times.append((point.get_departure(), next_point.get_arrival()))
-                transport.append("walking")
-                # pass
-            elif point_table[i][1] == train:
-                line_part, color = get_train_line(point, next_point, subway_map)
-                if debug == 1:
-                    print(line_part, color)
-                line_parts.append(line_part)
-                colors.append(color)
-                times.append((point.get_departure(), next_point.get_arrival()))
-                transport.append("train")
-            elif point_table[i][1] == car:
-                line_parts.append(get_car_line(point, next_point))
-                colors.append("#808080")
-                times.append((point.get_departure(), next_point.get_arrival()))
-                transport.append("car")
-            else:
-                raise ValueError(f"Unknown point type: {point_table[i][1]}")
-        except Exception as e:
-            print(colored(f"Error processing line from {point.get_name()} to {next_point.get_name()}: {e}", 'red'))
-            print(colored(f"{point_table[i][1]}", 'yellow'))
-            continue
+    """
+    Returns (line_parts, times, colors, transport) for all legs of points.
+    All legs are routed in one batch, see route_point_collection.
+    """
+    from gps_animator.common.routing import route_point_collection
+    line_parts, times, colors, transport = route_point_collection(points, bbox_scaled)
+    if debug == 1:
+        print(line_parts, colors)
     print()
     return line_parts, times, colors, transport
 
+def get_pixel_tolerance(merc_width: float, image_manim_width: float, frame_width: float, pixel_width: int) -> float:
+    """Size of one output pixel in Mercator meters, for a map of merc_width meters drawn image_manim_width units wide."""
+    return (frame_width / pixel_width) * (merc_width / image_manim_width)
+
+def simplify_line_parts(line_parts, tolerance):
+    """
+    Simplifies every LineString with Douglas-Peucker (shapely), dropping detail below tolerance.
+    Start and end point of every part are kept.
+    Returns the simplified parts and the number of segments before and after.
+    """
+    simplified = [line.simplify(tolerance, preserve_topology=False) for line in line_parts]
+    segments_before = sum(len(line.coords) - 1 for line in line_parts)
+    segments_after = sum(len(line.coords) - 1 for line in simplified)
+    return simplified, segments_before, segments_after
+
 def lonlat_to_mercator(lon, lat):
     """Convert lon/lat in degrees to Web Mercator (EPSG:3857) meters.
-    Uses the spherical Mercator formulas (same as pyproj/GDAL usually).
+    For arrays of points use projection.wgs84_to_mercator directly.
     """
-    R = 6378137.0
-    x = R * np.radians(lon)
-    # clamp latitude to valid range to avoid infinities
-    lat = np.clip(lat, -85.05112878, 85.05112878)
-    y = R * np.log(np.tan(np.pi / 4.0 + np.radians(lat) / 2.0))
+    x, y = wgs84_to_mercator(lat, lon)
     return float(x), float(y)
 
 def get_appropriate_times(times, total_duration, min_faktor = 0.1, pause_multiplier = 0.1):
@@ -121,6 +114,60 @@ def get_appropriate_times(times, total_duration, min_faktor = 0.1, pause_multipl
             final_time_array.append([time_array[i*2], time_array[i*2+1]])
     return final_time_array
 
+def get_leg_timing(time, frame_rate):
+    """
+    (travel duration, idle duration) of one leg of get_appropriate_times.
+    Travel is capped at MAX_TRAVEL and lasts at least one frame, the idle animation is only
+    shown after stops longer than MIN_IDLE.
+    """
+    travel_duration = min(time[1] - time[0], MAX_TRAVEL)
+    if travel_duration <= 0:
+        travel_duration = 1 / frame_rate
+    idle_duration = 0
+    if len(time) == 3 and min(time[2] - time[1], 10) > MIN_IDLE:
+        idle_duration = IDLE_TIME
+    return travel_duration, idle_duration
+
+def count_frames(run_time, frame_rate):
+    """Number of frames Manim renders for an animation of run_time seconds."""
+    return len(np.arange(0, run_time, 1 / frame_rate))
+
+def get_leg_frames(paths, times, frame_rate):
+    """Rendered frames per leg, the way PathOnMap.move_image_along_paths animates them."""
+    frames = []
+    for path, time in zip(paths, times):
+        travel_duration, idle_duration = get_leg_timing(time, frame_rate)
+        moves = np.any(np.asarray(path[1:]) != np.asarray(path[0]))
+        frames.append((count_frames(travel_duration, frame_rate) if moves else 0) + (count_frames(idle_duration, frame_rate) if idle_duration > 0 else 0))
+    return frames
+
+def split_legs(frames: list[int], slices: int) -> list[tuple[int, int]]:
+    """
+    Splits the legs into at most slices ranges [start, stop) with about the same number of frames.
+    Cuts are only made at leg boundaries and every range renders at least one frame.
+    """
+    total = sum(frames)
+    ranges = []
+    start = 0
+    rendered = 0
+    for i, leg_frames in enumerate(frames):
+        rendered += leg_frames
+        if rendered * slices >= total * (len(ranges) + 1) and len(ranges) < slices - 1:
+            ranges.append((start, i + 1))
+            start = i + 1
+    if start < len(frames):
+        ranges.append((start, len(frames)))
+    # legs without frames (zero length, no idle) must not end up alone
+    merged = []
+    for start, stop in ranges:
+        if merged and sum(frames[start:stop]) == 0:
+            merged[-1] = (merged[-1][0], stop)
+        elif merged and sum(frames[merged[-1][0]:merged[-1][1]]) == 0:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
 def distance(point1, point2):
     """Calculates the distance between two points."""
     return np.linalg.norm(np.array(point1) - np.array(point2))
@@ -158,6 +205,22 @@ def angle_between_two_points_2d(point1, point2):
     angle = (angle + 360) % 360
     return angle
 
+def get_leg_angles(points, buffer, min_length=0):
+    """
+    Direction of every segment of a leg, averaged with the directions from up to buffer earlier points to smooth corners.
+    Segments that end less than min_length past the last counted point (GPS jitter) don't pick a direction themselves,
+    they take the one of the next longer segment, measured from that point. The last segment always counts.
+    """
+    angles = []
+    counted = [0]
+    for k in range(len(points)-1):
+        if distance(points[counted[-1]], points[k+1]) <= min_length and k+1 < len(points)-1:
+            continue
+        last_angle = [angle_between_two_points_2d(points[j], points[k+1]) for j in counted[-buffer-1:]]
+        angles += [np.mean(np.array(last_angle))] * (k + 1 - len(angles))
+        counted.append(k+1)
+    return angles
+
 # print(angle_between_two_points_2d((0, 0), (1, 0))) = 0.0
 # print(angle_between_two_points_2d((0, 0), (1, 1))) = 45.0
 # print(angle_between_two_points_2d((0, 0), (-1, 1))) = 135.0
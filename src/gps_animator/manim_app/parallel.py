@@ -0,0 +1,89 @@
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from termcolor import colored
+from manim import config, tempconfig
+from gps_animator.common.profiling import tracer
+from gps_animator.manim_app.helpers import get_leg_frames, split_legs
+from gps_animator.manim_app.plan import animation_plan
+from gps_animator.manim_app.scenes import PathOnMap, apply_render_profile
+
+def get_trace_file(slice_dir: str) -> str:
+    return os.path.join(slice_dir, "trace.json")
+
+def render_slice(plan: animation_plan, legs: tuple[int, int], time_offset: float, slice_dir: str, profile: str|None, trace: bool = False) -> str:
+    """
+    Renders the legs of one slice into its own media dir and returns the movie file.
+    With trace, the spans of the worker are saved to get_trace_file(slice_dir) for merge_slice_trace.
+    """
+    if trace:
+        # a forked worker starts with a copy of the parent's spans
+        tracer.clear()
+        tracer.enable()
+    with tempconfig({"media_dir": slice_dir, "output_file": os.path.join(slice_dir, "slice"), "disable_caching": True}):
+        with tracer.span("render slice", "render", legs=list(legs)):
+            scene = PathOnMap(plan=plan, legs=legs, time_offset=time_offset, profile=profile)
+            scene.render()
+    if trace:
+        with open(get_trace_file(slice_dir), "w", encoding="utf-8") as f:
+            json.dump(tracer.export(), f, default=str)
+    return str(scene.renderer.file_writer.movie_file_path)
+
+def merge_slice_trace(slice_dir: str):
+    if tracer.enabled and os.path.isfile(get_trace_file(slice_dir)):
+        with open(get_trace_file(slice_dir), "r", encoding="utf-8") as f:
+            tracer.merge(json.load(f))
+
+def concat_videos(video_files: list[str], output_file: str):
+    """Joins videos with the same encoding by stream copy, nothing is encoded again."""
+    list_file = f"{output_file}.txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        for video_file in video_files:
+            escaped = os.path.abspath(video_file).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", output_file],
+            check=True
+        )
+    finally:
+        os.remove(list_file)
+
+def render_parallel(plan: animation_plan, processes: int|None = None, output_file: str|None = None, profile: str|None = None) -> str:
+    """
+    Renders the plan with PathOnMap in time slices split at leg boundaries, one process per slice, and joins them.
+
+    Every worker builds the same static scene (map, icons, base paths) and only animates its legs,
+    starting at the scene time the serial render would be at, so the joined video has the same frames.
+    """
+    processes = processes or os.cpu_count() or 1
+    apply_render_profile(profile)
+    if output_file is None:
+        output_file = os.path.splitext(config.output_file)[0] + config.movie_file_extension
+    frame_rate = config.frame_rate
+
+    paths, _, _, times = plan.get_legs()
+    frames = get_leg_frames(paths, times, frame_rate)
+    slices = split_legs(frames, processes)
+    print(colored(f"Rendering {sum(frames)} frames in {len(slices)} slices", 'green'))
+
+    slice_root = tempfile.mkdtemp(prefix="slices_", dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        with ProcessPoolExecutor(max_workers=len(slices)) as executor:
+            futures = []
+            slice_dirs = []
+            for i, (start, stop) in enumerate(slices):
+                time_offset = sum(frames[:start]) / frame_rate
+                slice_dirs.append(os.path.join(slice_root, f"{i:03d}"))
+                futures.append(executor.submit(render_slice, plan, (start, stop), time_offset, slice_dirs[-1], profile, tracer.enabled))
+            video_files = [future.result() for future in futures]
+        for slice_dir in slice_dirs:
+            merge_slice_trace(slice_dir)
+        concat_videos(video_files, output_file)
+    finally:
+        shutil.rmtree(slice_root, ignore_errors=True)
+    print(colored(f"Saved {output_file}", 'green'))
+    return output_file
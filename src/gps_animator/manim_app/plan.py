@@ -0,0 +1,133 @@
+import json
+import numpy as np
+from termcolor import colored
+from manim import config
+from gps_animator.common.points import point_collection
+from gps_animator.common.projection import scene_projection, bbox_to_mercator
+from gps_animator.common.profiling import tracer
+from gps_animator.manim_app.helpers import get_path_array, get_pixel_tolerance, simplify_line_parts, get_appropriate_times, resort_path, IMAGE_MANIM_WIDTH, assets
+from gps_animator.manim_app.sprites import sprite_cache
+
+### Global Variables
+PLAN_VERSION = 3 # bump when the layout of the plan file changes
+PLAN_DECIMALS = 4 # Manim units, well below one pixel at 4K
+
+def get_scene_projection(bbox):
+    """Projection onto the scene for a map of bbox (lon/lat), IMAGE_MANIM_WIDTH wide and centered."""
+    minx, miny, maxx, maxy = bbox_to_mercator(bbox)
+    # Make sure bbox extents are positive
+    if maxx <= minx or maxy <= miny:
+        raise ValueError("Converted Mercator bbox has non-positive extent")
+    image_manim_height = IMAGE_MANIM_WIDTH * ((maxy - miny) / (maxx - minx))
+    return scene_projection((minx, miny, maxx, maxy), IMAGE_MANIM_WIDTH, image_manim_height)
+
+def prepare_legs(points, bbox):
+    """
+    Routes all legs of points and converts them to the scene.
+    Returns (paths, colors, transport, times), one entry per leg with paths in Manim coordinates.
+    """
+    projection = get_scene_projection(bbox)
+    with tracer.span("routing"):
+        line_parts, times, colors, transport = get_path_array(points, bbox)
+
+    # Nothing smaller than one output pixel needs its own segment
+    tolerance = get_pixel_tolerance(projection.merc_width, projection.manim_width, config.frame_width, config.pixel_width)
+    line_parts, segments_before, segments_after = simplify_line_parts(line_parts, tolerance)
+    print(colored(f"Simplified paths with a tolerance of {tolerance:.2f} m: {segments_before} -> {segments_after} segments", 'green'))
+
+    times = get_appropriate_times(times, 600)
+
+    new_line_parts = []
+    for line in line_parts:
+        new_line_parts.append(list(projection.line_to_manim(line)))
+
+    paths = resort_path(new_line_parts)
+    return paths, colors, transport, times
+
+class animation_plan:
+    """
+    Everything a render needs, without any routing or map work: the bbox and background image,
+    the icons and per leg its transport, color, start/end times, Manim coordinates, the
+    direction sprite of every segment (relative to the assets folder).
+    Saved as versioned JSON, so a plan can be rendered again, inspected or diffed.
+    """
+
+    def __init__(self, bbox: tuple[float, float, float, float], background_image: str, legs: list[dict], icons: list[dict], profile: str|None = None):
+        self.bbox = tuple(bbox)
+        self.background_image = background_image
+        self.legs = legs
+        self.icons = icons
+        self.profile = profile
+
+    def __len__(self):
+        return len(self.legs)
+
+    def get_legs(self):
+        """(paths, colors, transport, times) like prepare_legs returns them."""
+        paths = [list(np.column_stack([leg["points"], np.zeros(len(leg["points"]))])) for leg in self.legs]
+        colors = [leg["color"] for leg in self.legs]
+        transport = [leg["transport"] for leg in self.legs]
+        times = [leg["times"] for leg in self.legs]
+        return paths, colors, transport, times
+
+    def get_sprite_paths(self, assets: str = assets) -> list[list[str]]:
+        return [[f"{assets}/{sprite_id}" for sprite_id in leg["sprites"]] for leg in self.legs]
+
+    def get_icons(self) -> list[tuple[np.ndarray, str, float]]:
+        """(Manim position, icon path, icon scale) of every point with an icon."""
+        return [(np.array([*icon["position"], 0.0]), icon["icon"], icon["scale"]) for icon in self.icons]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            "profile": self.profile,
+            "bbox": list(self.bbox),
+            "background_image": self.background_image,
+            "icons": self.icons,
+            "legs": [{**leg, "points": np.round(leg["points"], PLAN_DECIMALS).tolist()} for leg in self.legs],
+        }
+
+    def save(self, file_path: str):
+        """One icon and one leg per line, so the file stays small and diffs show the legs that changed."""
+        data = self.to_dict()
+        icons = data.pop("icons")
+        legs = data.pop("legs")
+        lines = [f'  "{key}": {json.dumps(value)},' for key, value in data.items()]
+        lines.append('  "icons": [\n' + ",\n".join(f"    {json.dumps(icon)}" for icon in icons) + "\n  ],")
+        lines.append('  "legs": [\n' + ",\n".join(f"    {json.dumps(leg)}" for leg in legs) + "\n  ]")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("{\n" + "\n".join(lines) + "\n}\n")
+
+    @classmethod
+    def load(cls, file_path: str) -> "animation_plan":
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Plan {file_path} has version {data.get('version')}, expected {PLAN_VERSION}. Create it again")
+        legs = [{**leg, "points": np.asarray(leg["points"], dtype=float).reshape(-1, 2)} for leg in data["legs"]]
+        return cls(data["bbox"], data["background_image"], legs, data["icons"], data.get("profile"))
+
+def create_plan(points: point_collection, bbox: tuple[float, float, float, float], background_image: str, profile: str|None = None) -> animation_plan:
+    """Routes and projects everything once. The Manim config has to be set to the render profile already."""
+    projection = get_scene_projection(bbox)
+    paths, colors, transport, times = prepare_legs(points, bbox)
+    sprites = sprite_cache(assets)
+    legs = []
+    for path, color, travel, leg_time in zip(paths, colors, transport, times):
+        # rounded like in the file, so a fresh plan and a loaded one are the same
+        leg_points = np.round(np.asarray(path, dtype=float)[:, :2], PLAN_DECIMALS)
+        legs.append({
+            "transport": travel,
+            "color": color,
+            "times": [float(value) for value in leg_time],
+            "points": leg_points,
+            "sprites": sprites.get_leg_ids(travel, leg_points, leg_time[1] - leg_time[0]) if len(leg_points) > 1 else [],
+        })
+
+    icon_points = [point for point in points.get_points() if point.get_icon() != None]
+    icon_positions = projection.wgs84_to_manim([point.latitude for point in icon_points], [point.longitude for point in icon_points])
+    icons = [
+        {"position": np.round(position[:2], PLAN_DECIMALS).tolist(), "icon": point.get_icon(), "scale": point.get_icon_scale()}
+        for point, position in zip(icon_points, icon_positions)
+    ]
+    return animation_plan(bbox, background_image, legs, icons, profile)
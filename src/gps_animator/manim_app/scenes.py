@@ -1,11 +1,17 @@
 from manim import *
 import numpy as np
 from shapely.geometry import LineString
-from PIL import Image, ImageSequence
 from termcolor import colored
 import os
+import time
 from gps_animator.manim_app.helpers import *
 from gps_animator.common.points import point_collection
+from gps_animator.config import settings
+from gps_animator.manim_app.sprites import sprite_cache, leg_sprites, IDLE_SPRITE
+from gps_animator.common.raster_cache import backgrounds
+from gps_animator.common.profiling import tracer
+from gps_animator.common.map_utils import get_background_size
+from gps_animator.manim_app.plan import animation_plan, create_plan, get_scene_projection
 
 ### Global Variables
 end     = 0
@@ -21,21 +27,42 @@ MIN_IDLE = 5
 IDLE_TIME = 2.5
 MAX_TRAVEL = 10
 IMAGE_MANIM_WIDTH = 12.0
+config.output_file = "/home/honney/projects/gps-animation/output/output_video.mp4"
 
+def apply_render_profile(profile: str|None = None) -> dict:
+    """Sets the Manim output of a render profile (see Settings.RENDER_PROFILES) and returns the profile."""
+    render_profile = settings.get_render_profile(profile)
+    config.pixel_width = render_profile["pixel_width"]
+    config.pixel_height = render_profile["pixel_height"]
+    config.frame_rate = render_profile["frame_rate"]
+    return render_profile
 
 class PathOnMap(Scene):
-    config.pixel_width = 3840
-    config.pixel_height = 4046
-    config.frame_rate = 60
-    config.output_file = "/home/honney/projects/gps-animation/output/output_video.mp4"
     image_manim_width: float = 0
     image_manim_height: float = 0
 
-    def __init__(self, baselayer_path: str, bbox: tuple[float, float, float, float], path: list[tuple[float, float]], **kwargs):
+    def __init__(self, points: point_collection|None = None, bbox: tuple[float, float, float, float]|None = None, background_image: str|None = None, legs: tuple[int, int]|None = None, time_offset: float = 0, profile: str|None = None, plan: animation_plan|None = None, **kwargs):
+        """
+        points, bbox and background_image default to points.txt of the input folder and its detail map.
+        plan: render this animation plan instead, points, bbox and background_image are not needed then
+        profile: render profile, by default settings.RENDER_PROFILE
+        legs: only animate the legs [start, stop), the rest of the scene is built all the same
+        time_offset: scene time at which the first of these legs starts, so gifs keep their phase
+        """
+        # the camera is built from the config in Scene.__init__
+        self.profile = apply_render_profile(profile)
+        self.profile_name = profile or settings.RENDER_PROFILE
         super().__init__(**kwargs)
-        self.baselayer_path = baselayer_path
+        self.points = points
         self.bbox = bbox
-        self.path = path
+        self.background_image = background_image
+        self.legs = legs
+        self.time_offset = time_offset
+        self.plan = plan
+
+    def get_time(self):
+        """Time in the whole animation, also when only a slice of the legs is rendered."""
+        return self.time_offset + self.renderer.time
 
     def add_base_path(self, path, color = WHITE, stroke_width=4):
         """
@@ -56,242 +83,169 @@ class PathOnMap(Scene):
         paths: list of tuples (start_point, end_point)
         color: color of the base lines
         """
+        lines = []
         for i in range(len(paths)):
             path = paths[i]
             color = colors[i]
-            self.add_base_path(path, color=color)
+            lines.append(self.add_base_path(path, color=color))
+        return lines
+
+    def add_static_layer(self, mobjects):
+        """
+        Rasterizes mobjects that never change (map, base paths, still icons) once at output
+        resolution and replaces them by one full frame image, so every frame only draws that
+        image and the animated mobjects.
+        """
+        camera = self.renderer.camera
+        camera.reset()
+        camera.capture_mobjects(sorted(mobjects, key=lambda mob: mob.z_index))
+        pixels = np.array(camera.pixel_array)
+        camera.reset()
+        self.remove(*mobjects)
+
+        layer = ImageMobject(pixels)
+        # one image pixel per output pixel, nothing to interpolate
+        layer.set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
+        layer.stretch_to_fit_height(config.frame_height)
+        layer.stretch_to_fit_width(config.frame_width)
+        layer.move_to(ORIGIN)
+        self.add(layer)
+        self.bring_to_back(layer)
+        return layer
+
+    def add_gif_updater(self, obj, media):
+        """
+        Plays the frames of an animated sprite on obj by swapping its pixel array.
+        The frame per render frame comes from a precomputed table, unchanged frames are skipped.
+        """
+        frames = media.frames
+        frame_rate = config.frame_rate
+        media.get_frame_table(frame_rate)
+        shown = [0]
+
+        def gif_updater(mob, dt):
+            idx = media.frame_at(self.get_time(), frame_rate)
+            if idx != shown[0]:
+                mob.pixel_array = frames[idx]
+                shown[0] = idx
+
+        obj.pixel_array = frames[0]
+        obj.add_updater(gif_updater)
 
     def show_media_at_point(self, point, media_path, show_time=2, scale=1, height=1):
-        import numpy as np
         point = np.array(point, dtype=float)
         if point.shape[0] == 2:
             point = np.append(point, 0)
 
-        ext = os.path.splitext(media_path)[1].lower()
-
-        if ext in [".png", ".jpg", ".jpeg", ".bmp", ".webp"]:
-            with Image.open(media_path) as img:
-                width, _ = img.size
-            obj = ImageMobject(media_path)
-
-        elif ext == ".gif":
-            gif = Image.open(media_path)
-            print(gif.size)
-            width, _ = gif.size
-            frames = [ImageMobject(np.array(frame.convert("RGBA"))) for frame in ImageSequence.Iterator(gif)]
-            frame_count = len(frames)
-            frame_duration = gif.info.get("duration", 100) / 1000
-            total_gif_time = frame_count * frame_duration
-
-            obj = frames[0]
-
-            def gif_updater(mob, dt):
-                t = self.renderer.time
-                idx = int((t % total_gif_time) / frame_duration) % frame_count
-                old_center = mob.get_center()
-                mob.become(frames[idx])
-                mob.move_to(old_center)
-
-            obj.add_updater(gif_updater)
-
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-
-        # --- Scale object to desired height ---
-        obj.scale(rescale(scale, width))
-        # print(f"Scaling: {rescale(scale, width)}")
+        # only one media is shown at a time, so its mobject is reused
+        obj = self.sprites.get_mobject(("show", media_path, scale), media_path, scale)
+        media = self.sprites.get(media_path)
+        if media.is_animated():
+            self.add_gif_updater(obj, media)
 
         # --- Position it ---
         obj.move_to(point + UP * height * (obj.height / 2))
         obj.set_z_index(10)
         self.add(obj)
-        self.wait(show_time)
+        # never a frozen frame, so the frame count is the same as for every other animation
+        self.wait(show_time, frozen_frame=False)
         self.remove(obj)
+        obj.clear_updaters()
 
-    def move_image_along_path(
-        self,
-        points,
-        media_path,
-        show_time=1.5,
-        scale=1,
-        height=1
-    ):
+    def move_image_along_leg(self, path, travel, duration, sprite_paths=None):
         """
-        Moves an image/gif along a sequence of points.
-
-        points: list of 2D points
-        media_path: path to the media file
-        duration_per_segment: time to move between each consecutive pair
-        """
-        ext = os.path.splitext(media_path)[1].lower()
-
-        # --- Handle different media types ---
-        if ext in [".png", ".jpg", ".jpeg", ".bmp", ".webp"]:
-            with Image.open(media_path) as img:
-                width, pixel_height = img.size
-            obj = ImageMobject(media_path)
-
-        elif ext == ".gif":
-            gif = Image.open(media_path)
-            width, _ = gif.size
-            frames = [ImageMobject(np.array(frame.convert("RGBA"))) for frame in ImageSequence.Iterator(gif)]
-            frame_count = len(frames)
-            frame_duration = gif.info.get("duration", 100) / 1000
-            total_gif_time = frame_count * frame_duration
-
-            obj = frames[0]
+        Moves the sprite of travel along a whole leg in a single play.
 
-            def gif_updater(mob, dt):
-                t = self.renderer.time
-                idx = int((t % total_gif_time) / frame_duration) % frame_count
-                old_center = mob.get_center()
-                mob.become(frames[idx])
-                mob.move_to(old_center)
+        path: list of Manim points
+        travel: "walking", "train" or "car"
+        duration: run time of the whole leg
+        sprite_paths: direction sprite of every segment, worked out from path if not given
 
-            obj.add_updater(gif_updater)
-
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-
-        # --- Scale object to desired height ---
-        obj.scale(rescale(scale, width))
-        # print(f"Scaling: {rescale(scale, width)}")
-
-        # --- Place initial position ---
+        One ValueTracker runs from 0 to 1 over the leg. The updater looks up the
+        current segment in a cumulative arc length table and shows the direction
+        sprite (and gif frame) precomputed for that segment.
+        """
+        _, _, _, scale, height, _ = leg_sprites[travel]
+        points = np.array(path, dtype=float)
+        lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+        cumulative = np.concatenate([[0], np.cumsum(lengths)])
+        total_length = cumulative[-1]
+        if total_length == 0:
+            return
+
+        if sprite_paths is None:
+            sprite_paths = self.sprites.get_leg_paths(travel, points, duration)
+        sprites = {sprite_path: self.sprites.get(sprite_path) for sprite_path in set(sprite_paths)}
+
+        # legs are animated one after another, so every travel type reuses one mobject
+        obj = self.sprites.get_mobject(("leg", travel), sprite_paths[0], scale)
         obj.set_z_index(10)
         obj.move_to(points[0] + height * UP * (obj.height / 2))
-        self.add(obj)
-
-        # --- Animate along path ---
-        for start, end in zip(points[:-1], points[1:]):
-            line = Line(start, end)
-            tracker = ValueTracker(0)
+        shown = [(sprite_paths[0], 0)]
 
-            def update_obj(mob):
-                pos = line.point_from_proportion(tracker.get_value())
-                if height == 1:
-                    mob.move_to(pos + UP * (mob.height / 2))
-                else:
-                    mob.move_to(pos)
+        tracker = ValueTracker(0)
 
-            obj.add_updater(update_obj)
+        def update_obj(mob):
+            position = tracker.get_value() * total_length
+            k = int(np.clip(np.searchsorted(cumulative, position, side="right") - 1, 0, len(lengths) - 1))
+            fraction = (position - cumulative[k]) / lengths[k] if lengths[k] > 0 else 0
+            pos = points[k] + min(fraction, 1) * (points[k+1] - points[k])
 
-            self.play(
-                tracker.animate.set_value(1),
-                run_time=show_time,
-                rate_func=linear,
-            )
+            media = sprites[sprite_paths[k]]
+            idx = media.frame_at(self.get_time(), config.frame_rate)
+            if shown[0] != (sprite_paths[k], idx):
+                # direction sprites need not share one size, set_frame resizes the mobject then
+                media.set_frame(mob, idx, scale)
+                shown[0] = (sprite_paths[k], idx)
 
-            obj.remove_updater(update_obj)
-            obj.move_to(end + UP * (obj.height / 2))
+            if height == 1:
+                mob.move_to(pos + UP * (mob.height / 2))
+            else:
+                mob.move_to(pos)
 
-        # --- Remove at the end ---
+        obj.add_updater(update_obj)
+        self.add(obj)
+        self.play(
+            tracker.animate.set_value(1),
+            run_time=duration,
+            rate_func=linear,
+        )
+        obj.remove_updater(update_obj)
         self.remove(obj)
 
-    def move_image_along_paths(self, paths, transport, times):
-        # i=0
-        for path, travel, time in zip(paths, transport, times):
-            # i+=1
-            # if i == 1:
-            #     continue
-            # if i == 3:
-            #     return
-            print(colored(f"animating path from {list(path[0])} to {list(path[-1])}, which used {travel} and was from {time[0]} to {time[-1]}", 'red'))
-            # print(path, travel, time1, time2)
-            point1 = path[0]
-            # Calculate overall distance of path
-            overall_distance = 0
-            for point2 in path[1:]:
-                if point2[0] == path[-1][0] and point2[1] == path[-1][1]:
-                    continue
-                overall_distance += distance(point1, point2)
-                point1 = point2
-            # Calculated overall distance of path
-            overall_duration = time[1] - time[0]
-            if overall_duration > MAX_TRAVEL:
-                overall_duration = MAX_TRAVEL
-            point1 = path[0]
-            last_point = []
-            if travel == "walking":
-                buffer = 5
-            else:
-                buffer = 1
-            for point2 in path[1:]:
-                if len(last_point) > buffer:
-                    last_point.pop(0)
-                dist_points = distance(point1, point2)
-                segment_duration = (dist_points / overall_distance) * overall_duration
-                # print(f"normal animation: {segment_duration}")
-                if (segment_duration <= 0.5 and travel == "walking") or (segment_duration <= 0.15 and (travel == "train" or travel == "car")) and (point2 != path[-1]).any():
-                    continue
-                if segment_duration == 0:
-                    segment_duration = 0.016666667
-                last_angle=[angle_between_two_points_2d(point1, point2)]
-                if len(last_point) > 0:
-                    for point in last_point:
-                        angle = angle_between_two_points_2d(point, point2)
-                        last_angle.append(angle)
-                angle = np.mean(np.array(last_angle))
-                if travel == "walking":
-                    possible_angles = [0, 90, 180, 270]
-                    img_home_path = f"{assets}/walking/{find_nearest(possible_angles, angle)}.gif"
-                    # print(f"animation: {img_home_path}")
-                    self.move_image_along_path([point1, point2], img_home_path, show_time=segment_duration, scale=0.9, height=0.5)
-                elif travel == "train":
-                    possible_angles = [0.0, 5.625, 11.25, 16.875, 22.5, 28.125, 33.75, 39.375, 45.0, 50.625, 56.25, 61.875, 67.5, 73.125, 78.75, 84.375, 90.0, 95.625, 101.25, 106.875, 112.5, 118.125, 123.75, 129.375, 135.0, 140.625, 146.25, 151.875, 157.5, 163.125, 168.75, 174.375, 180.0, 185.625, 191.25, 196.875, 202.5, 208.125, 213.75, 219.375, 225.0, 230.625, 236.25, 241.875, 247.5, 253.125, 258.75, 264.375, 270.0, 275.625, 281.25, 286.875, 292.5, 298.125, 303.75, 309.375, 315.0, 320.625, 326.25, 331.875, 337.5, 343.125, 348.75, 354.375]
-                    img_home_path = f"{assets}/subway/{find_nearest(possible_angles, angle)}.png"
-                    self.move_image_along_path([point1, point2], img_home_path, show_time=segment_duration, scale = 1.2, height=0)
-                elif travel == "car":
-                    possible_angles = [0.0, 5.625, 11.25, 16.875, 22.5, 28.125, 33.75, 39.375, 45.0, 50.625, 56.25, 61.875, 67.5, 73.125, 78.75, 84.375, 90.0, 95.625, 101.25, 106.875, 112.5, 118.125, 123.75, 129.375, 135.0, 140.625, 146.25, 151.875, 157.5, 163.125, 168.75, 174.375, 180.0, 185.625, 191.25, 196.875, 202.5, 208.125, 213.75, 219.375, 225.0, 230.625, 236.25, 241.875, 247.5, 253.125, 258.75, 264.375, 270.0, 275.625, 281.25, 286.875, 292.5, 298.125, 303.75, 309.375, 315.0, 320.625, 326.25, 331.875, 337.5, 343.125, 348.75, 354.375]
-                    img_home_path = f"{assets}/car/{find_nearest(possible_angles, angle)}.png"
-                    self.move_image_along_path([point1, point2], img_home_path, show_time=segment_duration, scale = 1, height=0)
-                point1 = point2
-                last_point.append(point2)
-            if len(time) == 3:
-                img_home_path = f"{assets}/idle/idle.gif"
-                segment_duration = min(time[2]-time[1], 10)
-                # print(f"idle time: {segment_duration}, animation: {img_home_path}")
-                # print(path[-1], type(path[-1]), type(path[-1][0]))
-                if segment_duration > MIN_IDLE:
-                    self.show_media_at_point(path[-1], img_home_path, show_time=IDLE_TIME, scale = 1, height=1)
-            # return
+    def move_image_along_paths(self, paths, transport, times, sprite_paths=None):
+        if sprite_paths is None:
+            sprite_paths = [None] * len(paths)
+        for path, travel, leg_times, leg_sprite_paths in zip(paths, transport, times, sprite_paths):
+            print(colored(f"animating path from {list(path[0])} to {list(path[-1])}, which used {travel} and was from {leg_times[0]} to {leg_times[-1]}", 'red'))
+            travel_duration, idle_duration = get_leg_timing(leg_times, config.frame_rate)
+            with tracer.span("render leg", "render", travel=travel, duration=travel_duration + idle_duration):
+                self.move_image_along_leg(path, travel, travel_duration, leg_sprite_paths)
+                if idle_duration > 0:
+                    img_home_path = f"{assets}/{IDLE_SPRITE}"
+                    self.show_media_at_point(path[-1], img_home_path, show_time=idle_duration, scale = 1, height=1)
 
     def put_background_image(self, image_path, bbox):
         """Adds a background image to the scene."""
-        min_lon, min_lat, max_lon, max_lat = bbox
-        minx, miny = lonlat_to_mercator(min_lon, min_lat)
-        maxx, maxy = lonlat_to_mercator(max_lon, max_lat)
-
-        # Make sure bbox extents are positive
-        if maxx <= minx or maxy <= miny:
-            raise ValueError("Converted Mercator bbox has non-positive extent")
-
-        merc_width = maxx - minx
-        merc_height = maxy - miny
-        image_manim_width = IMAGE_MANIM_WIDTH
-        image_manim_height = image_manim_width * (merc_height / merc_width)
-        px_w = 3840
-        px_h = max(10, int(px_w * (merc_height / merc_width)))
+        # Conversion from Mercator meters -> Manim coordinates (centered)
+        self.projection = get_scene_projection(bbox)
+        minx, miny, maxx, maxy = self.projection.minx, self.projection.miny, self.projection.maxx, self.projection.maxy
+        image_manim_width = self.projection.manim_width
+        image_manim_height = self.projection.manim_height
+        px_w, px_h = get_background_size((minx, miny, maxx, maxy), self.profile["background_width"])
         self.minx = minx
         self.miny = miny
         self.maxx = maxx
         self.maxy = maxy
-        self.merc_width = merc_width
-        self.merc_height = merc_height
+        self.merc_width = self.projection.merc_width
+        self.merc_height = self.projection.merc_height
         self.image_manim_width = image_manim_width
         self.image_manim_height = image_manim_height
         print(f"Image size: {px_w} x {px_h}")
 
-        # Open your image and resize it to match resolution
-        img = Image.open(image_path)
-        img = img.resize((px_w, px_h), Image.LANCZOS)
-
-        # Save to a temporary file for Manim
-        resized_path = "resized_map.png"
-        img.save(resized_path)
-
-        # Load the resized image as an ImageMobject
-        map_img = ImageMobject(resized_path)
+        # Resized pixels come from the background cache, decoded and resized only once per size
+        pixels = backgrounds.get(image_path, (px_w, px_h))
+        map_img = ImageMobject(pixels)
         map_img.width = image_manim_width
         map_img.height = image_manim_height
         map_img.move_to(ORIGIN)
@@ -299,6 +253,7 @@ class PathOnMap(Scene):
         # Add image and keep it always in the background
         self.add(map_img)
         self.bring_to_back(map_img)
+        return map_img
 
     def add_media_at_point(self, point, media_path, scale=1, height=1, z_index=2):
         """
@@ -313,38 +268,10 @@ class PathOnMap(Scene):
         if point.shape[0] == 2:
             point = np.append(point, 0)
 
-        ext = os.path.splitext(media_path)[1].lower()
-
-        if ext in [".png", ".jpg", ".jpeg", ".bmp", ".webp"]:
-            obj = ImageMobject(media_path)
-            with Image.open(media_path) as img:
-                width, _ = img.size
-
-        elif ext == ".gif":
-            gif = Image.open(media_path)
-            width, _ = gif.size
-            frames = [ImageMobject(np.array(frame.convert("RGBA"))) for frame in ImageSequence.Iterator(gif)]
-            frame_count = len(frames)
-            frame_duration = gif.info.get("duration", 100) / 1000
-            total_gif_time = frame_count * frame_duration
-
-            obj = frames[0]
-
-            def gif_updater(mob, dt):
-                t = self.renderer.time
-                idx = int((t % total_gif_time) / frame_duration) % frame_count
-                old_center = mob.get_center()
-                mob.become(frames[idx])
-                mob.move_to(old_center)
-
-            obj.add_updater(gif_updater)
-
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-
-        # --- Scale object to desired height ---
-        obj.scale(rescale(scale, width))
-        # print(f"Scaling: {rescale(scale, width)}")
+        media = self.sprites.get(media_path)
+        obj = media.create_mobject(scale)
+        if media.is_animated():
+            self.add_gif_updater(obj, media)
 
         # --- Position it ---
         obj.move_to(point + UP * height * (obj.height / 2))
@@ -352,47 +279,47 @@ class PathOnMap(Scene):
 
         # --- Add to scene permanently ---
         self.add(obj)
+        return obj
+
+    def get_plan(self) -> animation_plan:
+        if self.plan is not None:
+            return self.plan
+        points = self.points
+        if points is None:
+            points = point_collection()
+            points.load_from_file(f"{input}/points.txt")
+        bbox_scaled = self.bbox
+        if bbox_scaled is None:
+            bbox_scaled = expand_bbox(points.get_minmax(), .5)
+        image_path = self.background_image
+        if image_path is None:
+            image_path = '/home/honney/projects/gps-animation/output/detail.png'
+        return create_plan(points, bbox_scaled, image_path, self.profile_name)
 
     def construct(self):
-        points = point_collection()
-        points.load_from_file(f"{input}/points.txt")
-        
-        all_points = points.get_points()
-        bbox = points.get_minmax()
-        extra_scale = .5
-        dpi = 600
-        from creating_maps import expand_bbox
-        bbox_scaled = expand_bbox(bbox, extra_scale)
+        plan = self.get_plan()
 
-        image_path = '/home/honney/projects/gps-animation/output/detail.png'
+        map_img = self.put_background_image(image_path = plan.background_image, bbox = plan.bbox)
 
-        self.put_background_image(image_path = image_path, bbox = bbox_scaled)
+        # decode every sprite once for the whole render
+        plan_icons = plan.get_icons()
+        self.sprites = sprite_cache(assets, self.profile["sprite_scale"])
+        with tracer.span("sprite preload", "render"):
+            self.sprites.preload([icon for _, icon, _ in plan_icons])
 
-        # Conversion from Mercator meters -> Manim coordinates (centered)
-        def merc_to_manim(x, y):
-            fx = (x - self.minx) / self.merc_width
-            fy = (y - self.miny) / self.merc_height
-            mx = fx * self.image_manim_width - self.image_manim_width / 2.0
-            my = fy * self.image_manim_height - self.image_manim_height / 2.0
-            return np.array([mx, my, 0.0])
-
-        for point in all_points:
-            icon = point.get_icon()
-            icon_scale = point.get_icon_scale()
-            # print(f"\"{icon}\" with type: {type(icon)}")
-            if icon != None:
-                x, y = point.get_mercator_coordinates()
-                self.add_media_at_point(merc_to_manim(x, y), icon, scale=1.5*icon_scale, height=0.5)
-        line_parts, times, colors, transport = get_path_array(points, bbox_scaled)
-
-        times = get_appropriate_times(times, 600)
-
-        new_line_parts = []
-        for line in line_parts:
-            new_line_parts.append([merc_to_manim(x,y) for x,y in line.coords])
-        
-        paths = resort_path(new_line_parts)
-        
-        self.add_base_paths(paths, colors)
-
-        self.move_image_along_paths(paths, transport, times)
\ No newline at end of file
+        icons = []
+        for position, icon, icon_scale in plan_icons:
+            icons.append(self.add_media_at_point(position, icon, scale=1.5*icon_scale, height=0.5))
+
+        paths, colors, transport, times = plan.get_legs()
+        sprite_paths = plan.get_sprite_paths(assets)
+
+        render_start = time.perf_counter()
+        with tracer.span("static layer", "render"):
+            lines = self.add_base_paths(paths, colors)
+            # animated icons keep their updaters, everything else is drawn once
+            self.add_static_layer([map_img] + lines + [icon for icon in icons if len(icon.get_updaters()) == 0])
+
+        start, stop = self.legs if self.legs is not None else (0, len(paths))
+        self.move_image_along_paths(paths[start:stop], transport[start:stop], times[start:stop], sprite_paths[start:stop])
+        print(colored(f"Rendered legs {start} to {stop} in {time.perf_counter() - render_start:.1f} s", 'green'))
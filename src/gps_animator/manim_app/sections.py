@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from termcolor import colored
+from manim import config
+from gps_animator.config import settings
+from gps_animator.common.raster_cache import backgrounds
+from gps_animator.manim_app.helpers import get_leg_frames, get_leg_timing, assets
+from gps_animator.manim_app.plan import animation_plan
+from gps_animator.manim_app.sprites import IDLE_SPRITE
+from gps_animator.manim_app.scenes import apply_render_profile
+from gps_animator.common.profiling import tracer
+from gps_animator.manim_app.parallel import render_slice, merge_slice_trace, concat_videos
+
+### Global Variables
+SECTION_CACHE_VERSION = 2 # bump when the way scenes are drawn changes
+
+def file_signature(path: str) -> str:
+    """Size and mtime of a file, so edited sprites and icons count as changed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def get_hash(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:32]
+
+class section_cache:
+    """
+    Rendered sections of a video, one per leg of a plan, stored as <render hash>.mp4.
+
+    The render hash of a section covers everything its frames depend on: the leg itself
+    (transport, points, sprites and their files, travel and idle duration), the frame it
+    starts at, so gifs keep the phase of a serial render, and the static layers every frame
+    shows (map, all base paths, icons, render profile). So a section is rendered again when
+    its own leg changed, when a leg before it changed its number of frames, or when any
+    base path moved. Least recently used sections are dropped above max_size bytes.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join(settings.CACHE, "sections"), max_size: int = settings.SECTION_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_static_hash(self, plan: animation_plan, render_profile: dict) -> str:
+        return get_hash({
+            "version": SECTION_CACHE_VERSION,
+            "profile": render_profile,
+            "frame": [config.frame_width, config.frame_height],
+            "bbox": list(plan.bbox),
+            "background": backgrounds.hash_file(plan.background_image),
+            "paths": [[leg["points"].tolist(), leg["color"]] for leg in plan.legs],
+            "icons": [[icon, file_signature(icon["icon"])] for icon in plan.icons],
+        })
+
+    def get_section_hash(self, plan: animation_plan, leg: int, frame_rate: float, static_hash: str, start_frame: int) -> str:
+        entry = plan.legs[leg]
+        sprite_files = sorted(set(entry["sprites"])) + [IDLE_SPRITE]
+        # the times are rescaled over the whole trip, only the durations they give this leg are drawn
+        travel_duration, idle_duration = get_leg_timing(entry["times"], frame_rate)
+        return get_hash({
+            "static": static_hash,
+            "leg": {"transport": entry["transport"], "points": entry["points"].tolist(), "sprites": entry["sprites"]},
+            "durations": [travel_duration, idle_duration],
+            "start": start_frame,
+            "sprites": [[sprite_id, file_signature(f"{assets}/{sprite_id}")] for sprite_id in sprite_files],
+        })
+
+    def get_cache_file(self, section_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{section_hash}.mp4")
+
+    def evict(self):
+        """Drops the least recently used sections until the cache is below max_size."""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".mp4")]
+        files.sort(key=os.path.getmtime)
+        total_size = sum(os.path.getsize(file) for file in files)
+        removed = 0
+        for file in files:
+            if total_size <= self.max_size:
+                break
+            total_size -= os.path.getsize(file)
+            os.remove(file)
+            removed += 1
+        if removed > 0:
+            print(colored(f"Evicted {removed} sections from the section cache", 'yellow'))
+
+sections = section_cache()
+
+def render_incremental(plan: animation_plan, processes: int|None = None, output_file: str|None = None, profile: str|None = None, cache: section_cache = sections) -> str:
+    """
+    Renders the plan one section per leg, reusing every section whose render hash is cached,
+    and joins the sections by stream copy. Missing sections render in a process pool,
+    every one from the scene time the serial render would be at, so the joined video has the same frames.
+    """
+    processes = processes or os.cpu_count() or 1
+    render_profile = apply_render_profile(profile)
+    if output_file is None:
+        output_file = os.path.splitext(config.output_file)[0] + config.movie_file_extension
+    frame_rate = config.frame_rate
+
+    paths, _, _, times = plan.get_legs()
+    frames = get_leg_frames(paths, times, frame_rate)
+    static_hash = cache.get_static_hash(plan, render_profile)
+    section_files = []
+    missing = []
+    pending = set()
+    start_frame = 0
+    for leg, leg_frames in enumerate(frames):
+        if leg_frames > 0:
+            cache_file = cache.get_cache_file(cache.get_section_hash(plan, leg, frame_rate, static_hash, start_frame))
+            section_files.append(cache_file)
+            if os.path.isfile(cache_file):
+                # marks the section as recently used
+                os.utime(cache_file)
+            elif cache_file not in pending:
+                # legs that look the same share one section
+                pending.add(cache_file)
+                missing.append((leg, start_frame / frame_rate, cache_file))
+        start_frame += leg_frames
+    print(colored(f"Reusing {len(section_files) - len(missing)} of {len(section_files)} sections, rendering {len(missing)}", 'green'))
+    tracer.count("section cache hits", len(section_files) - len(missing))
+    tracer.count("section cache misses", len(missing))
+
+    os.makedirs(cache.cache_dir, exist_ok=True)
+    if len(missing) > 0:
+        slice_root = tempfile.mkdtemp(prefix="sections_", dir=cache.cache_dir)
+        try:
+            with ProcessPoolExecutor(max_workers=min(processes, len(missing))) as executor:
+                futures = {}
+                for leg, time_offset, cache_file in missing:
+                    slice_dir = os.path.join(slice_root, f"{leg:05d}")
+                    futures[cache_file] = (slice_dir, executor.submit(render_slice, plan, (leg, leg + 1), time_offset, slice_dir, profile, tracer.enabled))
+                for cache_file, (slice_dir, future) in futures.items():
+                    os.replace(future.result(), cache_file)
+                    merge_slice_trace(slice_dir)
+        finally:
+            shutil.rmtree(slice_root, ignore_errors=True)
+
+    concat_videos(section_files, output_file)
+    cache.evict()
+    print(colored(f"Saved {output_file}", 'green'))
+    return output_file
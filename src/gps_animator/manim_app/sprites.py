@@ -0,0 +1,165 @@
+import os
+from fractions import Fraction
+import numpy as np
+from manim import ImageMobject
+from PIL import Image, ImageSequence
+from termcolor import colored
+from gps_animator.config import settings
+from gps_animator.manim_app.helpers import rescale, find_nearest, get_leg_angles, MAX_TRAVEL
+
+### Global Variables
+image_extensions = [".png", ".jpg", ".jpeg", ".bmp", ".webp"]
+WALKING_ANGLES = [i * 360 // settings.WALKING_DIRECTIONS for i in range(settings.WALKING_DIRECTIONS)]
+TRAIN_ANGLES = [i * 360 / settings.TRAIN_DIRECTIONS for i in range(settings.TRAIN_DIRECTIONS)]
+CAR_ANGLES = [i * 360 / settings.CAR_DIRECTIONS for i in range(settings.CAR_DIRECTIONS)]
+# travel -> (asset folder, possible angles, file extension, scale, height, angle buffer)
+leg_sprites = {
+    "walking": ("walking", WALKING_ANGLES, ".gif", 0.9, 0.5, 5),
+    "train":   ("subway", TRAIN_ANGLES, ".png", 1.2, 0, 1),
+    "car":     ("car", CAR_ANGLES, ".png", 1, 0, 1),
+}
+# travel -> seconds a segment has to take to pick its own direction sprite
+MIN_SEGMENT_TIME = {"walking": 0.5, "train": 0.15, "car": 0.15}
+IDLE_SPRITE = "idle/idle.gif"
+MAX_FRAME_TABLE = 10_000 # render frames covered by one frame index table
+
+class sprite:
+    """The decoded frames of one image or gif, shared by everything that shows it."""
+    __slots__ = ("path", "frames", "frame_duration", "width", "frame_tables")
+
+    def __init__(self, path: str, resolution_scale: float = 1):
+        """resolution_scale < 1 decodes smaller frames, width stays the one of the file so the sprite keeps its size in the scene."""
+        self.path = path
+        ext = os.path.splitext(path)[1].lower()
+        if ext in image_extensions:
+            with Image.open(path) as img:
+                self.frames = [np.array(img.convert("RGBA"))]
+                self.frame_duration = 1
+                self.width = img.size[0]
+        elif ext == ".gif":
+            with Image.open(path) as gif:
+                self.frames = [np.array(frame.convert("RGBA")) for frame in ImageSequence.Iterator(gif)]
+                self.frame_duration = gif.info.get("duration", 100) / 1000
+                self.width = gif.size[0]
+        else:
+            raise ValueError(f"Unsupported file type: {ext}")
+        # gif frames are swapped into one mobject, a frame of another size would be stretched
+        if any(frame.shape != self.frames[0].shape for frame in self.frames):
+            raise ValueError(f"The frames of {path} differ in size")
+        if resolution_scale < 1:
+            self.frames = [self.shrink(frame, resolution_scale) for frame in self.frames]
+        self.frame_tables = {}
+
+    @staticmethod
+    def shrink(frame: np.ndarray, resolution_scale: float) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (max(1, round(width * resolution_scale)), max(1, round(height * resolution_scale)))
+        return np.asarray(Image.fromarray(frame).resize(size, Image.LANCZOS))
+
+    def is_animated(self) -> bool:
+        return len(self.frames) > 1
+
+    def get_frame_table(self, frame_rate: float) -> np.ndarray:
+        """
+        The gif frame shown at every render frame of one loop, built once per frame rate.
+        The table covers the smallest number of render frames after which the gif and the
+        render line up again, so indexing it with the render frame modulo its length is exact.
+        """
+        if frame_rate not in self.frame_tables:
+            loop = Fraction(self.frame_duration * len(self.frames)).limit_denominator(1000)
+            length = (loop * Fraction(frame_rate).limit_denominator(1000)).numerator
+            if length > MAX_FRAME_TABLE:
+                length = max(1, round(float(loop) * frame_rate))
+            times = np.arange(length) / frame_rate
+            # the small offset keeps frames that start exactly on a render frame from rounding down
+            self.frame_tables[frame_rate] = np.floor(times / self.frame_duration + 1e-9).astype(np.int64) % len(self.frames)
+        return self.frame_tables[frame_rate]
+
+    def frame_at(self, time: float, frame_rate: float) -> int:
+        if len(self.frames) == 1:
+            return 0
+        table = self.get_frame_table(frame_rate)
+        return int(table[round(time * frame_rate) % len(table)])
+
+    def create_mobject(self, scale: float = 1) -> ImageMobject:
+        obj = ImageMobject(self.frames[0])
+        # smaller decoded frames make a smaller mobject, scale back to the size of the file
+        obj.scale(rescale(scale, self.width) * self.width / self.frames[0].shape[1])
+        return obj
+
+    def set_frame(self, mobject: ImageMobject, idx: int, scale: float = 1):
+        """
+        Shows frame idx on mobject by swapping its pixel array.
+        A mobject showing a sprite of another size is first resized to the size create_mobject
+        gives this one, the swap alone would stretch the frame over the old size.
+        """
+        frame = self.frames[idx]
+        if frame.shape != mobject.pixel_array.shape:
+            size = self.create_mobject(scale)
+            mobject.stretch_to_fit_width(size.width)
+            mobject.stretch_to_fit_height(size.height)
+        mobject.pixel_array = frame
+
+class sprite_cache:
+    """
+    Sprites of one render, keyed by asset path.
+    Every file is decoded once, and the mobjects of sprites that are only shown one at a
+    time (the travelling sprite of a leg, the idle animation) are built once and reused.
+    """
+
+    def __init__(self, assets: str, resolution_scale: float = 1):
+        self.assets = assets
+        self.resolution_scale = resolution_scale
+        self.sprites = {}
+        self.mobjects = {}
+
+    def get(self, path: str) -> sprite:
+        if path not in self.sprites:
+            self.sprites[path] = sprite(path, self.resolution_scale)
+        return self.sprites[path]
+
+    def get_mobject(self, key, path: str, scale: float = 1) -> ImageMobject:
+        """A reusable mobject for key, showing the first frame of path."""
+        current = self.get(path)
+        if key not in self.mobjects:
+            self.mobjects[key] = current.create_mobject(scale)
+        else:
+            current.set_frame(self.mobjects[key], 0, scale)
+        return self.mobjects[key]
+
+    def get_direction_id(self, travel: str, angle: float) -> str:
+        """Path of a direction sprite relative to the assets folder."""
+        folder, _, ext, _, _, _ = leg_sprites[travel]
+        return f"{folder}/{angle}{ext}"
+
+    def get_direction_path(self, travel: str, angle: float) -> str:
+        return f"{self.assets}/{self.get_direction_id(travel, angle)}"
+
+    def get_leg_ids(self, travel: str, points, duration: float|None = None) -> list[str]:
+        """
+        The direction sprite of every segment of a leg, relative to the assets folder.
+        With the travel duration of the leg, segments shown shorter than MIN_SEGMENT_TIME keep the sprite of the next longer one.
+        """
+        _, possible_angles, _, _, _, buffer = leg_sprites[travel]
+        min_length = 0
+        if duration is not None:
+            duration = min(duration, MAX_TRAVEL)
+            total_length = np.sum(np.linalg.norm(np.diff(np.asarray(points, dtype=float), axis=0), axis=1))
+            min_length = total_length * MIN_SEGMENT_TIME[travel] / duration if duration > 0 else np.inf
+        return [self.get_direction_id(travel, find_nearest(possible_angles, angle)) for angle in get_leg_angles(points, buffer, min_length)]
+
+    def get_leg_paths(self, travel: str, points, duration: float|None = None) -> list[str]:
+        return [f"{self.assets}/{sprite_id}" for sprite_id in self.get_leg_ids(travel, points, duration)]
+
+    def preload(self, icons: list[str]|None = None):
+        """Loads all direction sets, the idle animation and the given point icons."""
+        paths = [self.get_direction_path(travel, angle) for travel, (_, angles, _, _, _, _) in leg_sprites.items() for angle in angles]
+        paths += [f"{self.assets}/{IDLE_SPRITE}"] + list(icons or [])
+        missing = 0
+        for path in paths:
+            try:
+                self.get(path)
+            except (FileNotFoundError, ValueError) as e:
+                missing += 1
+                print(colored(f"Could not preload {path}: {e}", 'yellow'))
+        print(colored(f"Preloaded {len(paths) - missing} sprites", 'green'))
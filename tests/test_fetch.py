@@ -0,0 +1,144 @@
+import json
+import time
+import threading
+import unittest
+import requests
+import osmnx as ox
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from gps_animator.common.fetch import is_retryable, with_retries, fetch_overpass, fetch_all
+
+BBOX = (139.760, 35.670, 139.770, 35.680)
+# three nodes of one street inside BBOX, the way Overpass answers [out:json]
+STREET = {"elements": [
+    {"type": "node", "id": 1, "lat": 35.672, "lon": 139.762},
+    {"type": "node", "id": 2, "lat": 35.675, "lon": 139.765},
+    {"type": "node", "id": 3, "lat": 35.678, "lon": 139.768},
+    {"type": "way", "id": 10, "nodes": [1, 2, 3], "tags": {"highway": "residential"}},
+]}
+
+class overpass_handler(BaseHTTPRequestHandler):
+    """Stand-in for the Overpass interpreter, answering with the next of server.answers."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append(self.path)
+        status, body = self.server.answers.pop(0)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if status == 200 else "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class test_fetch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), overpass_handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/api"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.answers = []
+        self.ox_settings = (ox.settings.overpass_url, ox.settings.use_cache, ox.settings.overpass_rate_limit, ox.settings.requests_timeout)
+        # no response cache and no /status queries, every query is one POST to the stand-in
+        ox.settings.use_cache = False
+        ox.settings.overpass_rate_limit = False
+        ox.settings.requests_timeout = 10
+
+    def tearDown(self):
+        ox.settings.overpass_url, ox.settings.use_cache, ox.settings.overpass_rate_limit, ox.settings.requests_timeout = self.ox_settings
+
+    def test_graph_after_overloaded_server(self):
+        self.server.answers = [(503, "<html>Service Unavailable</html>"), (200, json.dumps(STREET))]
+        G = fetch_overpass(ox.graph_from_bbox, BBOX, network_type="drive", overpass_url=self.url, backoff=0)
+        self.assertEqual(self.server.requests, ["/api/interpreter", "/api/interpreter"])
+        self.assertEqual(sorted(G.nodes), [1, 3])
+        self.assertEqual(ox.settings.overpass_url, self.url)
+
+    def test_no_retry_on_bad_request(self):
+        self.server.answers = [(400, "<html>Bad Request</html>"), (200, json.dumps(STREET))]
+        with self.assertRaises(ValueError):
+            fetch_overpass(ox.graph_from_bbox, BBOX, network_type="drive", overpass_url=self.url, backoff=0)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_retry_on_cut_off_response(self):
+        self.server.answers = [(200, '{"elements": ['), (200, json.dumps(STREET))]
+        G = fetch_overpass(ox.graph_from_bbox, BBOX, network_type="drive", overpass_url=self.url, backoff=0)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(G.edges), 2)
+
+    def test_no_retry_on_empty_area(self):
+        self.server.answers = [(200, json.dumps({"elements": []})), (200, json.dumps(STREET))]
+        with self.assertRaises(ValueError):
+            fetch_overpass(ox.graph_from_bbox, BBOX, network_type="drive", overpass_url=self.url, backoff=0)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_gives_up_after_attempts(self):
+        self.server.answers = [(502, "Bad Gateway")] * 3
+        with self.assertRaises(ValueError):
+            fetch_overpass(ox.graph_from_bbox, BBOX, network_type="drive", overpass_url=self.url, attempts=3, backoff=0)
+        self.assertEqual(len(self.server.requests), 3)
+
+class test_retries(unittest.TestCase):
+
+    def test_is_retryable(self):
+        response = requests.Response()
+        response.status_code = 503
+        self.assertTrue(is_retryable(requests.HTTPError(response=response)))
+        response.status_code = 404
+        self.assertFalse(is_retryable(requests.HTTPError(response=response)))
+        self.assertTrue(is_retryable(requests.ConnectionError()))
+        self.assertTrue(is_retryable(requests.Timeout()))
+        self.assertTrue(is_retryable(ValueError("'overpass-api.de' responded: 429 Too Many Requests")))
+        self.assertFalse(is_retryable(ValueError("'overpass-api.de' responded: 400 Bad Request")))
+        self.assertFalse(is_retryable(ValueError("No matching features. Check query location, tags, and log.")))
+        cut_off = ValueError("'overpass-api.de' responded: 200 OK {\"elements\": [")
+        cut_off.__cause__ = requests.JSONDecodeError("Expecting value", '{"elements": [', 14)
+        self.assertTrue(is_retryable(cut_off))
+        self.assertFalse(is_retryable(ValueError()))
+
+    def test_with_retries(self):
+        calls = []
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise requests.ConnectionError()
+            return "done"
+        self.assertEqual(with_retries(flaky, attempts=3, backoff=0), "done")
+        self.assertEqual(len(calls), 3)
+
+    def test_overpass_url_per_query(self):
+        def query(url):
+            # the server must not change while a query runs
+            for _ in range(5):
+                self.assertEqual(ox.settings.overpass_url, url)
+                time.sleep(0.01)
+            return url
+        overpass_url = ox.settings.overpass_url
+        try:
+            urls = [f"http://127.0.0.1/{i % 2}" for i in range(6)]
+            results = fetch_all({i: lambda url=url: fetch_overpass(query, url, overpass_url=url) for i, url in enumerate(urls)}, workers=6)
+        finally:
+            ox.settings.overpass_url = overpass_url
+        self.assertEqual([results[i] for i in range(6)], urls)
+
+    def test_fetch_all_keeps_errors(self):
+        def fail():
+            raise LookupError("missing")
+        results = fetch_all({"a": lambda: 1, "b": fail, "c": lambda: 3}, workers=3)
+        self.assertEqual((results["a"], results["c"]), (1, 3))
+        self.assertIsInstance(results["b"], LookupError)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from gps_animator.common import ingest
+from gps_animator.common.ingest import iter_point_chunks
+from gps_animator.common.points import departure_types
+
+def gpx(points: int) -> str:
+    track = "".join(f'<trkpt lat="{35 + i / 1000}" lon="139"><time>2024-05-01T{9 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z</time></trkpt>' for i in range(points))
+    return f'<?xml version="1.0"?><gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>{track}</trkseg></trk></gpx>'
+
+class test_ingest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, file_name: str, text: str) -> str:
+        path = os.path.join(self.folder, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def read(self, path: str, **kwargs) -> dict[str, np.ndarray]:
+        chunks = list(iter_point_chunks(path, **kwargs))
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in ("latitude", "arrival", "dep_type") if chunks[0][column] is not None}
+
+    def test_time_step_after_every(self):
+        # every=2 keeps the arrivals 0, 11 and 26, each the first kept one of its 10 s
+        path = self.write("track.csv", "lat,lon,time\n" + "\n".join(f"{i},0,{time}" for i, time in enumerate([0, 10, 11, 25, 26, 27])))
+        for chunk_size in (1, 2, 4, 100):
+            self.assertEqual(self.read(path, chunk_size=chunk_size, every=2, time_step=10)["arrival"].tolist(), [0, 11, 26, 27])
+
+    def test_time_step_across_chunks(self):
+        path = self.write("track.csv", "lat,lon,time\n" + "\n".join(f"{i},0,{i * 3}" for i in range(20)))
+        for chunk_size in (1, 3, 7, 100):
+            self.assertEqual(self.read(path, chunk_size=chunk_size, time_step=10)["arrival"].tolist(), [0, 12, 21, 30, 42, 51, 57])
+
+    def test_gpx_is_walked(self):
+        path = self.write("track.gpx", gpx(10))
+        for chunk_size in (1, 3, 5, 10, 100):
+            columns = self.read(path, chunk_size=chunk_size)
+            self.assertEqual(len(columns["latitude"]), 10)
+            self.assertEqual(columns["dep_type"].tolist(), [departure_types["walking"]] * 9 + [departure_types["end"]])
+            self.assertEqual(columns["arrival"].tolist(), [9 * 3600 + i for i in range(10)])
+
+    def test_downsampled_gpx_ends_with_its_last_point(self):
+        columns = self.read(self.write("track.gpx", gpx(10)), chunk_size=4, every=4)
+        self.assertEqual(columns["arrival"].tolist(), [9 * 3600, 9 * 3600 + 4, 9 * 3600 + 8, 9 * 3600 + 9])
+        self.assertEqual(columns["dep_type"][-1], departure_types["end"])
+
+    def test_gpx_tree_stays_small(self):
+        path = self.write("track.gpx", gpx(50_000).replace("<trkseg>", "<metadata><name>day</name></metadata><trkseg>"))
+        parsers = []
+        iterparse = ingest.ET.iterparse
+        def record_parser(*args, **kwargs):
+            parsers.append(iterparse(*args, **kwargs))
+            return parsers[-1]
+        with mock.patch.object(ingest.ET, "iterparse", record_parser):
+            points = sum(len(chunk["latitude"]) for chunk in iter_point_chunks(path, chunk_size=1000))
+        self.assertEqual(points, 50_000)
+        # every finished element was dropped, not just emptied
+        self.assertEqual(len(list(parsers[0].root.iter())), 1)
+
+if __name__ == "__main__":
+    unittest.main()
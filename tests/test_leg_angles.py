@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from gps_animator.manim_app.helpers import get_leg_angles, angle_between_two_points_2d
+
+class test_leg_angles(unittest.TestCase):
+
+    def test_smooths_over_earlier_points(self):
+        rng = np.random.default_rng(0)
+        points = np.cumsum(rng.normal(0, 1, (30, 2)), axis=0)
+        for buffer in (1, 5):
+            expected = [np.mean([angle_between_two_points_2d(points[j], points[k+1]) for j in range(max(0, k-buffer), k+1)]) for k in range(len(points)-1)]
+            self.assertTrue(np.allclose(get_leg_angles(points, buffer), expected))
+
+    def test_jitter_keeps_the_direction(self):
+        # walking east (90°) with a small step back north west in the middle
+        points = np.array([[0, 0], [10, 0], [9.9, 0.1], [20, 0], [30, 0]])
+        self.assertGreater(abs(get_leg_angles(points, 1)[1] - 90), 45)
+        angles = get_leg_angles(points, 1, min_length=1)
+        self.assertEqual(len(angles), 4)
+        # the step back takes the direction of the next segment, from where the last counted one ended
+        self.assertEqual(angles[1], angles[2])
+        self.assertAlmostEqual(angles[2], np.mean([angle_between_two_points_2d(points[0], points[3]), angle_between_two_points_2d(points[1], points[3])]))
+        self.assertTrue(all(abs(angle - 90) < 1 for angle in angles))
+
+    def test_last_segment_counts(self):
+        points = np.array([[0, 0], [10, 0], [10, 0.5]])
+        angles = get_leg_angles(points, 1, min_length=1)
+        self.assertEqual(len(angles), 2)
+        self.assertAlmostEqual(angles[1], np.mean([angle_between_two_points_2d(points[0], points[2]), angle_between_two_points_2d(points[1], points[2])]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from gps_animator.manim_app.helpers import get_leg_frames, split_legs, get_appropriate_times, get_leg_timing, count_frames, MAX_TRAVEL, IDLE_TIME
+
+FRAME_RATE = 30
+
+def make_trip(legs: int, seed: int = 0) -> tuple[list, list]:
+    """Paths and get_appropriate_times of a trip, some legs without movement."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for _ in range(legs):
+        path = np.cumsum(rng.normal(0, 1, (rng.integers(2, 6), 3)), axis=0)
+        if rng.random() < 0.1:
+            path[:] = path[0]
+        paths.append(path.tolist())
+    stays = rng.integers(60, 7200, legs)
+    travels = rng.integers(60, 3600, legs)
+    times = []
+    now = 0
+    for stay, travel in zip(stays, travels):
+        times.append((now, now + stay))
+        now += stay + travel
+    times.append((now, None))
+    return paths, get_appropriate_times(times, 300)
+
+class test_leg_frames(unittest.TestCase):
+
+    def test_frames_per_leg(self):
+        paths = [[[0, 0, 0], [1, 0, 0]]] * 3 + [[[1, 0, 0], [1, 0, 0]]]
+        times = [[0, 1], [1, 1.5, 20], [20, 60], [60, 61]]
+        frames = get_leg_frames(paths, times, FRAME_RATE)
+        self.assertEqual(frames, [
+            FRAME_RATE,
+            FRAME_RATE // 2 + int(IDLE_TIME * FRAME_RATE),
+            MAX_TRAVEL * FRAME_RATE,
+            0,
+        ])
+
+    def test_frames_match_serial_render(self):
+        # the serial render plays every moving leg, then waits for the idle animation
+        paths, times = make_trip(200)
+        serial = 0
+        for path, time in zip(paths, times):
+            travel_duration, idle_duration = get_leg_timing(time, FRAME_RATE)
+            if np.any(np.asarray(path) != np.asarray(path[0])):
+                serial += len(np.arange(0, travel_duration, 1 / FRAME_RATE))
+            if idle_duration > 0:
+                serial += len(np.arange(0, idle_duration, 1 / FRAME_RATE))
+        self.assertEqual(sum(get_leg_frames(paths, times, FRAME_RATE)), serial)
+
+    def test_slices_add_up_to_serial_total(self):
+        paths, times = make_trip(200)
+        frames = get_leg_frames(paths, times, FRAME_RATE)
+        for slices in (1, 2, 3, 8, 64, 500):
+            ranges = split_legs(frames, slices)
+            self.assertLessEqual(len(ranges), slices)
+            # the ranges follow each other and cover every leg
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], len(frames))
+            self.assertTrue(all(stop == next_start for (_, stop), (next_start, _) in zip(ranges, ranges[1:])))
+            slice_frames = [sum(get_leg_frames(paths[start:stop], times[start:stop], FRAME_RATE)) for start, stop in ranges]
+            self.assertTrue(all(count > 0 for count in slice_frames))
+            self.assertEqual(sum(slice_frames), sum(frames))
+
+    def test_slices_are_balanced(self):
+        frames = [10] * 100
+        self.assertEqual(split_legs(frames, 4), [(0, 25), (25, 50), (50, 75), (75, 100)])
+        self.assertEqual(split_legs(frames, 1), [(0, 100)])
+
+    def test_legs_without_frames_join_a_slice(self):
+        self.assertEqual(split_legs([0, 0, 10, 0, 10, 0], 6), [(0, 4), (4, 6)])
+
+    def test_count_frames(self):
+        self.assertEqual(count_frames(1, FRAME_RATE), FRAME_RATE)
+        self.assertEqual(count_frames(1 / FRAME_RATE, FRAME_RATE), 1)
+
+if __name__ == "__main__":
+    unittest.main()
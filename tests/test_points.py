@@ -0,0 +1,124 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from gps_animator.common.points import point_collection, coordinate_point, departure_types, NO_ARRIVAL, NO_DEPARTURE
+
+class test_point_collection(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, file_name: str, text: str) -> str:
+        path = os.path.join(self.folder, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_add_columns_keeps_arrival_order(self):
+        points = point_collection()
+        points.add_columns([1, 2], [10, 20], arrival=[100, 300], departure=[200, 400], dep_type=[1, 0], name=["a", "c"])
+        # appending earlier arrivals sorts them in, equal arrivals keep their order
+        points.add_columns([3, 4], [30, 40], arrival=[200, 300], name=["b", "d"])
+        self.assertEqual(len(points), 4)
+        self.assertEqual([point.name for point in points.get_points()], ["a", "b", "c", "d"])
+        self.assertEqual(points.rows["arrival"].tolist(), [100, 200, 300, 300])
+        self.assertEqual(points.rows["departure"].tolist(), [200, NO_DEPARTURE, 400, NO_DEPARTURE])
+        self.assertEqual(points.rows["dep_type"].tolist(), [1, 0, 0, 0])
+
+    def test_add_columns_defaults(self):
+        points = point_collection()
+        points.add_columns([1.5], [2.5])
+        point = points.get_point_at(0)
+        self.assertEqual(point.coord(), (1.5, 2.5))
+        self.assertEqual((point.arrival, point.departure), (NO_ARRIVAL, NO_DEPARTURE))
+        self.assertIsNone(point.name)
+        self.assertIsNone(point.icon)
+
+    def test_add_columns_grows(self):
+        points = point_collection()
+        for i in range(10):
+            points.add_columns(list(range(5)), list(range(5)), arrival=[i * 10 + j for j in range(5)])
+        self.assertEqual(len(points), 50)
+        self.assertEqual(points.rows["arrival"].tolist(), sorted(points.rows["arrival"].tolist()))
+
+    def test_get_point_by(self):
+        points = point_collection()
+        points.add_point(coordinate_point(1, 10, "home", "08:00", "09:00", None, None), "walking")
+        points.add_point(coordinate_point(2, 20, "work", "09:30", "17:00", "office.png", 0.5), "end")
+        points.add_point(coordinate_point(3, 30, "home", "18:00", None, None, None), None)
+
+        self.assertEqual(points.get_point_by_name("work").coord(), (2, 20))
+        # the first point of a name wins
+        self.assertEqual(points.get_point_by_name("home").arrival, 8 * 3600)
+        self.assertIsNone(points.get_point_by_name("gym"))
+
+        self.assertEqual(points.get_point_by_time(8 * 3600 + 1).name, "home")
+        self.assertEqual(points.get_point_by_time(12 * 3600).name, "work")
+        self.assertIsNone(points.get_point_by_time(9 * 3600 + 60))
+        self.assertIsNone(points.get_point_by_time(7 * 3600))
+        self.assertEqual(points.get_point_by_time(20 * 3600).coord(), (3, 30))
+
+        self.assertEqual(points.get_point_by_coordinates(2, 20).icon, "office.png")
+        self.assertIsNone(points.get_point_by_coordinates(2, 21))
+
+        self.assertEqual(points.get_point("work").name, "work")
+        self.assertEqual(points.get_point(12 * 3600).name, "work")
+        self.assertEqual(points.get_point(3, 30).arrival, 18 * 3600)
+
+        # the indexes are rebuilt after a change
+        points.remove_point(points.get_point_by_name("work"))
+        self.assertIsNone(points.get_point_by_name("work"))
+        self.assertIsNone(points.get_point_by_coordinates(2, 20))
+
+    def test_load_stream_csv(self):
+        path = self.write("points.csv", "\n".join([
+            "lat, lon, name, arrival, departure, departure_type, icon_scale",
+            "35.0, 139.0, a, 08:00, 08:30, walking, 0.5",
+            "35.1, 139.1, b, 09:00, 09:10, train,",
+            "35.2, 139.2, c, 10:00, , end,",
+        ]))
+        points = point_collection()
+        points.load_stream(path, chunk_size=2)
+        self.assertEqual([point.name for point in points.get_points()], ["a", "b", "c"])
+        self.assertEqual(points.rows["arrival"].tolist(), [8 * 3600, 9 * 3600, 10 * 3600])
+        self.assertEqual(points.rows["departure"].tolist(), [8 * 3600 + 1800, 9 * 3600 + 600, NO_DEPARTURE])
+        self.assertEqual(points.rows["dep_type"].tolist(), [departure_types["walking"], departure_types["train"], departure_types["end"]])
+        self.assertEqual(points.get_point_at(0).icon_scale, 0.5)
+        self.assertIsNone(points.get_point_at(1).icon_scale)
+
+    def test_load_stream_ndjson(self):
+        entries = [
+            {"name": "a", "latitude": 35.0, "longitude": 139.0, "arrival": 100, "departure": 200, "dep_type": 1, "icon": "a.png"},
+            {"name": "b", "latitude": 35.1, "longitude": 139.1, "arrival": 300, "departure": None, "dep_type": 0, "icon": None},
+        ]
+        path = self.write("points.ndjson", "\n".join(json.dumps(entry) for entry in entries))
+        points = point_collection()
+        points.load_stream(path)
+        self.assertEqual(points.get_point_by_name("a").icon, "a.png")
+        self.assertEqual(points.get_point_by_name("b").departure, NO_DEPARTURE)
+        self.assertEqual(points.rows["dep_type"].tolist(), [1, 0])
+
+    def test_load_stream_downsamples(self):
+        path = self.write("track.csv", "lat,lon,time\n" + "\n".join(f"{i},{i},{i * 10}" for i in range(100)))
+        points = point_collection()
+        points.load_stream(path, chunk_size=7, every=3)
+        self.assertEqual(points.rows["latitude"].tolist(), [float(i) for i in range(0, 100, 3)])
+
+    def test_save_and_load_file(self):
+        points = point_collection()
+        points.add_point(coordinate_point(1, 10, "home", "08:00", "09:00", "home.png", 0.5), "walking")
+        points.add_point(coordinate_point(2, 20, "work", "09:30", None, None, None), "end")
+        path = os.path.join(self.folder, "points.txt")
+        points.save_as_file(path)
+        loaded = point_collection()
+        loaded.load_from_file(path)
+        self.assertEqual([point.get_details() for point in loaded.get_points()], [point.get_details() for point in points.get_points()])
+        self.assertEqual(loaded.rows["dep_type"].tolist(), [1, 0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import networkx as nx
+import geopandas as gpd
+from shapely.geometry import LineString
+from gps_animator.common.subway_index import subway_index
+from gps_animator.common.rail_network import rail_network
+
+def make_network(lines: list[tuple[list[tuple[float, float]], str, str]], **kwargs) -> rail_network:
+    subway_map = gpd.GeoDataFrame(
+        {"colour": [color for _, color, _ in lines], "name:en": [name for _, _, name in lines]},
+        geometry=[LineString(coords) for coords, _, _ in lines], crs="EPSG:3857"
+    )
+    return rail_network(subway_index(subway_map), **kwargs)
+
+def straight(start: tuple[float, float], end: tuple[float, float], vertices: int = 11) -> list[tuple[float, float]]:
+    return [tuple(point) for point in np.linspace(start, end, vertices).tolist()]
+
+class test_rail_network(unittest.TestCase):
+
+    def test_route_through_transfer(self):
+        # red runs east, blue north from 50 m next to red's last station
+        network = make_network([
+            (straight((0, 0), (1000, 0)), "#ff0000", "Red"),
+            (straight((1050, 50), (1050, 1050)), "#0000ff", "Blue"),
+        ])
+        sections = network.route((0, 0), (1050, 1050))
+        self.assertEqual([color for _, color in sections], ["#ff0000", "#0000ff"])
+        red, blue = (line for line, _ in sections)
+        self.assertEqual(red.coords[0], (0, 0))
+        self.assertEqual(red.coords[-1], (1000, 0))
+        # the blue section starts where red ended, so the train does not jump across the transfer
+        self.assertEqual(blue.coords[0], (1000, 0))
+        self.assertEqual(blue.coords[1], (1050, 50))
+        self.assertEqual(blue.coords[-1], (1050, 1050))
+
+    def test_no_transfer_beyond_distance(self):
+        network = make_network([
+            (straight((0, 0), (1000, 0)), "#ff0000", "Red"),
+            (straight((1200, 0), (2200, 0)), "#0000ff", "Blue"),
+        ])
+        with self.assertRaises(nx.NetworkXNoPath):
+            network.route((0, 0), (2200, 0))
+
+    def test_penalty_keeps_train_on_its_line(self):
+        # red bends around, a blue shortcut would save 800 m but takes two transfers
+        network = make_network([
+            (straight((0, 0), (0, 500)) + straight((0, 500), (1000, 500))[1:] + straight((1000, 500), (1000, 0))[1:], "#ff0000", "Red"),
+            (straight((0, 100), (1000, 100)), "#0000ff", "Blue"),
+        ], transfer_distance=60, transfer_penalty=1000)
+        sections = network.route((0, 0), (1000, 0))
+        self.assertEqual([color for _, color in sections], ["#ff0000"])
+        cheap = make_network([
+            (straight((0, 0), (0, 500)) + straight((0, 500), (1000, 500))[1:] + straight((1000, 500), (1000, 0))[1:], "#ff0000", "Red"),
+            (straight((0, 100), (1000, 100)), "#0000ff", "Blue"),
+        ], transfer_distance=60, transfer_penalty=0)
+        self.assertEqual([color for _, color in cheap.route((0, 0), (1000, 0))], ["#ff0000", "#0000ff", "#ff0000"])
+
+    def test_parts_of_one_line_need_no_transfer(self):
+        network = make_network([
+            (straight((0, 0), (1000, 0)), "#ff0000", "Red"),
+            (straight((1040, 0), (2040, 0)), "#ff0000", "Red"),
+        ], transfer_penalty=10_000)
+        sections = network.route((0, 0), (2040, 0))
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(sections[0][0].coords[-1], (2040, 0))
+
+if __name__ == "__main__":
+    unittest.main()
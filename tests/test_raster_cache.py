@@ -0,0 +1,41 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from gps_animator.common.raster_cache import raster_cache
+
+class test_raster_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.image = os.path.join(self.folder, "map.png")
+        Image.fromarray(np.full((40, 40, 3), 128, dtype=np.uint8)).save(self.image)
+        self.cache = raster_cache(os.path.join(self.folder, "backgrounds"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def cached_sizes(self) -> list[str]:
+        return sorted(name.split("_")[1] for name in os.listdir(self.cache.cache_dir))
+
+    def test_round_trip(self):
+        pixels = self.cache.get(self.image, (20, 10))
+        self.assertEqual(pixels.shape, (10, 20, 4))
+        loaded = self.cache.get(self.image, (20, 10))
+        self.assertIsInstance(loaded, np.memmap)
+        np.testing.assert_array_equal(loaded, pixels)
+
+    def test_evicts_least_recently_used(self):
+        for width in (10, 11, 12):
+            self.cache.get(self.image, (width, 10))
+            time.sleep(0.01)
+        # room for exactly these three
+        self.cache.max_size = sum(os.path.getsize(os.path.join(self.cache.cache_dir, name)) for name in os.listdir(self.cache.cache_dir))
+        # loading 10 makes 11 the least recently used background
+        self.cache.get(self.image, (10, 10))
+        time.sleep(0.01)
+        self.cache.get(self.image, (9, 10))
+        self.assertEqual(self.cached_sizes(), ["10x10", "12x10", "9x10"])
@@ -0,0 +1,71 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import shapely
+from shapely.geometry import LineString
+from gps_animator.common.route_cache import route_cache
+
+def line(i: int) -> LineString:
+    return LineString([(i, 0), (i, 1)])
+
+class test_route_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = route_cache(os.path.join(self.folder, "routes.sqlite"))
+
+    def tearDown(self):
+        if self.cache.connection is not None:
+            self.cache.connection.close()
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        key = self.cache.create_key("walk", (35.1234567, 139.7654321), (35.2, 139.8), "graph@1")
+        route = LineString([(0, 0), (1, 2), (3, 4.5)])
+        self.cache.put(key, route, "walk")
+        self.assertTrue(self.cache.get(key).equals_exact(route, 0))
+        self.assertIsNone(self.cache.get(self.cache.create_key("walk", (35.1234567, 139.7654321), (35.2, 139.8), "graph@2")))
+        # coordinates are rounded to about 0.1 m, closer starts share a route
+        self.assertEqual(key, self.cache.create_key("walk", (35.12345671, 139.7654321), (35.2, 139.8), "graph@1"))
+
+    def test_round_trip_sections(self):
+        sections = [(LineString([(0, 0), (1, 1)]), "#ff0000"), (LineString([(1, 1), (2, 0), (3, 0)]), "#00ff00")]
+        self.cache.put_many_sections({"train": sections}, "train")
+        loaded = self.cache.get_many_sections(["train", "missing"])
+        self.assertEqual(list(loaded), ["train"])
+        self.assertEqual([color for _, color in loaded["train"]], ["#ff0000", "#00ff00"])
+        for (section, _), (expected, _) in zip(loaded["train"], sections):
+            self.assertTrue(section.equals_exact(expected, 0))
+        # plain routes are not taken for sectioned ones
+        self.cache.put("walk", line(0), "walk")
+        self.assertEqual(self.cache.get_many_sections(["walk"]), {})
+        self.assertEqual(self.cache.has_many(["train", "walk"], sections=True), {"train"})
+
+    def test_evicts_least_recently_used(self):
+        size = len(shapely.to_wkb(line(0)))
+        self.cache.max_size = 3 * size
+        for key in ["a", "b", "c"]:
+            self.cache.put(key, line(ord(key)), "walk")
+            time.sleep(0.01)
+        # reading a makes b the least recently used route
+        self.cache.get("a")
+        time.sleep(0.01)
+        self.cache.put("d", line(ord("d")), "walk")
+        self.assertEqual(sorted(self.cache.get_many(["a", "b", "c", "d"])), ["a", "c", "d"])
+
+    def test_probing_keeps_eviction_order(self):
+        size = len(shapely.to_wkb(line(0)))
+        self.cache.max_size = 3 * size
+        for key in ["a", "b", "c"]:
+            self.cache.put(key, line(ord(key)), "walk")
+            time.sleep(0.01)
+        self.assertEqual(self.cache.has_many(["a", "missing"]), {"a"})
+        # a was only probed, it is still the least recently used route
+        time.sleep(0.01)
+        self.cache.put("d", line(ord("d")), "walk")
+        self.assertEqual(self.cache.has_many(["a", "b", "c", "d"]), {"b", "c", "d"})
+
+if __name__ == "__main__":
+    unittest.main()
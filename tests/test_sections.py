@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+
+@unittest.skipUnless(find_spec("manim"), "needs Manim")
+class test_render_incremental(unittest.TestCase):
+    """Which sections render_incremental renders again, with the rendering itself stubbed out."""
+
+    def setUp(self):
+        from PIL import Image
+        from gps_animator.manim_app.sections import section_cache
+
+        self.folder = tempfile.mkdtemp()
+        self.background = os.path.join(self.folder, "map.png")
+        Image.fromarray(np.zeros((10, 10, 3), dtype=np.uint8)).save(self.background)
+        self.cache = section_cache(os.path.join(self.folder, "sections"))
+        self.rendered = []
+        self.time_offsets = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def make_plan(self, legs: int):
+        from gps_animator.manim_app.plan import animation_plan
+        return animation_plan((139.76, 35.67, 139.82, 35.73), self.background, [
+            {
+                "transport": "walking",
+                "color": "#ff0000",
+                # three seconds of walking, then the idle animation
+                "times": [10.0 * i, 10.0 * i + 3, 10.0 * i + 9],
+                "points": np.array([[i, 0.0], [i, 1.0]]),
+                "sprites": ["walking/0.gif"],
+            }
+            for i in range(legs)
+        ], [], "draft")
+
+    def render_slice(self, plan, legs, time_offset, slice_dir, profile, trace=False):
+        self.rendered.append(legs)
+        self.time_offsets[legs] = time_offset
+        os.makedirs(slice_dir, exist_ok=True)
+        movie_file = os.path.join(slice_dir, "slice.mp4")
+        with open(movie_file, "wb") as f:
+            f.write(f"{legs}".encode())
+        return movie_file
+
+    def render(self, plan) -> list[tuple[int, int]]:
+        from gps_animator.manim_app import sections
+        self.rendered = []
+        with mock.patch.object(sections, "render_slice", self.render_slice), \
+             mock.patch.object(sections, "concat_videos") as concat_videos, \
+             mock.patch.object(sections, "ProcessPoolExecutor", ThreadPoolExecutor):
+            sections.render_incremental(plan, 2, os.path.join(self.folder, "video.mp4"), "draft", self.cache)
+        self.assertEqual(len(concat_videos.call_args[0][0]), len(plan))
+        return sorted(self.rendered)
+
+    def test_unchanged_plan_renders_nothing(self):
+        plan = self.make_plan(4)
+        self.assertEqual(self.render(plan), [(0, 1), (1, 2), (2, 3), (3, 4)])
+        self.assertEqual(self.render(plan), [])
+
+    def test_sections_start_at_serial_scene_time(self):
+        from gps_animator.manim_app.helpers import get_leg_frames
+        plan = self.make_plan(3)
+        self.render(plan)
+        paths, _, _, times = plan.get_legs()
+        frames = get_leg_frames(paths, times, 15)
+        self.assertEqual([self.time_offsets[(i, i + 1)] for i in range(3)], [0, frames[0] / 15, (frames[0] + frames[1]) / 15])
+
+    def test_single_leg_edit_renders_one_section(self):
+        plan = self.make_plan(4)
+        self.render(plan)
+        plan.legs[3]["sprites"] = ["walking/90.gif"]
+        self.assertEqual(self.render(plan), [(3, 4)])
+        # a longer stop keeps the idle animation and every frame the same
+        plan.legs[1]["times"] = [10.0, 13.0, 19.5]
+        self.assertEqual(self.render(plan), [])
+
+    def test_frame_count_edit_renders_later_sections(self):
+        plan = self.make_plan(4)
+        self.render(plan)
+        # a longer walk without the idle animation changes the frames of leg 1 and where every later leg starts
+        plan.legs[1]["times"] = [10.0, 15.0, 19.0]
+        self.assertEqual(self.render(plan), [(1, 2), (2, 3), (3, 4)])
+
+    def test_base_path_edit_renders_everything(self):
+        # every section shows all base paths
+        plan = self.make_plan(3)
+        self.render(plan)
+        plan.legs[0]["points"] = np.array([[0.0, 0.0], [0.5, 1.0]])
+        self.assertEqual(self.render(plan), [(0, 1), (1, 2), (2, 3)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import math
+import unittest
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString, MultiLineString
+from gps_animator.common.subway_index import subway_index
+
+def old_match(subway_map: gpd.GeoDataFrame, start_coords, end_coords):
+    """The per-line search get_train_line did before subway_index."""
+    min_geometry_distance = []
+    for geometry in subway_map.geometry:
+        min_distance_start = np.inf
+        min_distance_end = np.inf
+        for point in geometry.coords:
+            distance_start = math.sqrt((start_coords[0] - point[0]) ** 2 + (start_coords[1] - point[1]) ** 2)
+            distance_end = math.sqrt((end_coords[0] - point[0]) ** 2 + (end_coords[1] - point[1]) ** 2)
+            if distance_start < distance_end:
+                if distance_start < min_distance_start:
+                    min_distance_start = distance_start
+            else:
+                if distance_end < min_distance_end:
+                    min_distance_end = distance_end
+        min_geometry_distance.append((min_distance_start, min_distance_end))
+    min_distance = np.inf
+    min_idx = -1
+    for idx, geometry_distance in enumerate(min_geometry_distance):
+        if geometry_distance[0] + geometry_distance[1] < min_distance:
+            min_distance = geometry_distance[0] + geometry_distance[1]
+            min_idx = idx
+    return min_idx, min_geometry_distance[min_idx]
+
+def random_lines(rng, lines: int, vertices: int) -> gpd.GeoDataFrame:
+    geometries = [LineString(np.cumsum(rng.normal(0, 200, (vertices, 2)), axis=0) + rng.uniform(0, 5000, 2)) for _ in range(lines)]
+    return gpd.GeoDataFrame({"colour": [f"#{i:06x}" for i in range(lines)], "name:en": [f"Line {i}" for i in range(lines)]}, geometry=geometries, crs="EPSG:3857")
+
+class test_subway_index(unittest.TestCase):
+
+    def test_match_like_old_search(self):
+        rng = np.random.default_rng(3)
+        subway_map = random_lines(rng, 12, 40)
+        index = subway_index(subway_map)
+        for _ in range(200):
+            start, end = rng.uniform(-1000, 6000, (2, 2))
+            line_id, start_vertex, end_vertex, distances = index.match(start, end)
+            old_id, old_distances = old_match(subway_map, start, end)
+            self.assertEqual(line_id, old_id)
+            np.testing.assert_allclose(distances, old_distances)
+            self.assertAlmostEqual(math.dist(start_vertex, start), old_distances[0])
+            self.assertAlmostEqual(math.dist(end_vertex, end), old_distances[1])
+
+    def test_multilinestrings_are_split(self):
+        subway_map = gpd.GeoDataFrame(
+            {"colour": ["#ff0000", "#00ff00"], "name:en": ["A", "B"]},
+            geometry=[MultiLineString([[(0, 0), (10, 0)], [(0, 5), (10, 5)]]), LineString([(0, 100), (10, 100)])],
+            crs="EPSG:3857"
+        )
+        index = subway_index(subway_map)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(list(index.colors), ["#ff0000", "#ff0000", "#00ff00"])
+        self.assertEqual(list(index.offsets), [0, 2, 4, 6])
+        line_id, _, _, _ = index.match((0, 99), (10, 101))
+        self.assertEqual(index.names[line_id], "B")
+
+    def test_empty_map(self):
+        index = subway_index(gpd.GeoDataFrame({"colour": [], "name:en": []}, geometry=[], crs="EPSG:3857"))
+        with self.assertRaises(ValueError):
+            index.match((0, 0), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from gps_animator.common.tile_store import tile_store, TILE_SIZE
+
+def make_tile(z: int, x: int, y: int) -> bytes:
+    """A PNG tile whose color encodes its coordinates."""
+    pixels = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    pixels[...] = (z, x, y, 255)
+    data = io.BytesIO()
+    Image.fromarray(pixels).save(data, format="PNG")
+    return data.getvalue()
+
+class tile_handler(BaseHTTPRequestHandler):
+    """Serves /{z}/{x}/{y}.png like a slippy-map server and records the requested paths."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        try:
+            z, x, y = (int(part) for part in self.path.strip("/").removesuffix(".png").split("/"))
+        except ValueError:
+            self.send_error(404)
+            return
+        data = make_tile(z, x, y)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class test_tile_store(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), tile_handler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.providers = {"local": f"http://127.0.0.1:{cls.server.server_address[1]}/{{z}}/{{x}}/{{y}}.png"}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "tiles.sqlite")
+        self.server.requests.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_fetch_then_cache_hit(self):
+        store = tile_store(self.path, self.providers, ttl=3600, offline=False)
+        self.assertEqual(store.get_tile("local", 3, 1, 2), make_tile(3, 1, 2))
+        self.assertEqual(self.server.requests, ["/3/1/2.png"])
+        # served from the store, the server is not asked again
+        self.assertEqual(store.get_tile("local", 3, 1, 2), make_tile(3, 1, 2))
+        self.assertEqual(store.get_tile_pixels("local", 3, 1, 2)[0, 0].tolist(), [3, 1, 2, 255])
+        self.assertEqual(self.server.requests, ["/3/1/2.png"])
+
+    def test_expired_tiles_are_fetched_again(self):
+        store = tile_store(self.path, self.providers, ttl=0, offline=False)
+        store.get_tile("local", 3, 1, 2)
+        store.get_tile("local", 3, 1, 2)
+        self.assertEqual(self.server.requests, ["/3/1/2.png", "/3/1/2.png"])
+
+    def test_fetches_many_tiles_at_once(self):
+        store = tile_store(self.path, self.providers, ttl=3600, offline=False)
+        coordinates = [(x, y) for x in range(4) for y in range(4)]
+        found = store.get_tiles("local", 4, coordinates)
+        self.assertEqual(sorted(found), sorted(coordinates))
+        self.assertTrue(all(data == make_tile(4, x, y) for (x, y), data in found.items()))
+        self.assertEqual(len(self.server.requests), 16)
+        store.get_tiles("local", 4, coordinates)
+        self.assertEqual(len(self.server.requests), 16)
+
+    def test_offline(self):
+        tile_store(self.path, self.providers, ttl=3600, offline=False).get_tile("local", 3, 1, 2)
+        store = tile_store(self.path, self.providers, ttl=0, offline=True)
+        # cached tiles are served even when expired
+        self.assertEqual(store.get_tile("local", 3, 1, 2), make_tile(3, 1, 2))
+        with self.assertRaises(LookupError):
+            store.get_tile("local", 3, 2, 2)
+        self.assertEqual(self.server.requests, ["/3/1/2.png"])
+
+    def test_mosaic(self):
+        store = tile_store(self.path, self.providers, ttl=3600, offline=False)
+        # the bbox spans the two western tiles of zoom 1
+        mosaic, extent = store.get_mosaic("local", (-1e7, -1e7, -1e6, 1e7), 1)
+        self.assertEqual(mosaic.shape, (2 * TILE_SIZE, TILE_SIZE, 4))
+        self.assertEqual(mosaic[0, 0].tolist(), [1, 0, 0, 255])
+        self.assertEqual(mosaic[-1, 0].tolist(), [1, 0, 1, 255])
+        self.assertAlmostEqual(extent[0], -20037508.342789244)
+        self.assertAlmostEqual(extent[2], 0)
+
+if __name__ == "__main__":
+    unittest.main()